@@ -8,13 +8,26 @@ Author  : xixi
 File    : api
 #-------------------------------------------------------------
 """
-from xxlimited import Null
-
 # mock_server.py
+# 有状态的购物车计算 mock：按提交的 order_items 计算小计/运费/总额，并按 cart_uuid 保存最近一次结果
+# 启动：python api/mock_server.py --port 5000（多线程 WSGI，可并发压测）
+import argparse
+import copy
+import json
+import math
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
 from flask import Flask, request, jsonify
+from werkzeug.serving import make_server
 
 app = Flask(__name__)
 
+CART_CALCULATE_PATH = '/api/ec/v2/TW/cart/calculate'
+ALLOW_ORIGIN = 'https://www.dogcatstar.com'
+
 MOCK_RESPONSE = {
     "data": {
         "data": {
@@ -159,36 +172,362 @@ MOCK_RESPONSE = {
     "isLoading": False
 }
 
-@app.route('/api/ec/v2/TW/cart/calculate', methods=['POST', 'OPTIONS'])
+# 商品目录：以 mock 数据中的商品为准，价格取服务端值（客户端篡改 sale_price 无效）
+CATALOG = {
+    item["sku"]: {
+        "id": item["id"],
+        "sale_price": item["sale_price"],
+        "parent_product_id": item["parent_product_id"],
+        "delivery_class": item["delivery_class"],
+    }
+    for item in MOCK_RESPONSE["data"]["data"]["data"]["order_items"]
+}
+_SHIPPING_METHOD = MOCK_RESPONSE["data"]["data"]["data"]["shipping_methods"][0]
+# 台湾常温宅配：未满 499 运费 80，满 499 免运
+SHIPPING_FEES = _SHIPPING_METHOD["shipping_rules"]["normal"][0]["shipping_fees"]
+DEFAULT_COUPON_IDS = [coupon["coupon_id"] for coupon in MOCK_RESPONSE["data"]["data"]["data"]["applied_coupons"]]
+
+
+class CartValidationError(ValueError):
+    """请求体不合法，返回 400"""
+
+
+def _is_price(value):
+    """价格：非负的有限数字（bool 不算）"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value) and value >= 0
+
+
+def _cart_items(cart_values):
+    """
+    校验 cart_values.cart.items 的结构并返回条目列表；cart_values / cart / items 缺失时为空列表
+    :raises CartValidationError: 任一层级类型不对，或条目中的 sku / sale_price / id 类字段不合法
+    """
+    if cart_values is None:
+        return []
+    if not isinstance(cart_values, dict):
+        raise CartValidationError("cart_values 必须是对象")
+    cart = cart_values.get("cart")
+    if cart is None:
+        return []
+    if not isinstance(cart, dict):
+        raise CartValidationError("cart_values.cart 必须是对象")
+    items = cart.get("items")
+    if items is None:
+        return []
+    if not isinstance(items, list):
+        raise CartValidationError("cart_values.cart.items 必须是数组")
+
+    for index, item in enumerate(items):
+        where = f"cart_values.cart.items[{index}]"
+        if not isinstance(item, dict):
+            raise CartValidationError(f"{where} 必须是对象")
+        if not isinstance(item.get("sku"), str) or not item["sku"]:
+            raise CartValidationError(f"{where}.sku 必须是非空字符串")
+        if "sale_price" in item and not _is_price(item["sale_price"]):
+            raise CartValidationError(f"{where}.sale_price 不合法: {item['sale_price']!r}")
+        for key in ("variation_id", "cartItemId", "parent_product_id", "product_id", "delivery_class"):
+            if not isinstance(item.get(key), (str, int, type(None))):
+                raise CartValidationError(f"{where}.{key} 不合法: {item[key]!r}")
+    return items
+
+
+def _catalog_item(sku, cart_items):
+    """目录中的商品直接返回；目录外的商品用请求中 cart_values 的同 sku 条目兜底（cart_items 已经过 _cart_items 校验）"""
+    if sku in CATALOG:
+        return CATALOG[sku]
+    for item in cart_items:
+        if item["sku"] == sku:
+            return {
+                "id": item.get("variation_id") or item.get("cartItemId"),
+                "sale_price": item.get("sale_price", 0),
+                "parent_product_id": item.get("parent_product_id") or item.get("product_id"),
+                "delivery_class": item.get("delivery_class") or "normal",
+            }
+    raise CartValidationError(f"未知商品: {sku}")
+
+
+def shipping_fee_for(subtotal):
+    """按金额区间匹配运费规则"""
+    for rule in SHIPPING_FEES:
+        max_amount = rule["max_amount"]
+        if subtotal >= rule["min_amount"] and (max_amount is None or subtotal <= max_amount):
+            return rule
+    return SHIPPING_FEES[-1]
+
+
+def normalize_order_items(payload):
+    """
+    校验并提取 (sku, quantity, is_addon_v2, id, sale_price, parent_product_id, delivery_class)，同一 sku 合并数量
+    结果完全决定响应内容（cart_uuid 除外），同时作为响应缓存的键
+    :raises CartValidationError: order_items / cart_values 结构或类型不对、数量不合法或商品未知
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get("order_items"), list):
+        raise CartValidationError("order_items 缺失")
+    # 先校验整个请求体，再计算，避免非法类型在计算中途抛出变成 500
+    cart_items = _cart_items(payload.get("cart_values"))
+
+    merged = {}
+    for index, item in enumerate(payload["order_items"]):
+        if not isinstance(item, dict):
+            raise CartValidationError(f"order_items[{index}] 必须是对象")
+        sku = item.get("sku")
+        quantity = item.get("quantity")
+        if not sku:
+            raise CartValidationError("order_items 中缺少 sku")
+        if not isinstance(sku, str):
+            raise CartValidationError(f"order_items[{index}].sku 必须是字符串: {sku!r}")
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+            raise CartValidationError(f"{sku} 的数量不合法: {quantity}")
+        key = (sku, bool(item.get("is_addon_v2", False)))
+        merged[key] = merged.get(key, 0) + quantity
+
+    resolved = []
+    for (sku, is_addon_v2), quantity in merged.items():
+        product = _catalog_item(sku, cart_items)
+        resolved.append((sku, quantity, is_addon_v2, product["id"], product["sale_price"],
+                         product["parent_product_id"], product["delivery_class"]))
+    return tuple(resolved)
+
+
+def calculate_cart(order_items, cart_uuid):
+    """
+    根据 normalize_order_items 的结果计算购物车，返回完整响应结构（与 MOCK_RESPONSE 一致）
+    """
+    response = copy.deepcopy(MOCK_RESPONSE)
+    result = response["data"]["data"]["data"]
+
+    lines = []
+    subtotal = 0
+    for sku, quantity, is_addon_v2, product_id, sale_price, parent_product_id, delivery_class in order_items:
+        subtotal += sale_price * quantity
+        lines.append({
+            "sku": sku,
+            "quantity": quantity,
+            "id": product_id,
+            "sale_price": sale_price,
+            "parent_product_id": parent_product_id,
+            "delivery_class": delivery_class,
+            "applied_coupon_ids": list(DEFAULT_COUPON_IDS),
+            "subship_info": None,
+            "is_addon_v2": is_addon_v2,
+            "addon_v2_price": None,
+            "addon_setting_id": None,
+            "addon_scope": None,
+            "addon_main_product_id": None
+        })
+
+    fee_rule = shipping_fee_for(subtotal)
+    total = subtotal + fee_rule["fee"]
+    shipping_method = result["shipping_methods"][0]
+    shipping_method["total_fee"] = fee_rule["fee"]
+    shipping_method["shipping_rules"]["normal"][0]["applied_shipping_fee"] = dict(fee_rule)
+
+    result.update({
+        "cart_uuid": cart_uuid,
+        "order_items": lines,
+        "subtotal": subtotal,
+        "total_without_addon_v2": subtotal,
+        "total_after_discount": subtotal,
+        "total_after_shipping": total,
+        "total": total,
+        "total_before_tax": total,
+    })
+    return response
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class ResponseCache:
+    """
+    预编码的响应缓存：键为 normalize_order_items 的结果，值为 JSON 字节
+    cart_uuid 是唯一随请求变化的字段，编码时用占位符切成前后两段，命中时只做字节拼接
+    LRU 淘汰，未命中时才计算并编码
+    """
+
+    _PLACEHOLDER = "__MOCK_CART_UUID__"
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, order_items, cart_uuid):
+        with self._lock:
+            parts = self._entries.get(order_items)
+            if parts is not None:
+                self._entries.move_to_end(order_items)
+                self.hits += 1
+
+        if parts is None:
+            encoded = _dumps(calculate_cart(order_items, self._PLACEHOLDER))
+            parts = tuple(encoded.split(_dumps(self._PLACEHOLDER), 1))
+            with self._lock:
+                self.misses += 1
+                self._entries[order_items] = parts
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+        prefix, suffix = parts
+        return prefix + _dumps(str(cart_uuid)) + suffix
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize,
+                    "hits": self.hits, "misses": self.misses}
+
+
+response_cache = ResponseCache(int(os.getenv("MOCK_CACHE_SIZE", "1024")))
+
+
+class CartStore:
+    """
+    按 cart_uuid 保存最近一次计算结果（多线程共享），结果为编码后的响应字节
+    未带 cart_uuid 的请求每次都会生成新的 uuid，按 LRU 淘汰，最多保留 maxsize 个购物车
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._carts = OrderedDict()
+
+    def save(self, cart_uuid, order_items, body):
+        with self._lock:
+            self._carts[cart_uuid] = {"order_items": order_items, "body": body}
+            self._carts.move_to_end(cart_uuid)
+            while len(self._carts) > self.maxsize:
+                self._carts.popitem(last=False)
+
+    def get(self, cart_uuid):
+        with self._lock:
+            cart = self._carts.get(cart_uuid)
+            if cart is not None:
+                self._carts.move_to_end(cart_uuid)
+            return cart
+
+    def delete(self, cart_uuid):
+        with self._lock:
+            return self._carts.pop(cart_uuid, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._carts.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._carts)
+
+
+cart_store = CartStore(int(os.getenv("MOCK_CART_STORE_SIZE", "10000")))
+
+
+def _check_tokens(missing_status):
+    """api-token 缺失返回 missing_status，x-platform-token 缺失返回 403；通过返回 None"""
+    if not request.headers.get('api-token'):
+        return 'Missing Token', missing_status
+    if not request.headers.get('x-platform-token'):
+        return 'Missing Token', 403
+    return None
+
+
+def _json_response(body, status=200):
+    """直接返回已编码的 JSON 字节"""
+    return app.response_class(body, status=status, mimetype='application/json')
+
+
+def _cors(response):
+    response.headers.add('Access-Control-Allow-Origin', ALLOW_ORIGIN)
+    return response
+
+
+@app.route(CART_CALCULATE_PATH, methods=['POST', 'OPTIONS'])
 def mock_cart_calculate():
     # 处理预检请求
     if request.method == 'OPTIONS':
-        if 'api-token' not in request.headers or request.headers['api-token'] == "":
-            return 'Missing Token', 403
-        if 'x-platform-token' not in request.headers or request.headers['x-platform-token'] == "":
-            return 'Missing Token', 403
+        error = _check_tokens(403)
+        if error:
+            return error
         response = app.response_class()
-        response.headers.add('Access-Control-Allow-Origin', 'https://www.dogcatstar.com')
+        response.headers.add('Access-Control-Allow-Origin', ALLOW_ORIGIN)
         response.headers.add('Access-Control-Allow-Headers', 'content-type, api-token, x-platform-token')
         response.headers.add('Access-Control-Allow-Methods', 'POST')
         return response, 204
-    if request.method not in ['POST', 'OPTIONS']:
-        return 'Method Not Allowed', 405
 
-    if request.method == 'POST':
+    error = _check_tokens(401)
+    if error:
+        return error
+
+    payload = request.get_json(silent=True)
+    try:
+        order_items = normalize_order_items(payload)
+    except CartValidationError as e:
+        return _cors(jsonify({"message": str(e)})), 400
+
+    cart_uuid = payload.get("cart_uuid") or str(uuid.uuid4())
+    if not isinstance(cart_uuid, str):
+        return _cors(jsonify({"message": f"cart_uuid 必须是字符串: {cart_uuid!r}"})), 400
+    body = response_cache.get(order_items, cart_uuid)
+    cart_store.save(cart_uuid, order_items, body)
+    return _cors(_json_response(body))
+
+
+# ---------- mock 自身的管理接口（不属于真实 API）----------
+@app.route('/mock/carts/<cart_uuid>', methods=['GET', 'DELETE'])
+def mock_cart_state(cart_uuid):
+    """查询 / 清除某个 cart_uuid 最近一次的计算结果"""
+    if request.method == 'DELETE':
+        if not cart_store.delete(cart_uuid):
+            return jsonify({"message": "cart not found"}), 404
+        return '', 204
+
+    cart = cart_store.get(cart_uuid)
+    if cart is None:
+        return jsonify({"message": "cart not found"}), 404
+    return _json_response(cart["body"])
+
+
+@app.route('/mock/carts', methods=['DELETE'])
+def mock_reset_carts():
+    """清空所有购物车状态"""
+    cart_store.clear()
+    return '', 204
+
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """就绪探针"""
+    return jsonify({"status": "ok"})
+
+
+@app.route('/mock/stats', methods=['GET'])
+def mock_stats():
+    """响应缓存命中情况与当前保存的购物车数"""
+    return jsonify(dict(response_cache.stats(), carts=len(cart_store), carts_maxsize=cart_store.maxsize))
+
+
+def create_server(host='127.0.0.1', port=5000):
+    """创建多线程 WSGI 服务，port=0 时由系统分配空闲端口（server.server_port）"""
+    return make_server(host, port, app, threaded=True)
+
 
-        if 'api-token' not in request.headers or request.headers['api-token'] == "":
-            return 'Missing Token', 401
-        if 'x-platform-token' not in request.headers or request.headers['x-platform-token'] == "":
-            return 'Missing Token', 403
+def run_server(host='127.0.0.1', port=5000):
+    """多线程 WSGI 服务（阻塞），替代 Flask debug 开发服务器"""
+    server = create_server(host, port)
+    print(f"mock server listening on http://{host}:{server.server_port}", flush=True)
+    server.serve_forever()
 
-        # 可基于请求体返回不同响应（例如不同商品数量导致不同总价）
-        data = request.get_json()
-        total = 0
-        mock_response = MOCK_RESPONSE.copy()
-        response = jsonify(mock_response)
-        response.headers.add('Access-Control-Allow-Origin', 'https://www.dogcatstar.com')
-        return response
 
 if __name__ == '__main__':
-    app.run(port=5000, debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="dogcatstar 购物车计算 mock 服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+    run_server(args.host, args.port)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : payloads.py
+Time    : 2026/3/11
+Author  : xixi
+File    : api
+#-------------------------------------------------------------
+"""
+import itertools
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, NamedTuple, Optional, Sequence, Tuple, Union
+
+Path = Union[str, Sequence[Union[str, int]]]
+
+# 补丁值为 DELETE 时删除该键
+DELETE = object()
+
+
+class _FrozenDict(dict):
+    """只读 dict：模板中共享的子树，误改时直接报错而不是悄悄污染其他用例；json 序列化与普通 dict 一致"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("模板数据只读，请通过 patch 修改: build_payload({'a.b': value})")
+
+    __setitem__ = __delitem__ = _readonly
+    update = pop = popitem = setdefault = clear = _readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return _FrozenDict, (dict(self),)
+
+
+def freeze(value: Any) -> Any:
+    """递归转为只读结构：dict -> _FrozenDict，list -> tuple"""
+    if isinstance(value, _FrozenDict):
+        return value
+    if isinstance(value, dict):
+        return _FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def _split(path: Path) -> Tuple:
+    if isinstance(path, str):
+        return tuple(path.split("."))
+    return tuple(path)
+
+
+def _assoc(node: Any, keys: Tuple, value: Any) -> Any:
+    """
+    沿路径复制（path copying）：只复制从根到被修改节点的这一条链，其余子树原样共享
+    """
+    key, rest = keys[0], keys[1:]
+    if isinstance(node, (list, tuple)):
+        copied = list(node)
+        index = int(key)
+        if rest:
+            copied[index] = _assoc(copied[index], rest, value)
+        elif value is DELETE:
+            del copied[index]
+        else:
+            copied[index] = value
+        return copied
+    if not isinstance(node, dict):
+        raise KeyError(f"路径 {key} 的上级不是 dict/list: {node!r}")
+    copied = dict(node)
+    if rest:
+        copied[key] = _assoc(copied[key], rest, value)
+    elif value is DELETE:
+        copied.pop(key, None)
+    else:
+        copied[key] = value
+    return copied
+
+
+def apply_patch(base: Dict, patch: Optional[Dict[Path, Any]] = None, **overrides) -> Dict:
+    """
+    base + patch，返回新的顶层 dict，base 本身不变
+    :param patch: {路径: 新值}，路径用点号分隔，列表用下标，例如 "cart_values.cart.items.0.sale_price"
+    :param overrides: 顶层键的覆盖，等价于 patch={"键": 值}
+    """
+    result = dict(base)
+    for path, value in itertools.chain((patch or {}).items(), overrides.items()):
+        keys = _split(path)
+        result = _assoc(result, keys, value)
+    return result
+
+
+class PayloadTemplate:
+    """
+    请求体模板：base 冻结后在所有 build 结果间共享，build 只复制被 patch 的路径
+    - build() 返回的顶层 dict 可以直接改顶层键；未 patch 的嵌套部分只读
+    - extend() 在当前模板上叠加补丁得到新模板，适合一组用例共用的前置修改
+    """
+
+    def __init__(self, base: Dict):
+        self.base = freeze(base)
+
+    def build(self, patch: Optional[Dict[Path, Any]] = None, **overrides) -> Dict:
+        return apply_patch(self.base, patch, **overrides)
+
+    def extend(self, patch: Optional[Dict[Path, Any]] = None, **overrides) -> "PayloadTemplate":
+        return PayloadTemplate(apply_patch(self.base, freeze(patch or {}),
+                                           **{k: freeze(v) for k, v in overrides.items()}))
+
+
+# ---------- cart/calculate 基础数据 ----------
+VALID_ORDER_ITEMS = freeze([
+    {"sku": "純泥G", "project_code": "DCS", "quantity": 1, "is_addon": False, "is_addon_v2": False, "addon_setting_id": None},
+    {"sku": "四季被藍綠米", "project_code": "DCS", "quantity": 1, "is_addon": True, "is_addon_v2": False, "addon_setting_id": None}
+])
+
+VALID_CART_VALUES = freeze({
+    "cart": {
+        "items": [
+            {"cartItemId": 2292109, "product_id": 2292104, "variation_id": 2292109, "quantity": 1, "sku": "純泥G",
+             "delivery_class": "normal", "project_code": "DCS", "sale_price": 49, "is_addon_v2": False, "parent_product_id": 2292104},
+            {"cartItemId": 2336030, "product_id": 2336028, "variation_id": 2336030, "quantity": 1, "sku": "四季被藍綠米",
+             "delivery_class": "normal", "project_code": "DCS", "sale_price": 650, "is_addon": True, "is_addon_v2": False, "parent_product_id": 2336028}
+        ],
+        "addonItems": []
+    },
+    "rewardPoints": {"userInputRewardPoints": 0, "isUserAppliedRewardPoints": False},
+    "coupon": {"manualInputCouponIds": [], "selectedGiveaways": [], "redeemedCodes": []},
+    "billing": {"billingCountry": "TW"},
+    "shipping": {"appliedShippingMethodId": 2},
+    "payment": {},
+    "invoice": {"refundStatement": True, "receiptType": "non_business_einvoice"}
+})
+
+CART_TEMPLATE = PayloadTemplate({
+    "billing_country": "TW",
+    "project_code": "DCS",
+    "country_code": "TW",
+    "order_items": VALID_ORDER_ITEMS,
+    "manual_input_coupon_ids": [],
+    "applied_shipping_method_id": 2,
+    "language": "zh_TW",
+    "cart_values": VALID_CART_VALUES,
+    "coupon_code": "",
+    "shipping_method": "standard",
+    "test_s": "s0"
+})
+
+_ORDER_ITEM_BY_SKU = {item["sku"]: item for item in VALID_ORDER_ITEMS}
+_CART_ITEM_BY_SKU = {item["sku"]: item for item in VALID_CART_VALUES["cart"]["items"]}
+
+
+def build_payload(patch: Optional[Dict[Path, Any]] = None, **overrides) -> Dict:
+    """
+    构造 cart/calculate 请求体
+    例：build_payload({"cart_values.cart.items.0.sale_price": 0.001})
+        build_payload(order_items=[order_item("純泥G", 3)])
+    """
+    return CART_TEMPLATE.build(patch, **overrides)
+
+
+@lru_cache(maxsize=256)
+def order_item(sku: str, quantity: int = 1) -> Dict:
+    """order_items 中的一行，同一 (sku, 数量) 只生成一次，在各请求体间共享"""
+    return _FrozenDict(_ORDER_ITEM_BY_SKU[sku], quantity=quantity)
+
+
+@lru_cache(maxsize=256)
+def cart_item(sku: str, quantity: int = 1) -> Dict:
+    """cart_values.cart.items 中的一行"""
+    return _FrozenDict(_CART_ITEM_BY_SKU[sku], quantity=quantity)
+
+
+class CartVariant(NamedTuple):
+    case_id: str
+    skus: Tuple[str, ...]
+    quantity: int
+    coupons: Tuple[int, ...]
+    shipping_method_id: int
+    payload: Dict
+
+
+def iter_cart_variants(skus: Iterable[Union[str, Sequence[str]]] = tuple(_ORDER_ITEM_BY_SKU),
+                       quantities: Iterable[int] = (1,),
+                       coupons: Iterable[Sequence[int]] = ((),),
+                       shipping_methods: Iterable[int] = (2,),
+                       template: PayloadTemplate = CART_TEMPLATE) -> Iterator[CartVariant]:
+    """
+    SKU 组合 x 数量 x 优惠券 x 配送方式的笛卡尔积，按需逐个生成请求体
+    :param skus: 每项是一个 SKU 或一组 SKU（同一购物车内的商品）
+    :param quantities: 每个商品的数量
+    :param coupons: 每项是一组手动输入的优惠券 ID
+    :param shipping_methods: 配送方式 ID
+    """
+    sku_groups = [(group,) if isinstance(group, str) else tuple(group) for group in skus]
+    coupon_groups = [tuple(group) for group in coupons]
+    for group, quantity, coupon_ids, method_id in itertools.product(
+            sku_groups, tuple(quantities), coupon_groups, tuple(shipping_methods)):
+        payload = template.build({
+            "order_items": tuple(order_item(sku, quantity) for sku in group),
+            "cart_values.cart.items": tuple(cart_item(sku, quantity) for sku in group),
+            "manual_input_coupon_ids": coupon_ids,
+            "cart_values.coupon.manualInputCouponIds": coupon_ids,
+            "applied_shipping_method_id": method_id,
+            "cart_values.shipping.appliedShippingMethodId": method_id,
+        })
+        coupon_part = "+".join(map(str, coupon_ids)) or "none"
+        case_id = f"{'+'.join(group)}-q{quantity}-c{coupon_part}-s{method_id}"
+        yield CartVariant(case_id, group, quantity, coupon_ids, method_id, payload)
@@ -9,27 +9,163 @@ File    : api/tests
 #-------------------------------------------------------------
 """
 # conftest.py
+import os
+import socket
 import subprocess
+import sys
+import threading
 import time
+
 import pytest
+import pytest_asyncio
 import requests
 
+from utils.api_client import CART_CALCULATE_PATH, ApiClient, AsyncApiClient, auth_headers, default_headers
+from utils.case_loader import CASES_PATH, scan_cases
+from utils.config_registry import ROOT_DIR
+from utils.log import logger
+
+MOCK_HOST = "127.0.0.1"
+
+
+def _free_port() -> int:
+    """向系统申请一个空闲端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((MOCK_HOST, 0))
+        return sock.getsockname()[1]
+
+
+def pytest_generate_tests(metafunc):
+    """
+    使用 api_case 参数的用例按 JSONL 语料逐行生成，ID 取自用例
+    收集阶段只保存每行的偏移量，用例内容在执行时才读取
+    """
+    if "api_case" not in metafunc.fixturenames:
+        return
+    if not os.path.exists(CASES_PATH):
+        metafunc.parametrize("api_case", [pytest.param(None, marks=pytest.mark.skip(
+            reason=f"用例文件不存在: {CASES_PATH}"))])
+        return
+    refs = list(scan_cases(CASES_PATH))
+    metafunc.parametrize("api_case", refs, ids=[ref.case_id for ref in refs])
+
+
+def wait_until_ready(base_url: str, timeout: float = 10, interval: float = 0.01, max_interval: float = 0.5,
+                     proc: subprocess.Popen = None):
+    """
+    轮询 /healthz 直到返回 200，间隔按 2 倍递增
+    :param proc: 子进程模式下传入，进程提前退出时立即失败
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if requests.get(f"{base_url}/healthz", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        if proc is not None and proc.poll() is not None:
+            pytest.fail(f"mock 服务器进程已退出，退出码 {proc.returncode}")
+        if time.monotonic() >= deadline:
+            pytest.fail(f"mock 服务器 {timeout}s 内未就绪: {base_url}")
+        time.sleep(interval)
+        interval = min(interval * 2, max_interval)
+
+
 @pytest.fixture(scope="session")
 def mock_server():
-    # 启动 Flask 服务器（后台运行）
-    proc = subprocess.Popen(
-        ["python", "mock_server.py"],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
-    # 等待服务器启动
+    """
+    启动购物车 mock 服务并返回 base URL（每个 xdist worker 各自一个，端口由系统分配）
+    MOCK_SERVER_MODE=thread（默认）在当前进程的后台线程中运行；=subprocess 启动独立进程
+    """
+    mode = os.getenv("MOCK_SERVER_MODE", "thread")
+    start = time.perf_counter()
+
+    if mode == "subprocess":
+        port = _free_port()
+        base_url = f"http://{MOCK_HOST}:{port}"
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "api.mock_server", "--host", MOCK_HOST, "--port", str(port)],
+            cwd=ROOT_DIR,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_ready(base_url, proc=proc)
+            logger.info(f"mock 服务器（子进程）已就绪: {base_url}，耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+            yield base_url
+        finally:
+            # 测试结束后关闭服务器
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        return
+
+    from api.mock_server import create_server
+
+    server = create_server(MOCK_HOST, 0)
+    base_url = f"http://{MOCK_HOST}:{server.server_port}"
+    thread = threading.Thread(target=server.serve_forever, name="mock-server", daemon=True)
+    thread.start()
     try:
-        requests.get("http://localhost:5000")
-    except:
-        pytest.fail("mock 服务器启动失败")
-
-    time.sleep(2)
-    yield
-    # 测试结束后关闭服务器
-    proc.terminate()
-    proc.wait()
\ No newline at end of file
+        wait_until_ready(base_url)
+        logger.info(f"mock 服务器（线程）已就绪: {base_url}，耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+        yield base_url
+    finally:
+        server.shutdown()
+        thread.join(timeout=5)
+
+
+@pytest.fixture(scope="function")
+def get_base_url(request):
+    """
+    根据 ENV 环境变量返回对应的 base URL
+    DEV 环境未设置 DEV_BASE_URL 时，自动启动本地 mock 服务
+    """
+    env = os.getenv("ENV", "DEV")
+    base_url = os.getenv("API_BASE_URL", "https://fortune-api.moneynet.tw")
+    if env == "DEV":
+        base_url = os.getenv("DEV_BASE_URL") or request.getfixturevalue("mock_server")
+    logger.info(f"当前环境: {env}, 使用 BASE_URL: {base_url}")
+    return base_url
+
+
+@pytest.fixture(scope="function")
+def cart_calculate_url(get_base_url):
+    """返回完整的 API URL"""
+    return get_base_url + CART_CALCULATE_PATH
+
+
+@pytest.fixture(scope="session")
+def get_headers():
+    """
+    返回构造请求头的函数 get_headers(with_auth=True)
+    需要认证但 API_TOKEN 或 X_PLATFORM_TOKEN 未设置时跳过当前用例
+    """
+    def _get_headers(with_auth=True):
+        headers = default_headers()
+        if with_auth:
+            tokens = auth_headers()
+            if tokens is None:
+                pytest.skip("API_TOKEN 或 X_PLATFORM_TOKEN 未设置，跳过需要认证的测试")
+            headers.update(tokens)
+        return headers
+    return _get_headers
+
+
+@pytest.fixture(scope="session")
+def api_client():
+    """会话级 API 客户端：连接池复用、预置公共请求头、默认超时、5xx 退避重试"""
+    with ApiClient() as client:
+        yield client
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def async_api_client():
+    """
+    会话级异步 API 客户端，用于并发扇出大量请求
+    并发上限由环境变量 API_CONCURRENCY 指定，默认 20
+    """
+    async with AsyncApiClient(concurrency=int(os.getenv("API_CONCURRENCY", "20"))) as client:
+        yield client
@@ -5,98 +5,33 @@ API 自动化测试：购物车计算接口
 """
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module='urllib3')
-import requests
 import os
 import json
 import pytest
 from dotenv import load_dotenv
+from api.payloads import build_payload, iter_cart_variants, order_item
+from utils.api_client import CART_CALCULATE_PATH
 from utils.log import logger
 import allure
 
 load_dotenv()
 
-API_PATH = "/api/ec/v2/TW/cart/calculate"
-TIMEOUT = 10
+API_PATH = CART_CALCULATE_PATH
 
-# ---------- Fixtures ----------
-@pytest.fixture(scope="function")
-def get_base_url():
-    """根据 ENV 环境变量返回对应的 base URL"""
-    env = os.getenv("ENV", "DEV")
-    base_url = os.getenv("API_BASE_URL", "https://fortune-api.moneynet.tw")
-    if env == "DEV":
-        base_url = os.getenv("DEV_BASE_URL", "http://localhost:5000")
-    logger.info(f"当前环境: {env}, 使用 BASE_URL: {base_url}")
-    return base_url
-
-@pytest.fixture(scope="function")
-def cart_calculate_url(get_base_url):
-    """返回完整的 API URL"""
-    return get_base_url + API_PATH
-
-# ---------- 测试数据 ----------
-VALID_ORDER_ITEMS = [
-    {"sku": "純泥G", "project_code": "DCS", "quantity": 1, "is_addon": False, "is_addon_v2": False, "addon_setting_id": None},
-    {"sku": "四季被藍綠米", "project_code": "DCS", "quantity": 1, "is_addon": True, "is_addon_v2": False, "addon_setting_id": None}
-]
-
-VALID_CART_VALUES = {
-    "cart": {
-        "items": [
-            {"cartItemId": 2292109, "product_id": 2292104, "variation_id": 2292109, "quantity": 1, "sku": "純泥G",
-             "delivery_class": "normal", "project_code": "DCS", "sale_price": 49, "is_addon_v2": False, "parent_product_id": 2292104},
-            {"cartItemId": 2336030, "product_id": 2336028, "variation_id": 2336030, "quantity": 1, "sku": "四季被藍綠米",
-             "delivery_class": "normal", "project_code": "DCS", "sale_price": 650, "is_addon": True, "is_addon_v2": False, "parent_product_id": 2336028}
-        ],
-        "addonItems": []
-    },
-    "rewardPoints": {"userInputRewardPoints": 0, "isUserAppliedRewardPoints": False},
-    "coupon": {"manualInputCouponIds": [], "selectedGiveaways": [], "redeemedCodes": []},
-    "billing": {"billingCountry": "TW"},
-    "shipping": {"appliedShippingMethodId": 2},
-    "payment": {},
-    "invoice": {"refundStatement": True, "receiptType": "non_business_einvoice"}
-}
-
-def build_payload():
-    import copy
-    return {
-        "billing_country": "TW",
-        "project_code": "DCS",
-        "country_code": "TW",
-        "order_items": copy.deepcopy(VALID_ORDER_ITEMS),
-        "manual_input_coupon_ids": [],
-        "applied_shipping_method_id": 2,
-        "language": "zh_TW",
-        "cart_values": copy.deepcopy(VALID_CART_VALUES),
-        "coupon_code": "",
-        "shipping_method": "standard",
-        "test_s": "s0"
-    }
-
-# ---------- 辅助函数：构造请求头 ----------
-def get_headers(with_auth=True):
-    """返回请求头字典"""
-    headers = {
-        "Origin": "https://www.dogcatstar.com",
-        "Content-Type": "application/json",
-        "Accept-Language": "zh-TW"
-    }
-    if with_auth:
-        token = os.getenv("API_TOKEN")
-        x_token = os.getenv("X_PLATFORM_TOKEN")
-        if not token or not x_token:
-            pytest.skip("API_TOKEN 或 X_PLATFORM_TOKEN 未设置，跳过需要认证的测试")
-        headers["api-token"] = token
-        headers["x-platform-token"] = x_token
-    return headers
+# 商品组合 x 数量 x 优惠券的请求体，由 iter_cart_variants 按需生成（价格以 mock 服务端目录为准）
+SALE_PRICES = {"純泥G": 49, "四季被藍綠米": 650}
+CART_VARIANTS = list(iter_cart_variants(
+    skus=("純泥G", "四季被藍綠米", ("純泥G", "四季被藍綠米")),
+    quantities=(1, 11),
+    coupons=((), (4034,)),
+))
 
 # ---------- 测试用例 ----------
 @pytest.mark.api
 @pytest.mark.caculate
 @allure.feature("route:api/ec/v2/TW/cart/calculate测试用例")  # Allure 特性标记
 @allure.story("测试 OPTIONS 预检请求，验证 CORS 头是否正确")  # Allure 用户故事标记
-def test_cart_calculate_options_notoken(cart_calculate_url):
+def test_cart_calculate_options_notoken(api_client, cart_calculate_url, get_headers):
     """
     测试 OPTIONS 预检请求，验证 CORS 头是否正确。
     预期状态码 204，并包含 Access-Control-Allow-Origin 等头。
@@ -105,7 +40,7 @@ def test_cart_calculate_options_notoken(cart_calculate_url):
         # 构造 OPTIONS 请求所需的头（模拟浏览器预检）
         headers = get_headers(with_auth=True)
     with allure.step("请求到mock服务"):
-        response = requests.options(cart_calculate_url, headers=headers, timeout=TIMEOUT)
+        response = api_client.options(cart_calculate_url, headers=headers)
         # 记录日志
         logger.info(f"OPTIONS 请求 URL: {cart_calculate_url}")
         logger.info(f"请求头: {headers}")
@@ -127,7 +62,7 @@ def test_cart_calculate_options_notoken(cart_calculate_url):
 @pytest.mark.caculate
 @allure.feature("route:api/ec/v2/TW/cart/calculate测试用例-正常场景：购物车计算成功---用例中没有任何优惠和折扣")  # Allure 特性标记
 @allure.story("正常场景：购物车计算成功---用例中没有任何优惠和折扣")  # Allure 用户故事标记
-def test_cart_calculate_success(cart_calculate_url):
+def test_cart_calculate_success(api_client, cart_calculate_url, get_headers):
     """
     正常场景：购物车计算成功---用例中没有任何优惠和折扣
     """
@@ -137,7 +72,7 @@ def test_cart_calculate_success(cart_calculate_url):
     with allure.step("构造headers"):
         headers = get_headers(with_auth=True)
     with allure.step("请求到mock服务"):
-        response = requests.post(cart_calculate_url, json=payload, headers=headers, timeout=TIMEOUT)
+        response = api_client.post(cart_calculate_url, json=payload, headers=headers)
         data = response.json()
         # 记录日志
         logger.info(f"OPTIONS 请求 URL: {cart_calculate_url}")
@@ -163,19 +98,107 @@ def test_cart_calculate_success(cart_calculate_url):
                 assert item['sale_price'] == 650
                 assert item['quantity'] == 1
 
+@pytest.mark.api
+@pytest.mark.caculate
+@allure.feature("route:api/ec/v2/TW/cart/calculate测试用例-运费：未满 499 运费 80，满 499 免运")  # Allure 特性标记
+@allure.story("运费：未满 499 运费 80，满 499 免运")  # Allure 用户故事标记
+@pytest.mark.parametrize("quantity, expected_subtotal, expected_fee", [
+    (1, 49, 80),     # 未满 499
+    (10, 490, 80),   # 边界下方
+    (11, 539, 0),    # 满 499 免运
+])
+def test_cart_calculate_shipping_fee(api_client, cart_calculate_url, get_headers, quantity, expected_subtotal, expected_fee):
+    """
+    运费规则：只购买 純泥G（49 元），按数量跨越 499 免运门槛
+    """
+    with allure.step(f"构造请求体：純泥G x {quantity}"):
+        payload = build_payload(order_items=[order_item("純泥G", quantity)])
+        headers = get_headers(with_auth=True)
+    with allure.step("请求到mock服务"):
+        response = api_client.post(cart_calculate_url, json=payload, headers=headers)
+        logger.info(f"响应状态码: {response.status_code}")
+    with allure.step("验证状态码"):
+        assert response.status_code == 200, f"状态码错误: {response.status_code}"
+    with allure.step("验证小计、运费、总额"):
+        result = response.json()["data"]["data"]["data"]
+        assert result["subtotal"] == expected_subtotal, f"小计错误: {result['subtotal']}"
+        assert result["shipping_methods"][0]["total_fee"] == expected_fee, \
+            f"运费错误: {result['shipping_methods'][0]['total_fee']}"
+        assert result["total"] == expected_subtotal + expected_fee, f"总额错误: {result['total']}"
+
+@pytest.mark.api
+@pytest.mark.caculate
+@pytest.mark.asyncio(loop_scope="session")
+@allure.feature("route:api/ec/v2/TW/cart/calculate测试用例-价格矩阵并发验证")  # Allure 特性标记
+@allure.story("价格矩阵并发验证：純泥G x 四季被藍綠米 各数量组合")  # Allure 用户故事标记
+async def test_cart_calculate_price_matrix(async_api_client, cart_calculate_url, get_headers):
+    """
+    并发发出 20 x 5 个数量组合，逐个校验小计与运费规则
+    """
+    with allure.step("构造数量组合"):
+        headers = get_headers(with_auth=True)
+        matrix = [(q1, q2) for q1 in range(1, 21) for q2 in range(0, 5)]
+        calls = []
+        for q1, q2 in matrix:
+            order_items = [order_item("純泥G", q1)]
+            if q2:
+                order_items.append(order_item("四季被藍綠米", q2))
+            payload = build_payload(order_items=order_items)
+            calls.append({"method": "POST", "path": cart_calculate_url, "json": payload, "headers": headers})
+    with allure.step(f"并发请求 {len(calls)} 次"):
+        results = await async_api_client.fan_out(calls, label="price_matrix")
+        allure.attach(json.dumps(async_api_client.latencies.summary(), ensure_ascii=False, indent=2),
+                      name="latency", attachment_type=allure.attachment_type.JSON)
+    with allure.step("验证每个组合的小计、运费、总额"):
+        for (q1, q2), result in zip(matrix, results):
+            assert result["error"] is None, f"{q1},{q2} 请求失败: {result['error']}"
+            assert result["status"] == 200, f"{q1},{q2} 状态码错误: {result['status']}"
+            data = result["response"].json()["data"]["data"]["data"]
+            subtotal = 49 * q1 + 650 * q2
+            fee = 0 if subtotal >= 499 else 80
+            assert data["subtotal"] == subtotal, f"{q1},{q2} 小计错误: {data['subtotal']}"
+            assert data["total"] == subtotal + fee, f"{q1},{q2} 总额错误: {data['total']}"
+
+@pytest.mark.api
+@pytest.mark.caculate
+@allure.feature("route:api/ec/v2/TW/cart/calculate测试用例-商品组合")  # Allure 特性标记
+@allure.story("商品组合 x 数量 x 优惠券：小计、运费、总额与请求一致")  # Allure 用户故事标记
+@pytest.mark.parametrize("variant", CART_VARIANTS, ids=lambda v: v.case_id)
+def test_cart_calculate_variants(api_client, cart_calculate_url, get_headers, variant):
+    """
+    iter_cart_variants 生成的每个购物车组合，按目录价格校验小计与运费规则
+    """
+    with allure.step(f"构造请求体：{variant.case_id}"):
+        headers = get_headers(with_auth=True)
+        subtotal = sum(SALE_PRICES[sku] * variant.quantity for sku in variant.skus)
+        fee = 0 if subtotal >= 499 else 80
+    with allure.step("请求到mock服务"):
+        response = api_client.post(cart_calculate_url, json=variant.payload, headers=headers)
+        logger.info(f"{variant.case_id} 响应状态码: {response.status_code}")
+    with allure.step("验证状态码"):
+        assert response.status_code == 200, f"状态码错误: {response.status_code}"
+    with allure.step("验证商品、小计、运费、总额"):
+        result = response.json()["data"]["data"]["data"]
+        items = {item["sku"]: item["quantity"] for item in result["order_items"]}
+        assert items == {sku: variant.quantity for sku in variant.skus}, f"商品错误: {items}"
+        assert result["subtotal"] == subtotal, f"小计错误: {result['subtotal']}"
+        assert result["shipping_methods"][0]["total_fee"] == fee, \
+            f"运费错误: {result['shipping_methods'][0]['total_fee']}"
+        assert result["total"] == subtotal + fee, f"总额错误: {result['total']}"
+
 # ---------- 其他测试用例（示例）----------
 @pytest.mark.api
 @pytest.mark.caculate
 @allure.feature("route:api/ec/v2/TW/cart/calculate测试用例-未提供认证 token")  # Allure 特性标记
 @allure.story("未提供认证 token")  # Allure 用户故事标记
-def test_cart_calculate_missing_token(cart_calculate_url):
+def test_cart_calculate_missing_token(api_client, cart_calculate_url, get_headers):
     """未提供认证 token"""
     with allure.step("构造无token请求"):
         headers = get_headers(with_auth=False)
         payload = {"items": []}
     with allure.step("请求到mock服务"):
 
-        response = requests.post(cart_calculate_url, json=payload, headers=headers, timeout=TIMEOUT)
+        response = api_client.post(cart_calculate_url, json=payload, headers=headers)
     # 记录日志
         logger.info(f"OPTIONS 请求 URL: {cart_calculate_url}")
         logger.info(f"请求头: {headers}")
@@ -187,10 +210,10 @@ def test_cart_calculate_missing_token(cart_calculate_url):
 @pytest.mark.caculate
 @allure.feature("route:api/ec/v2/TW/cart/calculate测试用例-错误的 HTTP 方法")  # Allure 特性标记
 @allure.story("错误的 HTTP 方法")  # Allure 用户故事标记
-def test_cart_calculate_invalid_method(cart_calculate_url):
+def test_cart_calculate_invalid_method(api_client, cart_calculate_url):
     """错误的 HTTP 方法"""
     with allure.step("不支持的请求方式请求到mock服务"):
-        response = requests.get(cart_calculate_url, timeout=TIMEOUT)
+        response = api_client.get(cart_calculate_url)
         # 记录日志
         logger.info(f"OPTIONS 请求 URL: {cart_calculate_url}")
         logger.info(f"响应状态码: {response.status_code}")
@@ -203,19 +226,17 @@ def test_cart_calculate_invalid_method(cart_calculate_url):
 @pytest.mark.caculate
 @allure.feature("route:api/ec/v2/TW/cart/calculate测试用例-数据篡改：修改价格,返回值正确")  # Allure 特性标记
 @allure.story(" 数据篡改：修改价格")  # Allure 用户故事标记
-def test_cart_calculate_errprice(cart_calculate_url):
+def test_cart_calculate_errprice(api_client, cart_calculate_url, get_headers):
     """
     数据篡改：修改价格,返回值正确
     """
     with allure.step("构造请求体：修改价格=0.01"):
-        payload = build_payload()
+        # cart_values.cart.items[0] 即 cartItemId=2292109（純泥G）
+        payload = build_payload({"cart_values.cart.items.0.sale_price": 0.001})
         headers = get_headers(with_auth=True)
-        for item in payload['cart_values']['cart']['items']:
-            if item['cartItemId']==2292109:
-                item['sale_price'] = 0.001
     with allure.step("请求到mock服务"):
 
-        response = requests.post(cart_calculate_url, json=payload, headers=headers, timeout=TIMEOUT)
+        response = api_client.post(cart_calculate_url, json=payload, headers=headers)
         # 记录日志
         logger.info(f"OPTIONS 请求 URL: {cart_calculate_url}")
         logger.info(f"请求头: {headers}")
@@ -243,40 +264,4 @@ def test_cart_calculate_errprice(cart_calculate_url):
                 assert item['sale_price'] == 650
                 assert item['quantity'] == 1
 
-@pytest.mark.api
-@pytest.mark.caculate
-@allure.feature("route:api/ec/v2/TW/cart/calculate测试用例-白名单验证")  # Allure 特性标记
-@allure.story("白名单验证")  # Allure 用户故事标记
-def test_cart_calculate_errprice(cart_calculate_url):
-
-    pass
-
-@pytest.mark.api
-@pytest.mark.caculate
-@allure.feature("route:api/ec/v2/TW/cart/calculate测试用例-边界值验证")  # Allure 特性标记
-@allure.story("边界值验证")  # Allure 用户故事标记
-def test_cart_calculate_errprice(cart_calculate_url):
-    pass
-
-@pytest.mark.api
-@pytest.mark.caculate
-@allure.feature("route:api/ec/v2/TW/cart/calculate测试用例-优惠券验证coupon")  # Allure 特性标记
-@allure.story("优惠券验证coupon")  # Allure 用户故事标记
-def test_cart_calculate_errprice(cart_calculate_url):
-    pass
-
-@pytest.mark.api
-@pytest.mark.caculate
-@allure.feature("route:api/ec/v2/TW/cart/calculate测试用例-其他折扣验证")  # Allure 特性标记
-@allure.story("其他折扣验证")  # Allure 用户故事标记
-def test_cart_calculate_errprice(cart_calculate_url):
-    pass
-
-@pytest.mark.api
-@pytest.mark.caculate
-@allure.feature("route:api/ec/v2/TW/cart/calculate测试用例-接口负载")  # Allure 特性标记
-@allure.story("接口负载")  # Allure 用户故事标记
-def test_cart_calculate_errprice(cart_calculate_url):
-    pass
-
-
+# 白名单、边界值、优惠券等场景见 api/data/cases.jsonl（test_caculate_cases.py 逐行生成用例）
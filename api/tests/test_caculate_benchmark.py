@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : test_caculate_benchmark.py
+Time    : 2026/3/10
+Author  : xixi
+File    : api/tests
+#-------------------------------------------------------------
+"""
+import json
+import os
+
+import allure
+import pytest
+from pytest_check import check
+
+from api.payloads import build_payload
+from utils.load_bench import run_load
+
+
+def _env_float(name, default=None):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+@pytest.mark.slow
+@pytest.mark.api
+@pytest.mark.caculate
+@allure.feature("性能基准")  # Allure 特性标记
+@allure.story("route:api/ec/v2/TW/cart/calculate 压测")  # Allure 用户故事标记
+class TestCartCalculateBenchmark:
+
+    @allure.title("cart/calculate 延迟、错误率与吞吐")  # 自定义报告标题
+    def test_cart_calculate_load(self, cart_calculate_url, get_headers):
+        """
+        参数由环境变量控制：BENCH_CONCURRENCY（默认 10）、BENCH_RPS（默认不限速）、
+        BENCH_DURATION（默认 3 秒）、BENCH_MAX_ERROR_RATE（默认 0）、BENCH_MAX_P95_MS（默认不检查）
+        """
+        with allure.step("1.压测"):
+            report = run_load(
+                cart_calculate_url,
+                build_payload,
+                headers=get_headers(with_auth=True),
+                concurrency=int(_env_float("BENCH_CONCURRENCY", 10)),
+                rps=_env_float("BENCH_RPS"),
+                duration=_env_float("BENCH_DURATION", 3.0),
+            )
+            allure.attach(json.dumps(report, ensure_ascii=False, indent=2),
+                          name="benchmark", attachment_type=allure.attachment_type.JSON)
+
+        with allure.step("2.验证错误率与延迟"):
+            with check:
+                assert report["requests"] > 0, "未发出任何请求"
+            with check:
+                max_error_rate = _env_float("BENCH_MAX_ERROR_RATE", 0.0)
+                assert report["error_rate"] <= max_error_rate, \
+                    f"错误率 {report['error_rate']} 超过 {max_error_rate}: {report['error_counts']}"
+            max_p95 = _env_float("BENCH_MAX_P95_MS")
+            if max_p95 is not None:
+                with check:
+                    assert report["latency_ms"]["p95"] <= max_p95, \
+                        f"p95 {report['latency_ms']['p95']}ms 超过 {max_p95}ms"
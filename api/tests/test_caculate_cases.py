@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : test_caculate_cases.py
+Time    : 2026/3/12
+Author  : xixi
+File    : api/tests
+#-------------------------------------------------------------
+"""
+import json
+
+import allure
+import pytest
+from pytest_check import check
+
+from api.payloads import build_payload
+from utils.case_loader import dig
+from utils.log import logger
+
+
+@pytest.mark.api
+@pytest.mark.caculate
+@allure.feature("route:api/ec/v2/TW/cart/calculate测试用例-数据驱动")  # Allure 特性标记
+@allure.story("按 api/data/cases.jsonl 逐行回放（白名单、边界值、优惠券等）")  # Allure 用户故事标记
+def test_cart_calculate_case(api_client, get_base_url, get_headers, api_case):
+    """
+    每行一个用例，由 conftest.pytest_generate_tests 生成；语料文件可用环境变量 API_CASES 替换
+    """
+    with allure.step("读取用例"):
+        case = api_case.load()
+        allure.dynamic.title(api_case.case_id)
+        allure.attach(json.dumps(case, ensure_ascii=False, indent=2),
+                      name="case", attachment_type=allure.attachment_type.JSON)
+        method = case.get("method", "POST")
+        url = case.get("url") or get_base_url + case["path"]
+        headers = get_headers(with_auth=case.get("auth", True))
+        headers.update(case.get("headers", {}))
+        if "json" in case:
+            payload = case["json"]
+        elif "patch" in case:
+            payload = build_payload(case["patch"])
+        else:
+            payload = None
+    with allure.step(f"{method} 请求到mock服务"):
+        response = api_client.request(method, url, json=payload, headers=headers)
+        logger.info(f"用例 {api_case.case_id}（第 {api_case.line_no} 行）响应状态码: {response.status_code}")
+
+    expect = case.get("expect", {})
+    with allure.step("验证状态码"):
+        if "status" in expect:
+            assert response.status_code == expect["status"], \
+                f"状态码错误: 期望 {expect['status']}，实际 {response.status_code}"
+    if not (expect.get("json") or expect.get("has")):
+        return
+    with allure.step("验证响应字段"):
+        data = response.json()
+        for path in expect.get("has", []):
+            with check:
+                assert dig(data, path, None) is not None, f"缺少字段: {path}"
+        for path, expected in expect.get("json", {}).items():
+            with check:
+                actual = dig(data, path, None)
+                assert actual == expected, f"{path} 错误: 期望 {expected}，实际 {actual}"
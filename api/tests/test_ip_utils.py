@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : test_ip_utils.py
+Time    : 2026/3/15
+Author  : xixi
+File    : api/tests
+#-------------------------------------------------------------
+"""
+import threading
+import time
+
+import allure
+import pytest
+
+from utils import ip_utils
+from utils.ip_utils import IPInfoFetcher, stub_provider
+
+HK = {'ip': '203.198.0.1', 'country_code': 'HK'}
+TW = {'ip': '1.160.0.1', 'country_code': 'TW'}
+
+
+class FakeClock:
+    """替换 ip_utils 中的 time，用于推进缓存时间"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    @staticmethod
+    def perf_counter():
+        return time.perf_counter()
+
+
+def counting_provider(info, name='counting'):
+    """返回固定 IP 信息并记录调用次数的服务商"""
+    provider = {'name': name, 'timeout': 0, 'calls': 0}
+
+    def fetch(proxies):
+        provider['calls'] += 1
+        return dict(info)
+
+    provider['fetch'] = fetch
+    return provider
+
+
+def failing_provider(error, name='failing'):
+    def fetch(proxies):
+        raise error
+    return {'name': name, 'timeout': 0, 'fetch': fetch}
+
+
+@pytest.fixture(autouse=True)
+def isolated_fetcher(tmp_path, monkeypatch):
+    """磁盘缓存指向临时目录，清空环境变量和进程内缓存，用例结束后恢复默认服务商"""
+    monkeypatch.setattr(ip_utils, 'IP_INFO_CACHE', str(tmp_path / 'ip_info.json'))
+    monkeypatch.setattr(ip_utils, 'IP_INFO_TTL', 60)
+    monkeypatch.delenv('IP_INFO_STUB', raising=False)
+    monkeypatch.delenv('FORCE_REGION', raising=False)
+    IPInfoFetcher.set_providers(None)
+    yield tmp_path / 'ip_info.json'
+    IPInfoFetcher.set_providers(None)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ip_utils, 'time', fake)
+    return fake
+
+
+@pytest.fixture
+def default_provider(monkeypatch):
+    """把“真实”服务商换成计数桩：走的是默认服务商的缓存路径，但不访问网络"""
+    provider = counting_provider(HK, name='default')
+    monkeypatch.setattr(IPInfoFetcher, 'IP_SERVICES', [provider])
+    return provider
+
+
+@pytest.mark.api
+@allure.feature("utils/ip_utils IP 地区查询")  # Allure 特性标记
+class TestIPInfoRace:
+
+    @allure.story("并发请求，第一个有效结果直接返回，不等慢的服务商")
+    def test_first_valid_wins_while_slow_provider_runs(self):
+        release = threading.Event()
+
+        def slow(proxies):
+            release.wait(5)
+            return dict(TW)
+
+        IPInfoFetcher.set_providers([{'name': 'slow', 'timeout': 5, 'fetch': slow},
+                                     stub_provider(HK, name='fast')])
+        try:
+            start = time.perf_counter()
+            assert IPInfoFetcher.get_ip_info() == HK
+            assert time.perf_counter() - start < 2
+        finally:
+            release.set()
+
+    @allure.story("抛错和无效结果的服务商被跳过")
+    def test_invalid_and_failing_providers_are_skipped(self):
+        def late(proxies):
+            time.sleep(0.05)
+            return dict(TW)
+
+        IPInfoFetcher.set_providers([
+            failing_provider(ConnectionError("boom")),
+            stub_provider({'ip': '1.1.1.1', 'country_code': 'XYZ'}, name='bad-code'),
+            {'name': 'none', 'timeout': 0, 'fetch': lambda proxies: None},
+            {'name': 'late', 'timeout': 1, 'fetch': late},
+        ])
+        assert IPInfoFetcher.get_ip_info() == TW
+
+    @allure.story("全部失败返回 None")
+    def test_all_providers_fail(self):
+        IPInfoFetcher.set_providers([failing_provider(ValueError("bad json")),
+                                     stub_provider({'country_code': ''}, name='empty')])
+        assert IPInfoFetcher.get_ip_info() is None
+        assert IPInfoFetcher.detect_region_from_ip() is None
+
+
+@pytest.mark.api
+@allure.feature("utils/ip_utils IP 地区查询")  # Allure 特性标记
+class TestIPInfoCache:
+
+    @allure.story("进程内和磁盘缓存在 IP_INFO_TTL 内命中，过期后重新查询")
+    def test_memory_and_disk_cache_expire(self, default_provider, clock, isolated_fetcher):
+        assert IPInfoFetcher.get_ip_info() == HK
+        assert default_provider['calls'] == 1
+        assert isolated_fetcher.exists()
+
+        clock.now += 59
+        assert IPInfoFetcher.get_ip_info() == HK          # 进程内缓存
+        IPInfoFetcher.clear_cache(disk=False)
+        assert IPInfoFetcher.get_ip_info() == HK          # 磁盘缓存（模拟另一个 worker）
+        assert default_provider['calls'] == 1
+
+        clock.now += 1                                    # 写入后 60s，两级缓存都过期
+        assert IPInfoFetcher.get_ip_info() == HK
+        assert default_provider['calls'] == 2
+
+    @allure.story("refresh=True 忽略缓存")
+    def test_refresh_bypasses_cache(self, default_provider, clock):
+        IPInfoFetcher.get_ip_info()
+        IPInfoFetcher.get_ip_info(refresh=True)
+        assert default_provider['calls'] == 2
+        IPInfoFetcher.get_ip_info()
+        assert default_provider['calls'] == 2
+
+    @allure.story("代理配置不同，缓存分开")
+    def test_cache_is_keyed_by_proxy(self, default_provider, clock):
+        IPInfoFetcher.get_ip_info()
+        IPInfoFetcher.get_ip_info(use_proxy=True, proxies={'https': 'http://user:pw@proxy:8080'})
+        assert default_provider['calls'] == 2
+        assert 'pw@proxy' not in open(ip_utils.IP_INFO_CACHE, encoding='utf-8').read()
+
+    @allure.story("替换过的服务商不读写磁盘缓存")
+    def test_stubbed_providers_skip_disk_cache(self, default_provider, monkeypatch, isolated_fetcher):
+        stub = counting_provider(TW, name='stub')
+        IPInfoFetcher.set_providers([stub])
+        assert IPInfoFetcher.get_ip_info() == TW
+        assert IPInfoFetcher.get_ip_info() == TW
+        assert stub['calls'] == 2
+        monkeypatch.setenv('IP_INFO_STUB', 'sg')
+        assert IPInfoFetcher.get_ip_info()['country_code'] == 'SG'
+        assert not isolated_fetcher.exists()
+        assert default_provider['calls'] == 0
+
+
+@pytest.mark.api
+@allure.feature("utils/ip_utils IP 地区查询")  # Allure 特性标记
+class TestIPInfoStub:
+
+    @allure.story("IP_INFO_STUB 支持国家代码和 JSON")
+    @pytest.mark.parametrize("value, expected", [
+        ("hk", "HK"),
+        ('{"ip": "8.8.8.8", "country_code": "US"}', "US"),
+    ])
+    def test_stub_from_env(self, monkeypatch, value, expected):
+        monkeypatch.setenv('IP_INFO_STUB', value)
+        assert IPInfoFetcher.get_ip_info()['country_code'] == expected
+
+    @allure.story("IP_INFO_STUB 不是合法 JSON 时忽略并记录错误，不抛异常")
+    @pytest.mark.parametrize("value", ["{bad", '{"a": 1'])
+    def test_malformed_stub_is_ignored(self, monkeypatch, default_provider, clock, value):
+        monkeypatch.setenv('IP_INFO_STUB', value)
+        assert ip_utils._stub_from_env() is None
+        assert IPInfoFetcher.get_ip_info() == HK
+        assert default_provider['calls'] == 1
+
+    @allure.story("FORCE_REGION 优先，指定 IP 时查离线表")
+    def test_detect_region(self, monkeypatch):
+        monkeypatch.setenv('IP_INFO_STUB', 'MY')
+        assert IPInfoFetcher.detect_region_from_ip() == 'MY'
+        assert IPInfoFetcher.detect_region_from_ip(ip='203.198.0.1') == 'HK'
+        assert IPInfoFetcher.detect_region_from_ip(ip='126.1.1.1') == 'JP'
+        assert IPInfoFetcher.detect_region_from_ip(ip='192.0.2.1') is None
+        monkeypatch.setenv('FORCE_REGION', 'tw')
+        assert IPInfoFetcher.detect_region_from_ip(ip='203.198.0.1') == 'TW'
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : test_payloads.py
+Time    : 2026/3/11
+Author  : xixi
+File    : api/tests
+#-------------------------------------------------------------
+"""
+import copy
+import json
+
+import allure
+import pytest
+
+from api.payloads import (CART_TEMPLATE, DELETE, PayloadTemplate, apply_patch, build_payload, cart_item,
+                          iter_cart_variants, order_item)
+
+
+@pytest.mark.api
+@allure.feature("api/payloads 请求体构造")  # Allure 特性标记
+class TestPayloads:
+
+    @allure.story("patch 只返回新请求体，模板不变")
+    def test_patch_leaves_template_unchanged(self):
+        before = json.dumps(CART_TEMPLATE.base, ensure_ascii=False, sort_keys=True)
+        payload = build_payload({"cart_values.cart.items.0.sale_price": 0.001,
+                                 "billing_country": "HK"}, language="en_US")
+        assert payload["cart_values"]["cart"]["items"][0]["sale_price"] == 0.001
+        assert payload["billing_country"] == "HK" and payload["language"] == "en_US"
+        assert json.dumps(CART_TEMPLATE.base, ensure_ascii=False, sort_keys=True) == before
+        # 未 patch 的子树与模板共享，不复制
+        assert payload["order_items"] is CART_TEMPLATE.base["order_items"]
+        assert payload["cart_values"]["invoice"] is CART_TEMPLATE.base["cart_values"]["invoice"]
+
+    @allure.story("DELETE 删除键和列表元素")
+    def test_delete_removes_keys_and_list_entries(self):
+        payload = build_payload({"coupon_code": DELETE, "cart_values.cart.items.0": DELETE})
+        assert "coupon_code" not in payload
+        assert [item["sku"] for item in payload["cart_values"]["cart"]["items"]] == ["四季被藍綠米"]
+        assert "coupon_code" in CART_TEMPLATE.base
+        assert len(CART_TEMPLATE.base["cart_values"]["cart"]["items"]) == 2
+
+    @allure.story("共享子树只读，误改直接报错")
+    @pytest.mark.parametrize("mutate", [
+        lambda p: p["cart_values"].__setitem__("payment", {"x": 1}),
+        lambda p: p["cart_values"]["billing"].update(billingCountry="HK"),
+        lambda p: p["cart_values"]["shipping"].pop("appliedShippingMethodId"),
+        lambda p: copy.deepcopy(p)["cart_values"]["invoice"].clear(),
+        lambda p: order_item("純泥G", 2).__setitem__("quantity", 3),
+    ], ids=["setitem", "update", "pop", "deepcopy", "cached-item"])
+    def test_shared_subtree_is_readonly(self, mutate):
+        with pytest.raises(TypeError):
+            mutate(build_payload())
+        assert build_payload()["cart_values"]["billing"] == {"billingCountry": "TW"}
+
+    @allure.story("apply_patch 支持列表路径和 extend 叠加模板")
+    def test_extend_stacks_patches(self):
+        hk = CART_TEMPLATE.extend({"cart_values.billing.billingCountry": "HK"}, country_code="HK")
+        assert isinstance(hk, PayloadTemplate)
+        payload = hk.build(language="zh_HK")
+        assert (payload["country_code"], payload["language"]) == ("HK", "zh_HK")
+        assert payload["cart_values"]["billing"]["billingCountry"] == "HK"
+        assert CART_TEMPLATE.build()["country_code"] == "TW"
+        assert apply_patch({"a": [{"b": 1}]}, {("a", 0, "b"): 2}) == {"a": [{"b": 2}]}
+
+    @allure.story("iter_cart_variants 按笛卡尔积生成请求体")
+    def test_iter_cart_variants(self):
+        variants = list(iter_cart_variants(skus=("純泥G", ("純泥G", "四季被藍綠米")),
+                                           quantities=(1, 2), coupons=((), (4034, 1292))))
+        assert len(variants) == 2 * 2 * 2
+        assert len({v.case_id for v in variants}) == len(variants)
+        variant = next(v for v in variants if v.skus == ("純泥G", "四季被藍綠米")
+                       and v.quantity == 2 and v.coupons == (4034, 1292))
+        payload = variant.payload
+        assert variant.case_id == "純泥G+四季被藍綠米-q2-c4034+1292-s2"
+        assert [(i["sku"], i["quantity"]) for i in payload["order_items"]] == [("純泥G", 2), ("四季被藍綠米", 2)]
+        assert payload["cart_values"]["cart"]["items"][1] is cart_item("四季被藍綠米", 2)
+        assert payload["manual_input_coupon_ids"] == (4034, 1292)
+        assert payload["cart_values"]["coupon"]["manualInputCouponIds"] == (4034, 1292)
+        json.dumps(payload, ensure_ascii=False)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : test_region_resolver.py
+Time    : 2026/3/16
+Author  : xixi
+File    : api/tests
+#-------------------------------------------------------------
+"""
+import allure
+import pytest
+
+from utils.region_resolver import (IP_RANGES_FILE, SUPPORTED_REGIONS, RegionResolver, forced_region,
+                                   get_resolver, region_matrix)
+
+IP_RANGES_CSV = """\
+# cidr,country
+10.0.0.0/24,TW
+10.0.1.0/24,tw
+10.0.3.0/24,HK
+10.0.3.128/25,JP
+10.0.4.0/24,SG
+bad-line
+10.0.5.0/33,MY
+2001:db8::/32,TW
+"""
+
+
+@pytest.fixture
+def resolver(tmp_path):
+    path = tmp_path / "ip_ranges.csv"
+    path.write_text(IP_RANGES_CSV, encoding="utf-8")
+    return RegionResolver.from_file(str(path))
+
+
+@pytest.fixture(autouse=True)
+def _clear_region_env(monkeypatch):
+    monkeypatch.delenv("FORCE_REGION", raising=False)
+    monkeypatch.delenv("REGION_MATRIX", raising=False)
+
+
+@pytest.mark.api
+@allure.feature("utils/region_resolver 离线 IP 地区解析")  # Allure 特性标记
+class TestRegionResolver:
+
+    @allure.story("加载时合并相邻同国家段，跳过重叠段、格式错误行和 IPv6")
+    def test_load_merges_and_skips(self, resolver):
+        # 10.0.0.0/24 + 10.0.1.0/24 合并；JP 与 HK 重叠被忽略；坏行、/33、IPv6 跳过
+        assert len(resolver) == 3
+        assert resolver.countries() == {"TW": 1, "HK": 1, "SG": 1}
+
+    @allure.story("lookup 按段二分查找")
+    @pytest.mark.parametrize("ip, expected", [
+        ("10.0.0.0", "TW"),
+        ("10.0.1.255", "TW"),
+        ("10.0.2.1", None),        # 两段之间的空隙
+        ("10.0.3.200", "HK"),      # 重叠的 JP 段已忽略
+        ("10.0.4.255", "SG"),
+        ("10.0.5.1", None),
+        ("9.255.255.255", None),
+        ("2001:db8::1", None),     # IPv6
+        ("not-an-ip", None),
+        ("", None),
+        (None, None),
+    ])
+    def test_lookup(self, resolver, ip, expected):
+        assert resolver.lookup(ip) == expected
+
+    @allure.story("sample_ip 取该国家第一个段中的地址")
+    def test_sample_ip(self, resolver):
+        assert resolver.sample_ip("tw") == "10.0.0.1"
+        assert resolver.lookup(resolver.sample_ip("HK")) == "HK"
+        assert resolver.sample_ip("JP") is None
+        # 单地址段没有可跳过的网络地址
+        assert RegionResolver([(1, 1, "TW")]).sample_ip("TW") == "0.0.0.1"
+
+    @allure.story("FORCE_REGION 优先于 IP 查表")
+    def test_forced_region_overrides_lookup(self, resolver, monkeypatch):
+        assert forced_region() is None
+        assert resolver.region_for("10.0.3.1") == "HK"
+        assert resolver.region_for(None) is None
+        monkeypatch.setenv("FORCE_REGION", " sg ")
+        assert forced_region() == "SG"
+        assert resolver.region_for("10.0.3.1") == "SG"
+        assert resolver.region_for(None) == "SG"
+
+    @allure.story("REGION_MATRIX 解析")
+    @pytest.mark.parametrize("value, expected", [
+        (None, [None]),
+        ("  ", [None]),
+        ("all", list(SUPPORTED_REGIONS) + ["JP"]),
+        ("ALL", list(SUPPORTED_REGIONS) + ["JP"]),
+        ("TW,HK", ["TW", "HK"]),
+        (" tw , ,hk,", ["TW", "HK"]),
+    ])
+    def test_region_matrix(self, monkeypatch, value, expected):
+        if value is not None:
+            monkeypatch.setenv("REGION_MATRIX", value)
+        assert region_matrix() == expected
+
+    @allure.story("仓库自带的 IP 段表覆盖所有支持的地区")
+    def test_shipped_ranges_cover_supported_regions(self):
+        resolver = get_resolver(IP_RANGES_FILE)
+        for region in SUPPORTED_REGIONS:
+            ip = resolver.sample_ip(region)
+            assert ip is not None, f"ip_ranges.csv 中没有 {region}"
+            assert resolver.lookup(ip) == region
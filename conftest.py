@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : conftest.py
+Time    : 2026/3/14
+Author  : xixi
+File    : dogcatstar
+#-------------------------------------------------------------
+"""
+# 根目录 conftest：ui 和 api 用例共用的会话级钩子
+import pytest
+
+from utils.log import SINKS, configure_logging, set_current_test, shutdown_logging
+
+
+def pytest_addoption(parser):
+    """日志相关命令行选项（未指定时取环境变量 LOG_LEVEL / LOG_SINKS / LOG_DIR）"""
+    group = parser.getgroup("pick-logging", "项目日志（utils.log）")
+    group.addoption(
+        "--logger-level",
+        action="store",
+        default=None,
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+        help="Minimum level of the project logger (default: $LOG_LEVEL or DEBUG)"
+    )
+    group.addoption(
+        "--logger-sinks",
+        action="store",
+        default=None,
+        help=f"Comma-separated log outputs, subset of {','.join(SINKS)} "
+             "(default: $LOG_SINKS or console,file)"
+    )
+    group.addoption(
+        "--logger-dir",
+        action="store",
+        default=None,
+        help="Directory for the per-worker JSON log files (default: $LOG_DIR or Logs/)"
+    )
+
+
+def pytest_configure(config):
+    """按命令行选项初始化日志；只创建 handler，不做磁盘操作"""
+    try:
+        configure_logging(
+            level=config.getoption("--logger-level"),
+            sinks=config.getoption("--logger-sinks"),
+            log_dir=config.getoption("--logger-dir"),
+        )
+    except ValueError as e:
+        raise pytest.UsageError(str(e))
+
+
+def pytest_runtest_logstart(nodeid, location):
+    """之后的日志带上当前用例的 nodeid"""
+    set_current_test(nodeid)
+
+
+def pytest_runtest_logfinish(nodeid, location):
+    set_current_test(None)
+
+
+def pytest_sessionfinish(session):
+    """会话结束时写完日志队列（xdist 下每个 worker 各自执行）"""
+    shutdown_logging()
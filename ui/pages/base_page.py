@@ -8,13 +8,105 @@ Author  : xixi
 File    : api/pages
 #-------------------------------------------------------------
 """
-import configparser
 import os
-from pathlib import Path
+import re
+import time
+from functools import lru_cache
 
 from playwright.sync_api import Page
+from utils.config_registry import ConfigRegistry
 from utils.log import logger
-from typing import Optional, Callable, Type
+from typing import Optional, Callable, Type, Dict, Sequence
+
+# 页面内的多特征竞速等待：一次 evaluate 内按退避间隔轮询，任一特征满足即返回其下标
+# spec: {css, text, mode}，mode 为 None / 'has-text'（包含）/ 'text-is'（全等）/ 'text'（文本节点）
+_WAIT_FOR_ANY_SCRIPT = """async ({specs, state, timeout, interval, maxInterval, factor}) => {
+    const norm = s => (s || '').replace(/\\s+/g, ' ').trim().toLowerCase();
+    const visible = el => {
+        if (!el || !el.isConnected) return false;
+        if (state === 'attached') return true;
+        const style = getComputedStyle(el);
+        if (style.visibility !== 'visible') return false;
+        const rect = el.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0;
+    };
+    const textMatches = (el, spec) => {
+        const text = norm(el.textContent);
+        return spec.mode === 'text-is' ? text === spec.text : text.includes(spec.text);
+    };
+    const find = spec => {
+        if (spec.mode === 'text') {
+            const walker = document.createTreeWalker(document.body || document.documentElement, NodeFilter.SHOW_TEXT);
+            while (walker.nextNode()) {
+                const el = walker.currentNode.parentElement;
+                if (norm(walker.currentNode.data).includes(spec.text) && visible(el)) return el;
+            }
+            return null;
+        }
+        let nodes;
+        try {
+            nodes = document.querySelectorAll(spec.css);
+        } catch (e) {
+            return null;
+        }
+        for (const el of nodes) {
+            if ((!spec.mode || textMatches(el, spec)) && visible(el)) return el;
+        }
+        return null;
+    };
+    const started = performance.now();
+    const deadline = started + timeout;
+    let delay = interval;
+    while (true) {
+        for (let index = 0; index < specs.length; index++) {
+            const el = find(specs[index]);
+            if (el) {
+                return {index, text: (el.textContent || '').trim().slice(0, 200),
+                        elapsed_ms: Math.round(performance.now() - started)};
+            }
+        }
+        const remaining = deadline - performance.now();
+        if (remaining <= 0) return null;
+        await new Promise(resolve => setTimeout(resolve, Math.min(delay, remaining)));
+        delay = Math.min(delay * factor, maxInterval);
+    }
+}"""
+
+# 支持的 Playwright 选择器子集：css、css=、text=、末尾的 :has-text() / :text-is()
+_TEXT_ENGINE = re.compile(r"""^text=(?P<q>["']?)(?P<text>.*)(?P=q)$""", re.S)
+_TEXT_PSEUDO = re.compile(r"""^(?P<css>.*?):(?P<mode>has-text|text-is)\((?P<q>["'])(?P<text>.*)(?P=q)\)$""", re.S)
+
+
+@lru_cache(maxsize=256)
+def compile_indicator(selector: str) -> Dict[str, Optional[str]]:
+    """
+    将 Playwright 选择器转换为页面内可执行的匹配规则
+    :param selector: 如 "h5:has-text('切換網站及語系')"、"text=國家 / 地區"、'[data-testid="dialog-paper"]'
+    :return: {'css': ..., 'text': ..., 'mode': ...}
+    :raises ValueError: 不支持的选择器（xpath 等）
+    """
+    raw = selector.strip()
+    if raw.startswith('css='):
+        raw = raw[4:].strip()
+
+    match = _TEXT_ENGINE.match(raw)
+    if match:
+        return {'css': None, 'text': _normalize_text(match.group('text')), 'mode': 'text'}
+
+    match = _TEXT_PSEUDO.match(raw)
+    if match:
+        return {'css': match.group('css').strip() or '*',
+                'text': _normalize_text(match.group('text')),
+                'mode': match.group('mode')}
+
+    if raw.startswith(('xpath=', '//', 'text=')) or ':has-text(' in raw or ':text-is(' in raw:
+        raise ValueError(f"wait_for_any 不支持的选择器: {selector}")
+    return {'css': raw, 'text': None, 'mode': None}
+
+
+def _normalize_text(text: str) -> str:
+    """与页面内 norm() 一致：合并空白、去首尾、转小写（Playwright 文本匹配忽略大小写）"""
+    return ' '.join(text.split()).lower()
 
 
 
@@ -27,29 +119,9 @@ class BasePage:
         :param page: Playwright的Page对象，表示当前操作的页面
         """
         self.page = page
-        self.config = configparser.ConfigParser()
-        self.param = configparser.ConfigParser()
-        root_dir = Path(__file__).parent.parent.parent
-        config_path = root_dir / 'config' / 'locators.ini'
-        params_path = root_dir / 'config' / 'config.ini'
-
-        self.param.read(params_path)
-        # params_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'config.ini')
-        # self.config.read(config_path)
-
-
-        if not config_path.exists():
-            # 备选：从当前工作目录查找
-            config_path = Path.cwd() / 'config' / 'locators.ini'
-
-        if not config_path.exists():
-            raise FileNotFoundError(f"Config file not found at {config_path}")
-
-        self.config.read(config_path)
-
-        print(f"✅ Loaded config sections: {self.config.sections()}")
-        config_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'locators.ini')
-        self.config.read(config_path)
+        # 定位器与参数由进程级注册表统一解析，页面对象只拿只读视图
+        self.config = ConfigRegistry.locators()
+        self.param = ConfigRegistry.parameters()
 
     def navigate(self, url: str, timeout: int = 60000):
         """
@@ -192,6 +264,48 @@ class BasePage:
             self.page.wait_for_load_state("networkidle")
             return self.page
 
+    def wait_for_any(self, indicators: Sequence[str], timeout: int = 10000, state: str = 'visible',
+                     interval: int = 100, max_interval: int = 1000, factor: float = 2.0) -> Optional[Dict]:
+        """
+        在浏览器内同时等待多个特征，任一出现即返回
+        轮询在页面内完成（间隔从 interval 起按 factor 递增到 max_interval），整个等待只有一次往返；
+        等待期间页面跳转导致执行上下文销毁时，在剩余时间内重新发起
+        :param indicators: 特征选择器列表，按优先级排列
+        :param timeout: 总超时时间（毫秒）
+        :param state: 'visible' 要求可见，'attached' 只要求存在
+        :param interval: 首次轮询间隔（毫秒）
+        :param max_interval: 轮询间隔上限（毫秒）
+        :param factor: 轮询间隔的增长倍数
+        :return: {'index', 'indicator', 'text', 'elapsed_ms'}，超时返回 None
+        """
+        specs = [compile_indicator(indicator) for indicator in indicators]
+        start = time.monotonic()
+        deadline = start + timeout / 1000
+
+        while True:
+            remaining = int((deadline - time.monotonic()) * 1000)
+            if remaining <= 0:
+                return None
+            try:
+                hit = self.page.evaluate(_WAIT_FOR_ANY_SCRIPT, {
+                    'specs': specs, 'state': state, 'timeout': remaining,
+                    'interval': interval, 'maxInterval': max_interval, 'factor': factor,
+                })
+            except Exception as e:
+                # 导航中执行上下文被销毁，等新文档就绪后继续等待
+                logger.debug("wait_for_any 等待被页面跳转打断，重试: %s", e)
+                try:
+                    self.page.wait_for_load_state('domcontentloaded', timeout=max(remaining, 1))
+                except Exception:
+                    return None
+                continue
+
+            if hit is None:
+                return None
+            hit['indicator'] = indicators[hit['index']]
+            hit['elapsed_ms'] = round((time.monotonic() - start) * 1000, 2)
+            return hit
+
     def is_login_page(self) -> bool:
         """判断当前页面是否为登录页（根据页面特征）"""
         login_indicators = [
@@ -8,6 +8,8 @@ Author  : xixi
 File    : api/pages
 #-------------------------------------------------------------
 """
+import logging
+
 from playwright.sync_api import Page
 
 from ui.pages.base_page import BasePage
@@ -16,6 +18,26 @@ import re
 from ui.pages.login_page import LoginPage
 
 
+# 购物车商品行批量读取脚本：只取原始文本/属性，解析统一交给 CartPage._parse_cart_row
+_CART_ROWS_SCRIPT = """(rows, sel) => rows.map(row => {
+    const first = selector => row.querySelector(selector);
+    const text = selector => {
+        const el = first(selector);
+        return el ? el.textContent : null;
+    };
+    const quantity = first(sel.quantity);
+    const link = first('a[href*="/product/"]');
+    return {
+        name: text(sel.name),
+        spec: text(sel.spec),
+        price: text(sel.price),
+        quantity: quantity ? quantity.getAttribute('value') : null,
+        link: link ? link.getAttribute('href') : null,
+        has_remove_button: first(sel.remove) !== null,
+    };
+})"""
+
+
 class CartPage(BasePage):
     def __init__(self, page: Page):
         super().__init__(page)
@@ -39,62 +61,90 @@ class CartPage(BasePage):
 
 
 
-    def get_cart_items(self) -> list:
+    def get_cart_items(self, batched: bool = True) -> list:
         """
         获取购物车中所有商品的详细信息，返回字典列表。
         每个字典包含商品名称、规格、单价、数量、小计、链接等。
+        :param batched: True 时一次页面内脚本读取所有商品行；False 时逐行逐字段读取
         """
         items = []
         try:
             # 等待至少一个商品容器出现
             self.page.wait_for_selector(self.selectors['cart_items'], timeout=10000)
-            # 获取所有商品容器
-            containers = self.page.locator(self.selectors['cart_items']).all()
-            logger.info(f"找到 {len(containers)} 个商品容器")
-
-            for idx, container in enumerate(containers):
-                item = {}
-
-                # 1. 商品名称（在 h6 内）
-                name_el = container.locator(self.selectors['item_name']).first
-                item['name'] = name_el.text_content().strip() if name_el.count() > 0 else ""
-
-                # 2. 商品规格
-                spec_el = container.locator(self.selectors['item_spec']).first
-                item['spec'] = spec_el.text_content().strip() if spec_el.count() > 0 else ""
-
-                # 3. 商品单价（提取数字）
-                price_el = container.locator(self.selectors['item_price']).first
-                price_text = price_el.text_content() if price_el.count() > 0 else "0"
-                price_match = re.search(r'\d+', price_text)
-                item['price'] = int(price_match.group()) if price_match else 0
-
-                # 4. 商品数量
-                qty_el = container.locator(self.selectors['item_quantity']).first
-                qty_value = qty_el.get_attribute('value') if qty_el.count() > 0 else "1"
-                item['quantity'] = int(qty_value) if qty_value.isdigit() else 1
 
-                # 5. 小计
-                item['subtotal'] = item['price'] * item['quantity']
-
-                # 6. 商品链接（第一个包含 /product/ 的 a 标签）
-                link_el = container.locator('a[href*="/product/"]').first
-                item['link'] = link_el.get_attribute('href') if link_el.count() > 0 else ""
-
-                # 7. 是否有删除按钮
-                remove_el = container.locator(self.selectors['item_remove_button']).first
-                item['has_remove_button'] = remove_el.count() > 0
-
-                items.append(item)
+            if batched:
+                rows = self.page.eval_on_selector_all(
+                    self.selectors.css('cart_items'), _CART_ROWS_SCRIPT, {
+                        'name': self.selectors.css('item_name'),
+                        'spec': self.selectors.css('item_spec'),
+                        'price': self.selectors.css('item_price'),
+                        'quantity': self.selectors.css('item_quantity'),
+                        'remove': self.selectors.css('item_remove_button'),
+                    })
+                logger.info(f"找到 {len(rows)} 个商品容器")
+                items = [self._parse_cart_row(row) for row in rows]
+            else:
+                items = self._get_cart_items_by_row()
 
             logger.info(f"成功获取 {len(items)} 个商品的详细信息")
-            logger.info(f"cart_items: {items}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("cart_items: %s", items)
             return items
 
         except Exception as e:
             logger.exception(f"获取购物车商品信息失败: {e}")
             return []
 
+    def _get_cart_items_by_row(self) -> list:
+        """逐行逐字段读取购物车商品（每行约 12 次协议调用，仅用于对比和排查）"""
+        rows = []
+        # 获取所有商品容器
+        containers = self.page.locator(self.selectors['cart_items']).all()
+        logger.info(f"找到 {len(containers)} 个商品容器")
+
+        for container in containers:
+            # 1. 商品名称（在 h6 内）
+            name_el = container.locator(self.selectors['item_name']).first
+            # 2. 商品规格
+            spec_el = container.locator(self.selectors['item_spec']).first
+            # 3. 商品单价
+            price_el = container.locator(self.selectors['item_price']).first
+            # 4. 商品数量
+            qty_el = container.locator(self.selectors['item_quantity']).first
+            # 5. 商品链接（第一个包含 /product/ 的 a 标签）
+            link_el = container.locator('a[href*="/product/"]').first
+            # 6. 是否有删除按钮
+            remove_el = container.locator(self.selectors['item_remove_button']).first
+
+            rows.append(self._parse_cart_row({
+                'name': name_el.text_content() if name_el.count() > 0 else None,
+                'spec': spec_el.text_content() if spec_el.count() > 0 else None,
+                'price': price_el.text_content() if price_el.count() > 0 else None,
+                'quantity': qty_el.get_attribute('value') if qty_el.count() > 0 else None,
+                'link': link_el.get_attribute('href') if link_el.count() > 0 else None,
+                'has_remove_button': remove_el.count() > 0,
+            }))
+        return rows
+
+    @staticmethod
+    def _parse_cart_row(row: dict) -> dict:
+        """把页面读取到的原始文本解析为商品字典（价格取第一个数字，数量非数字时按 1 计）"""
+        item = {
+            'name': (row.get('name') or "").strip(),
+            'spec': (row.get('spec') or "").strip(),
+        }
+
+        price_match = re.search(r'\d+', row.get('price') or "0")
+        item['price'] = int(price_match.group()) if price_match else 0
+
+        qty_value = row.get('quantity') or "1"
+        item['quantity'] = int(qty_value) if qty_value.isdigit() else 1
+
+        item['subtotal'] = item['price'] * item['quantity']
+        item['link'] = row.get('link') or ""
+        item['has_remove_button'] = bool(row.get('has_remove_button'))
+        return item
+
 
 
     def get_total_amount(self):
@@ -110,7 +160,8 @@ class CartPage(BasePage):
             self.page.wait_for_selector(self.selectors['cart_items'], timeout=10000)
             # 定位所有商品容器
             items = self.page.locator(self.selectors['cart_items']).all()
-            logger.info(f"购物车内商品：: {items}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("购物车内商品：%s", items)
             count = len(items)
             logger.info(f"购物车商品数量: {count}")
             return count
@@ -14,14 +14,26 @@ import time
 from typing import List, Optional, Dict
 from playwright.sync_api import Page
 from ui.pages.base_page import BasePage
+from utils.cart_sync import CartSync
 from utils.log import logger
 
+# 等待数量输入框的 value 满足条件（与 get_cart_sidebar_quantity 一样读取 value 属性）
+_QUANTITY_CHANGED_SCRIPT = """([selector, previous]) => {
+    const el = document.querySelector(selector);
+    return el !== null && el.getAttribute('value') !== previous;
+}"""
+_QUANTITY_EQUALS_SCRIPT = """([selector, expected]) => {
+    const el = document.querySelector(selector);
+    return el !== null && el.getAttribute('value') === expected;
+}"""
+
 
 class CartSidebarPage(BasePage):
 
     def __init__(self, page: Page):
         super().__init__(page)
         self.selectors = self.config["CART_SIDEBAR_PAGE"]
+        self.cart_sync = CartSync(page)
 
     # -------------------- 判断弹窗是否出现 --------------------
 
@@ -139,21 +151,18 @@ class CartSidebarPage(BasePage):
                 'text=購買此商品可獲得',  # 积分提示
             ]
 
-            start_time = time.time()
-            while (time.time() - start_time) * 1000 < timeout:
-                for indicator in modal_indicators:
-                    locator = self.page.locator(indicator).first
-                    if locator.count() > 0 and locator.is_visible():
-                        logger.info(f"检测到弹窗特征: {indicator}")
-                        # 获取弹窗内容并分析
-                        modal_content = self.get_modal_content()  # 假设您已有此方法
-                        analysis = self.analyze_modal_content(modal_content)
-                        return {
-                            "detected_by": indicator,
-                            "content": modal_content,
-                            "analysis": analysis
-                        }
-                time.sleep(0.5)
+            # 在浏览器内同时等待所有特征，任一可见即返回
+            hit = self.wait_for_any(modal_indicators, timeout=timeout)
+            if hit:
+                logger.info(f"检测到弹窗特征: {hit['indicator']}（{hit['elapsed_ms']}ms）")
+                # 获取弹窗内容并分析
+                modal_content = self.get_modal_content()
+                analysis = self.analyze_modal_content(modal_content)
+                return {
+                    "detected_by": hit['indicator'],
+                    "content": modal_content,
+                    "analysis": analysis
+                }
 
             # 超时后的调试信息
             logger.warning("未检测到弹窗，当前页面信息:")
@@ -226,7 +235,7 @@ class CartSidebarPage(BasePage):
         :param series_name: 系列名称
         """
         try:
-            selector = self.selectors['series_button_template'].replace('{series_name}', series_name)
+            selector = self.selectors.render('series_button_template', series_name=series_name)
             return self.is_visible(selector)
         except:
             return False
@@ -257,7 +266,7 @@ class CartSidebarPage(BasePage):
         """
         try:
             # 构建选择器，例如 button:has-text("滴雞精")
-            selector = self.selectors['series_button_template'].replace('{series_name}', series_name)
+            selector = self.selectors.render('series_button_template', series_name=series_name)
             button = self.page.locator(selector)
             button.wait_for(state='visible', timeout=timeout)
             button.click()
@@ -318,16 +327,17 @@ class CartSidebarPage(BasePage):
             time.sleep(1)
             return True
         return False
-    def wait_for_cart_update(self):
-        """点击弹窗中的加入购物车按钮"""
+    def wait_for_cart_update(self, timeout: int = 15000):
+        """点击弹窗中的加入购物车按钮，并等待服务端 cart/calculate 确认"""
         try:
 
             if self.is_visible(self.selectors["add_to_cart_sidebar_button"]):
-                self.click(self.selectors["add_to_cart_sidebar_button"])
-                # 等待操作完成
-                time.sleep(2)
+                self.cart_sync.run(
+                    lambda: self.click(self.selectors["add_to_cart_sidebar_button"]),
+                    label="sidebar_add_to_cart",
+                    timeout=timeout,
+                )
                 return True
-
             else:
                 logger.info(f"无法点击加入购物车按钮")
 
@@ -336,46 +346,46 @@ class CartSidebarPage(BasePage):
             return False
 
 
-    def decrease_cart_sidebar_quantity(self) -> bool:
+    def decrease_cart_sidebar_quantity(self, timeout: int = 5000) -> bool:
         """在弹窗中减少数量"""
         if self.is_visible(self.selectors["decrease_button_cart"]):
             current_value = self.get_cart_sidebar_quantity()
-
-            # 找到减少按钮
-            decrease_buttons = self.page.query_selector_all("button")
-            for button in decrease_buttons:
-                svg = button.query_selector("svg")
-                if svg:
-                    path = svg.query_selector("path")
-                    if path:
-                        d = path.get_attribute("d")
-                        if d and "M15.6875 9.75" in d:
-                            button.click()
-                            time.sleep(0.3)
-                            new_value = self.get_cart_sidebar_quantity()
-                            return new_value < current_value
+            if not self._click_quantity_button("M15.6875 9.75", current_value, timeout):
+                return False
+            new_value = self.get_cart_sidebar_quantity()
+            return new_value < current_value
         return False
-    def increase_cart_sidebar_quantity(self) -> bool:
+    def increase_cart_sidebar_quantity(self, timeout: int = 5000) -> bool:
         """在弹窗中增加数量"""
         if self.is_visible(self.selectors["increase_button_cart"]):
             current_value = self.get_cart_sidebar_quantity()
-
-            # 找到增加按钮
-            increase_buttons = self.page.query_selector_all("button")
-            for button in increase_buttons:
-                svg = button.query_selector("svg")
-                if svg:
-                    path = svg.query_selector("path")
-                    if path:
-                        d = path.get_attribute("d")
-                        if d and "M10.6562 4.71875" in d:
-                            button.click()
-                            time.sleep(0.3)
-                            new_value = self.get_cart_sidebar_quantity()
-                            logger.info(f"添加数量1次，目前值是: {new_value}")
-                            return new_value > current_value
+            if not self._click_quantity_button("M10.6562 4.71875", current_value, timeout):
+                return False
+            new_value = self.get_cart_sidebar_quantity()
+            logger.info(f"添加数量1次，目前值是: {new_value}")
+            return new_value > current_value
         return False
-    def set_cart_sidebar_quantity(self, quantity: int) -> bool:
+
+    def _click_quantity_button(self, path_prefix: str, current_value: int, timeout: int) -> bool:
+        """
+        点击图标 path 以 path_prefix 开头的数量按钮，并等待输入框数值变化
+        数量加减只改变弹窗内的状态，不会请求 cart/calculate，因此以输入框的变化作为完成信号
+        """
+        button = self.page.locator(f'button:has(svg path[d*="{path_prefix}"])').first
+        if button.count() == 0:
+            return False
+        button.click()
+        try:
+            self.page.wait_for_function(
+                _QUANTITY_CHANGED_SCRIPT,
+                arg=[self.selectors.css("quantity_input_cart"), str(current_value)],
+                timeout=timeout,
+            )
+        except Exception as e:
+            # 已达库存上限或下限时数值不会变化，交给调用方比较前后数值
+            logger.warning(f"等待数量变化超时: {e}")
+        return True
+    def set_cart_sidebar_quantity(self, quantity: int, timeout: int = 5000) -> bool:
         """在弹窗中设置数量"""
         if self.is_visible(self.selectors["quantity_input_cart"]):
             # 清空输入框
@@ -384,7 +394,14 @@ class CartSidebarPage(BasePage):
             # 输入新值
             self.page.fill(self.selectors["quantity_input_cart"], str(quantity))
             logger.info(f"手动输入数量，目前值是: {quantity}")
-            time.sleep(0.3)
+            try:
+                self.page.wait_for_function(
+                    _QUANTITY_EQUALS_SCRIPT,
+                    arg=[self.selectors.css("quantity_input_cart"), str(quantity)],
+                    timeout=timeout,
+                )
+            except Exception as e:
+                logger.warning(f"等待数量输入框更新超时: {e}")
             return True
         return False
     def get_cart_sidebar_max_stock(self) -> Optional[int]:
@@ -420,9 +437,7 @@ class CartSidebarPage(BasePage):
         for style in styles:
             if style["name"] == style_name:
                 # 构建选择器
-                selector = self.selectors["style_button_template"].replace(
-                    "{style_name}", style_name
-                )
+                selector = self.selectors.render("style_button_template", style_name=style_name)
                 if self.is_visible(selector):
                     self.click(selector)
                     time.sleep(0.5)
@@ -463,7 +478,7 @@ class CartSidebarPage(BasePage):
         :param spec_name: 规格名称
         """
         try:
-            selector = self.selectors['specs_button_template'].replace('{spec_name}', spec_name)
+            selector = self.selectors.render('specs_button_template', spec_name=spec_name)
             return self.is_visible(selector)
         except:
             return False
@@ -501,7 +516,12 @@ class CartSidebarPage(BasePage):
             return False
 
     def click_add_to_cart_and_wait(self, timeout: int = 15000, retries: int = 3):
-
+        """
+        点击弹窗内的加入购物车按钮，等待服务端 cart/calculate 响应后返回
+        :param timeout: 每次等待响应的超时时间（毫秒）
+        :param retries: 按钮不可见或未等到响应时的重试次数
+        """
+        clicked = []
         for attempt in range(retries):
             try:
                 sidebar = self.page.locator(self.selectors['cart_sidebar_container']).first
@@ -510,14 +530,20 @@ class CartSidebarPage(BasePage):
                 add_btn = sidebar.locator(self.selectors['add_to_cart_button_text'])
                 add_btn.wait_for(state='visible', timeout=5000)
 
-                # 4. 点击按钮
-                add_btn.click()
-                time.sleep(10)
+                # 4. 点击按钮，服务端确认后即返回
+                def click():
+                    add_btn.click()
+                    clicked.append(attempt)
+
+                self.cart_sync.run(click, label="sidebar_add_to_cart", timeout=timeout)
                 logger.info(f"第 {attempt + 1} 次点击侧边栏加入购物车按钮")
                 return True
             except Exception as e:
+                if clicked:
+                    # 已经点击成功但未等到服务端确认，不再重复点击以免重复加购
+                    logger.error(f"第 {attempt + 1} 次点击后未等到 cart/calculate 响应: {e}")
+                    return False
                 logger.warning(f"第 {attempt + 1} 次尝试失败: {e}")
-                self.page.wait_for_timeout(2000)
 
         logger.error(f"经过 {retries} 次尝试，加入购物车仍未成功")
         return False
@@ -537,7 +563,7 @@ class CartSidebarPage(BasePage):
                 text = buttons.nth(i).text_content()
                 if text:
                     specs.append(text.strip())
-            logger.info(f"获取到可用规格: {specs}")
+            logger.info("获取到可用规格: %s", specs)
             return specs
         except Exception as e:
             logger.exception(f"获取规格列表失败: {e}")
@@ -558,7 +584,7 @@ class CartSidebarPage(BasePage):
                 text = buttons.nth(i).text_content()
                 if text:
                     flavors.append(text.strip())
-            logger.info(f"获取到可用口味: {flavors}")
+            logger.info("获取到可用口味: %s", flavors)
             return flavors
         except Exception as e:
             logger.exception(f"获取口味列表失败: {e}")
@@ -573,7 +599,7 @@ class CartSidebarPage(BasePage):
         """
         try:
             # 构建选择器，例如 button:has-text("鱸魚雞肉")
-            selector = self.selectors['flavor_button_template'].replace('{flavor_name}', flavor_name)
+            selector = self.selectors.render('flavor_button_template', flavor_name=flavor_name)
             button = self.page.locator(selector)
             button.wait_for(state='visible', timeout=timeout)
             button.click()
@@ -601,7 +627,7 @@ class CartSidebarPage(BasePage):
         :param flavor_name: 口味名称
         """
         try:
-            selector = self.selectors['flavor_button_template'].replace('{flavor_name}', flavor_name)
+            selector = self.selectors.render('flavor_button_template', flavor_name=flavor_name)
             return self.is_visible(selector)
         except:
             return False
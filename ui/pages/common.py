@@ -9,9 +9,10 @@ File    : api/pages
 #-------------------------------------------------------------
 """
 import datetime
-import requests
 from playwright.sync_api import Page
+from utils.ip_utils import IPInfoFetcher
 from utils.log import logger
+from utils.region_resolver import forced_region
 import os
 import json
 from ui.pages.base_page import BasePage
@@ -25,67 +26,15 @@ class CommonActions(BasePage):
 
 
     def get_region_by_ip(self,use_proxy: bool = False, proxies: Optional[Dict] = None):
-        """通过IP获取地区"""
-        # IP 服务商列表，按优先级排序
-        self.IP_SERVICES = [
-            {
-                'name': 'ipapi.co',
-                'url': 'https://ipapi.co/json/',
-                'timeout': 5,
-                'parser': lambda data: {
-                    'ip': data.get('ip'),
-                    'country_code': data.get('country_code', '').upper(),
-                    'country_name': data.get('country_name'),
-                    'city': data.get('city'),
-                    'region': data.get('region'),
-                    'timezone': data.get('timezone'),
-                    'currency': data.get('currency')
-                }
-            },
-            {
-                'name': 'ip-api.com',
-                'url': 'http://ip-api.com/json/',
-                'timeout': 5,
-                'parser': lambda data: {
-                    'ip': data.get('query'),
-                    'country_code': data.get('countryCode', '').upper(),
-                    'country_name': data.get('country'),
-                    'city': data.get('city'),
-                    'region': data.get('regionName'),
-                    'timezone': data.get('timezone'),
-                    'currency': None
-                }
-            },
-            {
-                'name': 'ipinfo.io',
-                'url': 'https://ipinfo.io/json',
-                'timeout': 5,
-                'parser': lambda data: {
-                    'ip': data.get('ip'),
-                    'country_code': data.get('country', '').upper(),
-                    'country_name': None,
-                    'city': data.get('city'),
-                    'region': data.get('region'),
-                    'timezone': data.get('timezone'),
-                    'currency': None
-                }
-            }
-        ]
-        for service in self.IP_SERVICES:
-            try:
-                response = requests.get(
-                    service['url'],
-                    timeout=service['timeout'],
-                    proxies=proxies if use_proxy else None
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    ip_info = service['parser'](data)
-                    print(f"  国家/地区: {ip_info.get('country_name', '未知')} ({ip_info.get('country_code', '未知')})")
-                    return ip_info.get('country_code')
-            except Exception as e:
-                    print(f"从 {service['name']} 获取 IP 信息失败: {e}")
-                    return None
+        """通过IP获取地区（国家代码），多个服务商并发查询并缓存，见 IPInfoFetcher；设置了 FORCE_REGION 时直接返回"""
+        region = forced_region()
+        if region:
+            return region
+        ip_info = IPInfoFetcher.get_ip_info(use_proxy, proxies)
+        if not ip_info:
+            return None
+        logger.info(f"国家/地区: {ip_info.get('country_name') or '未知'} ({ip_info.get('country_code')})")
+        return ip_info.get('country_code')
 
     def get_session_storage(self, key: str) -> str:
         """安全地获取 sessionStorage 值，自动等待页面就绪"""
@@ -95,7 +44,7 @@ class CommonActions(BasePage):
             raise RuntimeError(f"Cannot access sessionStorage on page with URL: {self.page.url}")
         try:
             value = self.page.evaluate(f"() => sessionStorage.getItem('{key}')")
-            logger.info(f"获取到 sessionStorage: {value}")
+            logger.info("获取到 sessionStorage: %s", value)
 
             if isinstance(value, str) and value.startswith('"') and value.endswith('"'):
                 value = value[1:-1]
@@ -104,7 +53,7 @@ class CommonActions(BasePage):
             # 如果仍然失败，重试一次
             self.page.wait_for_timeout(500)
             value = self.page.evaluate(f"() => sessionStorage.getItem('{key}')")
-            logger.info(f"失败重试获取到sessionStorage: {value}")
+            logger.info("失败重试获取到sessionStorage: %s", value)
             if isinstance(value, str) and value.startswith('"') and value.endswith('"'):
                 value = value[1:-1]
             return value
@@ -135,7 +84,7 @@ class CommonActions(BasePage):
         for cookie in cookies:
             if cookie['name'] == name:
                 value = cookie['value']
-                logger.info(f"获取到 cookie: {value}")
+                logger.info("获取到 cookie: %s", value)
                 if isinstance(value, str) and value.startswith('"') and value.endswith('"'):
                     value = value[1:-1]
                 return value
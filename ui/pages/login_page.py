@@ -50,41 +50,14 @@ class LoginPage(BasePage):
                 # 繁体中文标题
                 "h5:has-text('請輸入您的手機號碼')",
             ]
-            # 等待任何一个特征出现
-            start_time = time.time()
-            while (time.time() - start_time) * 1000 < timeout:
-                for indicator in modal_indicators:
-                    try:
-                        # 尝试定位元素
-                        element = self.page.locator(indicator).first
-                        # 检查元素是否存在且可见
-                        if element.count() > 0:
-                            # 检查元素是否可见
-                            if element.is_visible():
-                                # 获取元素文本内容
-                                try:
-                                    text_content = element.text_content()
-                                except:
-                                    pass
-                                # 获取弹窗内容
-                                modal_content = self.get_modal_content()
-
-                                # 分析弹窗内容
-                                modal_analysis = self.analyze_modal_content(modal_content)
-
-                                return {
-                                    "detected_by": indicator,
-                                    "title": text_content if 'text_content' in locals() else "未知",
-                                    "content": modal_content,
-                                    "analysis": modal_analysis
-                                }
-                            return True
-                    except Exception as e:
-                        # 调试信息
-                        continue
-
-                # 短时间等待后重试
-                time.sleep(0.5)
+            # 在浏览器内同时等待所有特征，任一可见即返回
+            hit = self.wait_for_any(modal_indicators, timeout=timeout)
+            if hit:
+                return {
+                    "detected_by": hit['indicator'],
+                    "title": hit['text'] or "未知",
+                }
+            return None
 
             # 如果超时，尝试截图或获取页面状态
 
@@ -402,16 +375,14 @@ class LoginPage(BasePage):
 
 
     def wait_for_cart_count_update(self, expected_count: int, timeout=10000):
-        """等待购物车数量更新"""
-        import time
-        start_time = time.time()
-
-        while time.time() - start_time < timeout:
-            current_count = self.get_cart_count()
-            if current_count == expected_count:
-
-                time.sleep(0.5)
-
+        """等待购物车数量更新为 expected_count"""
+        badge = MainPage(self.page).selectors.css('cart_count')
+        indicators = [f'{css.strip()}:text-is("{expected_count}")' for css in badge.split(',')]
+        hit = self.wait_for_any(indicators, timeout=timeout, state='attached')
+        if hit:
+            logger.info(f"购物车数量已更新为 {expected_count}（{hit['elapsed_ms']}ms）")
+            return True
+        logger.warning(f"等待购物车数量更新为 {expected_count} 超时，当前为 {self.get_cart_count()}")
         return False
 
 
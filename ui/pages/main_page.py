@@ -10,12 +10,48 @@ File    : api/pages
 """
 import time
 import re
+from typing import Callable, Optional
 
-from playwright.sync_api import Page
+from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
 
+from utils.cart_sync import is_cart_calculate
 from utils.log import logger
 from ui.pages.base_page import BasePage
 
+# 读取购物车气泡数字（与旧实现一致：取文本中的第一个数字）
+_READ_BADGE_SCRIPT = """selector => {
+    const el = document.querySelector(selector);
+    const match = el ? /\\d+/.exec(el.textContent || '') : null;
+    return match ? parseInt(match[0], 10) : 0;
+}"""
+
+# 监听 DOM 变化，数量偏离 baseline 且 settle 毫秒内不再变化时 resolve
+_WAIT_BADGE_CHANGE_SCRIPT = """({selector, baseline, timeout, settle}) => new Promise(resolve => {
+    const read = () => {
+        const el = document.querySelector(selector);
+        const match = el ? /\\d+/.exec(el.textContent || '') : null;
+        return match ? parseInt(match[0], 10) : 0;
+    };
+    let settleTimer = null;
+    let deadline = null;
+    const observer = new MutationObserver(() => check());
+    const finish = changed => {
+        observer.disconnect();
+        clearTimeout(deadline);
+        clearTimeout(settleTimer);
+        resolve({count: read(), changed: changed});
+    };
+    const check = () => {
+        clearTimeout(settleTimer);
+        if (read() !== baseline) {
+            settleTimer = setTimeout(() => finish(true), settle);
+        }
+    };
+    observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+    deadline = setTimeout(() => finish(read() !== baseline), timeout);
+    check();
+})"""
+
 
 class MainPage(BasePage):
     def __init__(self, page: Page):
@@ -41,47 +77,15 @@ class MainPage(BasePage):
                 "text=Country / Region",
             ]
 
-            # 等待任何一个特征出现
-            start_time = time.time()
-            while (time.time() - start_time) * 1000 < timeout:
-                for indicator in modal_indicators:
-                    try:
-                        # 尝试定位元素
-                        element = self.page.locator(indicator).first
-
-                        # 检查元素是否存在且可见
-                        if element.count() > 0:
-                            # 检查元素是否可见
-                            if element.is_visible():
-                                print(f"检测到弹窗特征: {indicator}")
-
-                                # 获取元素文本内容
-                                try:
-                                    text_content = element.text_content()
-                                    print(f"弹窗标题: {text_content}")
-                                except:
-                                    pass
-
-                                # 获取弹窗内容
-                                modal_content = self.get_modal_content()
-
-                                # 分析弹窗内容
-                                modal_analysis = self.analyze_modal_content(modal_content)
-
-                                return {
-                                    "detected_by": indicator,
-                                    "title": text_content if 'text_content' in locals() else "未知",
-                                    "content": modal_content,
-                                    "analysis": modal_analysis
-                                }
-                            return True
-                    except Exception as e:
-                        # 调试信息
-                        logger.debug("主页面地区语言弹窗获取失败:%s", e)
-                        continue
-
-                # 短时间等待后重试
-                time.sleep(0.5)
+            # 在浏览器内同时等待所有特征，任一可见即返回
+            hit = self.wait_for_any(modal_indicators, timeout=timeout)
+            if hit:
+                logger.info(f"检测到弹窗特征: {hit['indicator']}（{hit['elapsed_ms']}ms）")
+                logger.debug(f"弹窗标题: {hit['text']}")
+                return {
+                    "detected_by": hit['indicator'],
+                    "title": hit['text'] or "未知",
+                }
 
             # 如果超时，尝试截图或获取页面状态
             print("等待地区语言弹窗超时")
@@ -332,12 +336,82 @@ class MainPage(BasePage):
     #         return 0
 
 
-    def get_cart_bubble_count(self, timeout=5000, debug=False) -> int:
+    def get_cart_bubble_count(self, timeout=5000, debug=False, baseline: Optional[int] = None,
+                              source: str = "dom", action: Optional[Callable[[], None]] = None) -> int:
         """
-        获取购物车数量，支持调试模式打印所有候选元素。
+        获取购物车气泡数量
+        :param timeout: 等待数量变化的超时时间（毫秒），仅在传入 baseline 时生效
+        :param debug: True 时使用旧的候选元素扫描并打印所有候选（调用次数多，仅用于排查定位器）
+        :param baseline: 已知的旧数量；传入后等待气泡数量从该值变化并稳定后再返回
+        :param source: 等待方式，"dom" 监听气泡 DOM 变化，"network" 先等 cart/calculate 响应
+        :param action: 触发数量变化的操作（如加购点击），在等待开始后执行；source="network" 时必传
         """
-        self.page.wait_for_timeout(2000)
+        if debug:
+            return self._scan_cart_count_candidates(debug=True)
+        if baseline is None:
+            return self.read_cart_badge()
+        return self.wait_for_cart_count_change(baseline, timeout=timeout, source=source, action=action)
+
+    def read_cart_badge(self) -> int:
+        """从配置的气泡定位器（MAIN_PAGE.cart_count）读取数量，一次协议调用；气泡不存在时为 0"""
+        try:
+            count = self.page.evaluate(_READ_BADGE_SCRIPT, self.selectors.css('cart_count'))
+            logger.info(f"购物车气泡数量: {count}")
+            return count
+        except Exception as e:
+            logger.exception(f"读取购物车气泡数量异常: {e}")
+            return 0
+
+    def wait_for_cart_count_change(self, baseline: int, timeout: int = 5000, settle: int = 300,
+                                   source: str = "dom", action: Optional[Callable[[], None]] = None) -> int:
+        """
+        等待购物车气泡数量从 baseline 变化，并在 settle 毫秒内不再变化后返回
+        - dom：页面内 MutationObserver 监听，整个等待只占一次协议调用
+        - network：在 page.expect_response 内执行 action，等到 cart/calculate 响应后再用 dom 方式读取稳定后的数量
+          （监听先于操作注册，响应不会在开始等待前就已返回而被错过）
+        超时仍未变化时返回当前数量
+        """
+        if source not in ("dom", "network"):
+            raise ValueError(f"不支持的等待方式: {source}")
+        if source == "network" and action is None:
+            raise ValueError("source='network' 需要传入 action，在等待响应期间触发购物车变更")
+
         start_time = time.time()
+        if source == "network":
+            # 超时（未等到响应）时继续按 DOM 读取，action 的其他异常照常抛出
+            try:
+                with self.page.expect_response(is_cart_calculate, timeout=timeout):
+                    action()
+            except PlaywrightTimeoutError as e:
+                logger.warning(f"{timeout}ms 内未等到 cart/calculate 响应: {e}")
+            timeout = max(int(timeout - (time.time() - start_time) * 1000), settle)
+        elif action is not None:
+            # MutationObserver 开始时会先比较一次 baseline，操作后立即发生的变化不会漏掉
+            action()
+
+        try:
+            result = self.page.evaluate(_WAIT_BADGE_CHANGE_SCRIPT, {
+                "selector": self.selectors.css('cart_count'),
+                "baseline": baseline,
+                "timeout": timeout,
+                "settle": settle,
+            })
+            elapsed = int((time.time() - start_time) * 1000)
+            if result["changed"]:
+                logger.info(f"购物车数量 {baseline} -> {result['count']}，耗时 {elapsed}ms")
+            else:
+                logger.warning(f"{elapsed}ms 内购物车数量未从 {baseline} 变化")
+            return result["count"]
+        except Exception as e:
+            # 等待期间页面跳转会销毁执行上下文，此时直接读取一次
+            logger.warning(f"等待购物车数量变化失败，直接读取: {e}")
+            return self.read_cart_badge()
+
+    def _scan_cart_count_candidates(self, debug=False) -> int:
+        """
+        旧的候选元素扫描：遍历所有购物车链接和常见气泡类名，逐个读取可见性和文本。
+        每个候选都要多次协议调用，只在 debug 模式下使用。
+        """
         candidates = []
 
         try:
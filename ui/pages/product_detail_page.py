@@ -106,9 +106,7 @@ class ProductDetailPage(BasePage):
     def select_style(self, style_name: str) -> bool:
         """选择指定款式"""
         # 构建选择器
-        selector = self.selectors["style_button_template"].replace(
-            "{style_name}", style_name
-        )
+        selector = self.selectors.render("style_button_template", style_name=style_name)
 
         if self.is_visible(selector):
             self.click(selector)
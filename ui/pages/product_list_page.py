@@ -19,6 +19,31 @@ from typing import Optional, Callable, Type
 from ui.pages.product_detail_page import ProductDetailPage
 
 
+# 商品卡片批量提取脚本：字段与 get_product_info 保持一致，文本统一 trim，缺失时为 null
+_PRODUCT_CARDS_SCRIPT = """(cards, args) => {
+    const text = el => {
+        if (!el) return null;
+        const value = (el.textContent || '').trim();
+        return value || null;
+    };
+    return cards.slice(0, args.limit).map((card, index) => {
+        const title = card.querySelector(args.title);
+        const image = card.querySelector(args.image);
+        return {
+            index: index,
+            title: text(title),
+            link: title ? title.getAttribute('href') : null,
+            price: text(card.querySelector(args.price)),
+            original_price: text(card.querySelector(args.original)),
+            sale_price: text(card.querySelector(args.sale)),
+            image_src: image ? image.getAttribute('src') : null,
+            image_alt: image ? image.getAttribute('alt') : null,
+            has_add_to_cart_button: card.querySelector(args.button) !== null,
+        };
+    });
+}"""
+
+
 class ProductListPage(BasePage):
     """商品列表页操作类"""
 
@@ -108,8 +133,15 @@ class ProductListPage(BasePage):
 
         return None
 
-    def get_all_products_info(self, max_count: int = 20) -> List[Dict]:
-        """获取所有商品信息"""
+    def get_all_products_info(self, max_count: int = 20, bulk: bool = True) -> List[Dict]:
+        """
+        获取所有商品信息
+        :param max_count: 最多获取的商品数量
+        :param bulk: True 时一次页面内脚本取完所有卡片；False 时逐个卡片调用 get_product_info
+        """
+        if bulk:
+            return self.get_all_products_info_bulk(max_count)
+
         products = []
         count = self.get_product_count()
         limit = min(count, max_count)
@@ -121,6 +153,30 @@ class ProductListPage(BasePage):
 
         return products
 
+    def get_all_products_info_bulk(self, max_count: int = 20) -> List[Dict]:
+        """
+        单次往返获取所有商品信息：在页面内遍历商品卡片并提取字段，
+        返回结构与 get_product_info 一致
+        """
+        args = {
+            "limit": max_count,
+            "title": self.selectors.css("product_title"),
+            "price": self.selectors.css("product_price"),
+            "original": self.selectors.css("product_price_original"),
+            "sale": self.selectors.css("product_price_sale"),
+            "image": self.selectors.css("product_image"),
+            "button": self.selectors.css("add_to_cart_button_list"),
+        }
+        try:
+            products = self.page.eval_on_selector_all(
+                self.selectors.css("product_card"), _PRODUCT_CARDS_SCRIPT, args
+            )
+            logger.info(f"批量获取到 {len(products)} 个商品信息")
+            return products
+        except Exception as e:
+            logger.exception(f"批量获取商品信息失败: {e}")
+            return []
+
     # -------------------- 商品导航 --------------------
     def click_product(self, index: int = 0):
         """点击商品（进入详情页）"""
@@ -159,7 +215,11 @@ class ProductListPage(BasePage):
             # 按 ESC 键关闭
             self.page.keyboard.press("Escape")
 
-        time.sleep(1)
+        # 等待弹窗真正关闭，而不是固定等待 1 秒
+        try:
+            self.page.wait_for_selector('[data-testid="dialog-paper"]', state="hidden", timeout=5000)
+        except Exception as e:
+            logger.warning(f"等待购物车弹窗关闭超时: {e}")
 
 
 
@@ -324,8 +384,8 @@ class ProductListPage(BasePage):
         results = []
         for idx in indices:
             results.append(self.add_to_cart_by_index(idx))
-            # 可根据需要等待侧边栏关闭或短暂间隔
-            self.page.wait_for_timeout(500)
+            # 关闭侧边栏（等待弹窗隐藏后再继续下一个）
+            self.close_cart_sidebar()
         return results
 
     # ---------- 基于商品标题模糊匹配加购 ----------
@@ -415,17 +475,13 @@ class ProductListPage(BasePage):
             # 等待按钮可见并点击
             add_btn.wait_for(state='visible', timeout=timeout)
 
-            # 获取点击前的购物车数量
-            cart_count_before = self._get_cart_count()
-
-            # 点击加入购物车
+            # 点击加入购物车：列表页按钮只打开选规格弹窗，真正的加购由弹窗内按钮完成
+            # （CartSidebarPage.click_add_to_cart_and_wait 以 cart/calculate 响应为准）
             add_btn.click()
             logger.info(f"已将第 {index + 1} 个商品加入购物车")
 
             # 等待购物车侧边栏出现
-            self.wait_for_cart_sidebar(timeout=timeout)
-
-            return True
+            return self.wait_for_cart_modal(timeout=timeout) is not None
 
         except Exception as e:
             logger.exception(f"加入第 {index + 1} 个商品到购物车失败: {e}")
@@ -451,7 +507,6 @@ class ProductListPage(BasePage):
 
             # 关闭购物车侧边栏
             self.close_cart_sidebar()
-            self.page.wait_for_timeout(500)  # 短暂等待
 
             # 加入第二个商品
             logger.info("开始加入第2个商品...")
@@ -484,7 +539,6 @@ class ProductListPage(BasePage):
 
                 if success:
                     self.close_cart_sidebar()
-                    self.page.wait_for_timeout(500)
 
             except Exception as e:
                 logger.exception(f"加入索引 {idx} 商品异常: {e}")
@@ -661,21 +715,18 @@ class ProductListPage(BasePage):
                 'text=購買此商品可獲得',  # 积分提示
             ]
 
-            start_time = time.time()
-            while (time.time() - start_time) * 1000 < timeout:
-                for indicator in modal_indicators:
-                    locator = self.page.locator(indicator).first
-                    if locator.count() > 0 and locator.is_visible():
-                        logger.info(f"检测到弹窗特征: {indicator}")
-                        # 获取弹窗内容并分析
-                        modal_content = self.get_modal_content()  # 假设您已有此方法
-                        analysis = self.analyze_modal_content(modal_content)
-                        return {
-                            "detected_by": indicator,
-                            "content": modal_content,
-                            "analysis": analysis
-                        }
-                time.sleep(0.5)
+            # 在浏览器内同时等待所有特征，任一可见即返回
+            hit = self.wait_for_any(modal_indicators, timeout=timeout)
+            if hit:
+                logger.info(f"检测到弹窗特征: {hit['indicator']}（{hit['elapsed_ms']}ms）")
+                # 获取弹窗内容并分析
+                modal_content = self.get_modal_content()
+                analysis = self.analyze_modal_content(modal_content)
+                return {
+                    "detected_by": hit['indicator'],
+                    "content": modal_content,
+                    "analysis": analysis
+                }
 
             # 超时后的调试信息
             logger.warning("未检测到弹窗，当前页面信息:")
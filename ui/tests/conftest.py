@@ -9,6 +9,10 @@ File    :
 #-------------------------------------------------------------
 """
 import datetime
+import time
+from contextlib import contextmanager
+
+import allure
 
 from playwright.sync_api import Page
 import pytest
@@ -26,6 +30,16 @@ from ui.pages.my_page import MyPage
 from ui.pages.cart_sidebar_page import CartSidebarPage
 from ui.pages.product_detail_page import ProductDetailPage
 from ui.pages.product_list_page import ProductListPage
+from utils.auth_cache import AuthStateCache, write_json_atomic
+from utils.cart_sync import CartSync
+from utils.config_registry import ROOT_DIR
+from utils.context_pool import ContextPool
+from utils.har_replay import HAR_URL_FILTER, HarSession
+from utils.launch_profiles import LAUNCH_PROFILES, get_launch_profile
+from utils.log import logger
+from utils.region_resolver import SUPPORTED_REGIONS, forced_region, get_resolver
+from utils.resource_blocker import ResourceBlocker
+from utils.traffic_recorder import TrafficRecorder
 from utils.login_helpers import perform_login
 from dotenv import load_dotenv
 
@@ -66,104 +80,185 @@ def auto_close_popups(page: Page):
     # 无需清理，page 会在测试结束后关闭
 
 @pytest.fixture(scope="session")
-
-def browser(playwright):
-
-    browser = playwright.chromium.launch(
-        headless=False,
-        args=[
-            '--disable-blink-features=AutomationControlled',
-            '--disable-dev-shm-usage',
-            '--no-sandbox',
-            '--disable-gpu',
-            '--window-size=1920,1080',
-            '--disable-setuid-sandbox',
-            '--disable-accelerated-2d-canvas',
-            '--disable-web-security',  # 可选，但可能影响
-            '--disable-features=IsolateOrigins,site-per-process',
-            '--disable-blink-features=AutomationControlled',
-            '--disable-client-side-phishing-detection',
-            '--disable-component-update',
-            '--disable-default-apps',
-            '--disable-popup-blocking',
-            '--disable-prompt-on-repost',
-            '--disable-sync',
-            '--disable-webgl',
-            '--no-first-run',
-            '--no-default-browser-check',
-            '--disable-infobars',
-            '--disable-breakpad',
-            '--disable-crash-reporter',
-            '--disable-dev-shm-usage',
-            '--disable-software-rasterizer',
-        ]
-        # page = browser.new_page()
-        # headless=False,
-        # args=[
-        #     '--disable-blink-features=AutomationControlled',  # 隐藏自动化特征
-        #     '--disable-dev-shm-usage',        # 解决 Docker 内存问题
-        #     '--no-sandbox',                  # 避免沙盒限制
-        #     '--disable-gpu',                 # 禁用 GPU（可选）
-        #     '--window-size=1920,1080',
-        # ]
-    )
+def browser(playwright, request):
+    """
+    会话级浏览器，启动档位由 --launch-profile 或环境变量 LAUNCH_PROFILE 指定
+    可选 fast-headless / debug-headed / low-memory，默认 debug-headed
+    """
+    profile = get_launch_profile(request.config.getoption("--launch-profile"))
+    start = time.perf_counter()
+    browser = playwright.chromium.launch(headless=profile['headless'], args=profile['args'])
+    logger.info(f"浏览器启动完成: 档位 {profile['name']}，耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
     yield browser
     browser.close()
 
+
+def _add_popup_handlers(page: Page):
+    """为上下文中的新页面自动添加弹窗处理器"""
+    # 优惠弹窗关闭
+    coupon_close = page.locator(
+        'button:has-text("×"), button:has-text("关闭"), .close-btn, [aria-label="Close"]')
+    page.add_locator_handler(coupon_close, lambda: coupon_close.click())
+    # 订阅弹窗
+    subscribe_close = page.locator('button:has-text("稍后"), button:has-text("不再提示"), .subscribe-close')
+    page.add_locator_handler(subscribe_close, lambda: subscribe_close.click())
+    # 模态背景
+    modal_backdrop = page.locator('.modal-backdrop, .overlay')
+    page.add_locator_handler(modal_backdrop, lambda: modal_backdrop.click())
+    # 今日不再显示
+    today_not_show = page.locator('p:has-text("今日不再顯示")')
+    page.add_locator_handler(today_not_show, lambda: today_not_show.click())
+
+
+@pytest.fixture(scope="session")
+def context_pool(browser):
+    """
+    每个 worker 一个的上下文池，匿名和登录态上下文都从这里取
+    有存储预设的上下文额外为新页面注册弹窗处理器
+    """
+    def on_create(context, preset):
+        ResourceBlocker.watch_sizes(context)
+        if preset:
+            context.on("page", _add_popup_handlers)
+
+    pool = ContextPool(browser, on_create=on_create, viewport={'width': 1366, 'height': 768})
+    yield pool
+    pool.close()
+
+
+@contextmanager
+def _resource_blocking(request, context):
+    """
+    按 block_resources 标记 / --block-resources 拦截图片、字体、视频、统计脚本
+    用例结束后移除拦截，并把拦截数量和估算字节数附到 Allure 报告
+    """
+    blocker = ResourceBlocker.from_node(request.node, request.config.getoption("--block-resources"))
+    if blocker is None:
+        yield
+        return
+    blocker.attach(context)
+    try:
+        yield
+    finally:
+        blocker.detach(context)
+        stats = blocker.to_dict()
+        logger.info(f"[{request.node.name}] 资源拦截: {stats}")
+        allure.attach(json.dumps(stats, ensure_ascii=False, indent=2),
+                      name="resource_blocking", attachment_type=allure.attachment_type.JSON)
+
+
+@contextmanager
+def _leased_context(context_pool, request, storage_state=None):
+    """
+    从池中取上下文，按需挂上 HAR 录制/回放、资源拦截和接口流量录制，用例结束后归还
+    """
+    storage_preset = getattr(request, 'param', {})
+    context = context_pool.acquire(preset=storage_preset, storage_state=storage_state)
+    har = HarSession.from_request(request)
+    if har:
+        har.start(context)
+    recorder = TrafficRecorder.from_request(request)
+    if recorder:
+        recorder.attach(context)
+    try:
+        with _resource_blocking(request, context):
+            yield context
+    finally:
+        if recorder:
+            recorder.detach(context)
+        if har:
+            har.stop(context)
+        context_pool.release(context, reuse=har is None or har.reusable)
+        if har:
+            har.finish()
+
+
 @pytest.fixture(scope="function")
-def context(browser, request):
+def context(context_pool, request):
     """
     参数化注入
     浏览器上下文 fixture，支持通过 request.param 传递 sessionStorage 预设值
     使用方式：@pytest.mark.parametrize('context', [{'key':'value'}], indirect=True)
+    上下文从池中取出，用例结束后清空存储归还
     """
+    with _leased_context(context_pool, request) as context:
+        yield context
+
+def _forwarded_for(ip):
+    """路由处理器：给发往站点的请求加上 X-Forwarded-For（路由层修改，不触发 CORS 预检）"""
+    def add_forwarded_for(route):
+        route.fallback(headers={**route.request.headers, 'x-forwarded-for': ip})
+    return add_forwarded_for
+
+
+def _expected_modal_defaults(region):
+    """站点按地区给出的弹窗默认值 (地区, 语言)：不支持的地区默认台湾 + 英文"""
+    if region not in SUPPORTED_REGIONS:
+        return 'TW', 'en_US'
+    return region, {'TW': 'zh_TW', 'HK': 'zh_HK'}.get(region, 'en_US')
+
+
+def _probe_modal_defaults(context_pool, ip=None):
+    """
+    另取一个池中上下文打开首页，读取地区语言弹窗的默认值 (地区, 语言)
+    不复用用例的上下文，避免探测时站点写入的 cookie 影响用例
+    :param ip: 作为 X-Forwarded-For 的地址，None 时按本机真实 IP 访问
+    """
+    context = context_pool.acquire()
+    handler = _forwarded_for(ip) if ip else None
+    try:
+        if handler:
+            context.route(HAR_URL_FILTER, handler)
+        page = context.new_page()
+        main_page = MainPage(page)
+        page.goto("https://www.dogcatstar.com/", wait_until="load", timeout=60000)
+        main_page.wait_for_region_language_modal()
+        return main_page.get_default_region(), main_page.get_default_language()
+    finally:
+        if handler:
+            context.unroute(HAR_URL_FILTER, handler)
+        context_pool.release(context)
+
+
+@pytest.fixture(scope="session")
+def real_ip_modal_defaults(context_pool):
+    """按本机真实 IP 访问时的弹窗默认值，作为 region_override 探测的基线（每个 worker 只探测一次）"""
+    defaults = _probe_modal_defaults(context_pool)
+    logger.info(f"真实 IP 下的弹窗默认值: {defaults}")
+    return defaults
+
+
+@pytest.fixture(scope="function")
+def region_override(context, context_pool, request):
+    """
+    以指定地区访问站点，便于不借助代理并行跑各地区的弹窗用例
+    地区取 request.param（配合 utils.region_resolver.region_matrix 参数化）或 FORCE_REGION；都没有时不做改动
+    从离线 IP 段表取该地区的一个地址，作为 X-Forwarded-For 加到发往站点的请求上
+    站点是否采信 X-Forwarded-For 取决于其 CDN / 网关配置，因此先探测：带头访问的弹窗默认值与真实 IP 相同，
+    且真实 IP 的默认值又不是该地区应有的值时，说明地区没有生效，跳过用例而不是按错误的预期断言
+    返回地区代码，未指定时返回 None
+    """
+    region = getattr(request, 'param', None) or forced_region()
+    if not region:
+        yield None
+        return
+    ip = get_resolver().sample_ip(region)
+    if ip is None:
+        pytest.skip(f"离线 IP 段表中没有 {region} 的地址")
+
+    applied = _probe_modal_defaults(context_pool, ip)
+    baseline = request.getfixturevalue("real_ip_modal_defaults")
+    if applied == baseline and baseline != _expected_modal_defaults(region):
+        pytest.skip(f"站点未按 X-Forwarded-For 识别地区 {region}：弹窗默认值 {applied} 与真实 IP 相同")
+
+    add_forwarded_for = _forwarded_for(ip)
+    context.route(HAR_URL_FILTER, add_forwarded_for)
+    logger.info(f"[{request.node.name}] 以地区 {region} 访问站点，X-Forwarded-For: {ip}，弹窗默认值 {applied}")
+    try:
+        yield region
+    finally:
+        context.unroute(HAR_URL_FILTER, add_forwarded_for)
 
-    context = browser.new_context(viewport={'width': 1366, 'height': 768})
-    # 从 request.param 中获取预设
-    storage_preset = getattr(request, 'param', {})
-    ls_preset = storage_preset.get('localStorage', {})
-    ss_preset = storage_preset.get('sessionStorage', {})
-
-    # 构建 localStorage 初始化脚本
-    ls_lines = []
-    for key, value in ls_preset.items():
-        if isinstance(value, dict):
-            value = json.dumps(value)  # 确保复杂对象被 JSON 字符串化
-        ls_lines.append(f"localStorage.setItem('{key}', '{value}');")
-
-    # 构建 sessionStorage 初始化脚本
-    ss_lines = []
-    for key, value in ss_preset.items():
-        ss_lines.append(f"sessionStorage.setItem('{key}', '{value}');")
-
-    init_script = "\n".join(ls_lines + ss_lines)
-    if init_script:
-        context.add_init_script(init_script)
-
-        # ----- 新增：为上下文中所有新页面自动添加弹窗处理器 -----
-        def add_handlers(page):
-            # 优惠弹窗关闭
-            coupon_close = page.locator(
-                'button:has-text("×"), button:has-text("关闭"), .close-btn, [aria-label="Close"]')
-            page.add_locator_handler(coupon_close, lambda: coupon_close.click())
-            # 订阅弹窗
-            subscribe_close = page.locator('button:has-text("稍后"), button:has-text("不再提示"), .subscribe-close')
-            page.add_locator_handler(subscribe_close, lambda: subscribe_close.click())
-            # 模态背景
-            modal_backdrop = page.locator('.modal-backdrop, .overlay')
-            page.add_locator_handler(modal_backdrop, lambda: modal_backdrop.click())
-            # 今日不再显示
-            today_not_show = page.locator('p:has-text("今日不再顯示")')
-            page.add_locator_handler(today_not_show, lambda: today_not_show.click())
-
-        context.on("page", add_handlers)
-        # ------------------------------------------------
-
-        # yield context
-        # context.close()
-
-    yield context
-    context.close()
 
 @pytest.fixture(scope="function")
 def base_page(page: Page) -> BasePage:
@@ -349,78 +444,71 @@ AUTH_FILE = f"auth_{LOGIN_METHOD}.json"
 #     yield page
 #     context.close()
 
-@pytest.fixture(scope="function")
-def logged_in_page(browser: Browser, request):
-    # 获取 --storage-state 选项的值（如果没有指定，则使用默认的动态文件名）
-    storage_state_path = request.config.getoption("--storage-state")
-    if storage_state_path is None:
-        # 从环境变量获取登录方法，构建默认文件名
-        login_method = os.getenv("LOGIN_METHOD", "google")
-        storage_state_path = f"auth_{login_method}.json"
-
-    # 处理存储预设（用于初始化 localStorage/sessionStorage）
-    storage_preset = getattr(request, 'param', {})
-    ls_preset = storage_preset.get('localStorage', {})
-    ss_preset = storage_preset.get('sessionStorage', {})
-
-    # 构建初始化脚本
-    script_lines = []
-    for key, value in ls_preset.items():
-        if isinstance(value, (dict, list)):
-            value = json.dumps(value, ensure_ascii=False)
-        script_lines.append(f"localStorage.setItem('{key}', '{value}');")
-    for key, value in ss_preset.items():
-        if isinstance(value, (dict, list)):
-            value = json.dumps(value, ensure_ascii=False)
-        script_lines.append(f"sessionStorage.setItem('{key}', '{value}');")
-    init_script = "\n".join(script_lines) if script_lines else None
-
-    # 根据认证文件是否存在创建 context
-    if os.path.exists(storage_state_path):
-        # 文件存在：加载认证状态
-        context = browser.new_context(
-            storage_state=storage_state_path,
-            viewport={'width': 1366, 'height': 768}
-        )
-    else:
-        # 文件不存在：创建空白 context
+def _login_credentials(login_method: str) -> dict:
+    """从环境变量读取登录凭据"""
+    if login_method == "google":
+        return {
+            'email': os.getenv("GOOGLE_EMAIL"),
+            'password': os.getenv("GOOGLE_PASSWORD")
+        }
+    if login_method == "facebook":
+        return {
+            'username': os.getenv("FB_USERNAME"),
+            'password': os.getenv("FB_PASSWORD")
+        }
+    raise ValueError(f"不支持的登录方式: {login_method}")
+
+
+@pytest.fixture(scope="session")
+def auth_state(browser: Browser, request) -> str:
+    """
+    登录态 storage_state 文件路径（会话级，xdist 多 worker 共享同一份缓存）
+    默认 .auth/auth_{LOGIN_METHOD}.json，可用 --storage-state 指定
+    缓存有效时直接复用；失效时加文件锁，只有一个 worker 执行登录
+    """
+    login_method = os.getenv("LOGIN_METHOD", "google")
+    storage_state_path = request.config.getoption("--storage-state") or \
+        os.path.join(ROOT_DIR, ".auth", f"auth_{login_method}.json")
+
+    def login(path):
         context = browser.new_context(viewport={'width': 1366, 'height': 768})
+        try:
+            page = context.new_page()
+            page.goto("https://www.dogcatstar.com")
+            perform_login(page, method=login_method, credentials=_login_credentials(login_method))
+            # 等待登录成功（可根据实际情况调整）
+            page.wait_for_url("**www.dogcatstar.com**", timeout=15000)
+            write_json_atomic(path, context.storage_state())
+        finally:
+            context.close()
+
+    def probe(path):
+        # 带登录态打开会员页，不再弹出登录弹窗即视为有效
+        context = browser.new_context(storage_state=path, viewport={'width': 1366, 'height': 768})
+        try:
+            page = context.new_page()
+            page.goto("https://www.dogcatstar.com/my-account/", wait_until="domcontentloaded")
+            return LoginPage(page).wait_for_login_modal(timeout=5000) is None
+        finally:
+            context.close()
+
+    cache = AuthStateCache(
+        storage_state_path,
+        login=login,
+        probe=probe if request.config.getoption("--auth-probe") else None,
+    )
+    return cache.ensure()
 
-    # **无论是否加载了认证文件，都需要添加初始化脚本（如果存在）**
-    if init_script:
-        context.add_init_script(init_script)
 
-    # 如果认证文件不存在，则执行登录并保存
-    if not os.path.exists(storage_state_path):
+@pytest.fixture(scope="function")
+def logged_in_page(context_pool, auth_state: str, request):
+    """
+    已登录的页面：登录态由会话级 auth_state 统一准备，上下文从池中取
+    支持通过 request.param 传递 localStorage/sessionStorage 预设
+    """
+    with _leased_context(context_pool, request, storage_state=auth_state) as context:
         page = context.new_page()
-        page.goto("https://www.dogcatstar.com")
-
-        login_method = os.getenv("LOGIN_METHOD", "google")
-        if login_method == "google":
-            credentials = {
-                'email': os.getenv("GOOGLE_EMAIL"),
-                'password': os.getenv("GOOGLE_PASSWORD")
-            }
-        elif login_method == "facebook":
-            credentials = {
-                'username': os.getenv("FB_USERNAME"),
-                'password': os.getenv("FB_PASSWORD")
-            }
-        else:
-            raise ValueError(f"不支持的登录方式: {login_method}")
-
-        perform_login(page, method=login_method, credentials=credentials)
-
-        # 等待登录成功（可根据实际情况调整）
-        page.wait_for_url("**www.dogcatstar.com**", timeout=15000)
-        print(f"登录成功，写入认证文件: {storage_state_path}")
-        context.storage_state(path=storage_state_path)
-        page.close()  # 关闭临时页面
-
-    # 最后从 context 创建一个新页面供测试使用
-    page = context.new_page()
-    yield page
-    context.close()
+        yield page
 
 
 @pytest.fixture(scope="function")
@@ -500,9 +588,89 @@ def pytest_addoption(parser):
         "--storage-state",
         action="store",
         default=None,  # 默认为 None，让 fixture 使用动态文件名
-        help="Path to storage state file (default: auth_{LOGIN_METHOD}.json)"
+        help="Path to storage state file (default: .auth/auth_{LOGIN_METHOD}.json)"
+    )
+    parser.addoption(
+        "--launch-profile",
+        action="store",
+        default=None,
+        choices=list(LAUNCH_PROFILES),
+        help="Browser launch profile (default: $LAUNCH_PROFILE or debug-headed)"
+    )
+    parser.addoption(
+        "--block-resources",
+        action="store",
+        default=None,
+        help="Comma-separated resource categories to block for every test "
+             "(images,fonts,media,trackers); tests can override with @pytest.mark.block_resources"
+    )
+    parser.addoption(
+        "--har",
+        action="store",
+        default=None,
+        choices=["off", "record", "replay"],
+        help="Record dogcatstar.com traffic to har/*.har or replay it (default: $HAR_MODE or off); "
+             "@pytest.mark.har('cat_food') shares one HAR per page instead of one per test"
+    )
+    parser.addoption(
+        "--har-not-found",
+        action="store",
+        default="fallback",
+        choices=["fallback", "abort"],
+        help="Replay: requests missing from the HAR go to the network (fallback) or fail (abort)"
+    )
+    parser.addoption(
+        "--record-api",
+        action="store_true",
+        default=False,
+        help="Append the browser's /api/ec/ requests and responses (tokens masked) to "
+             "$API_CAPTURE (default: api/data/captured.jsonl) for replay by the API suite"
+    )
+    parser.addoption(
+        "--auth-probe",
+        action="store_true",
+        default=False,
+        help="Open my-account once per worker to verify the cached login state before reuse"
     )
 
 
+def pytest_sessionfinish(session):
+    """
+    会话结束时把后台线程中尚未写盘的接口流量刷出
+    xdist worker 把本进程的资源拦截汇总和加购同步耗时的原始记录放进 workeroutput，
+    由主进程在 pytest_testnodedown 中合并
+    """
+    TrafficRecorder.close_all()
+    if hasattr(session.config, "workeroutput"):
+        session.config.workeroutput["resource_blocking"] = dict(ResourceBlocker.session_totals)
+        session.config.workeroutput["cart_sync_latencies"] = CartSync.latencies.records
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    """xdist 主进程：合并各 worker 的资源拦截汇总和加购同步耗时，终端汇总才能看到全部用例（百分位在主进程计算）"""
+    output = getattr(node, "workeroutput", {})
+    ResourceBlocker.session_totals.update(output.get("resource_blocking", {}))
+    CartSync.latencies.extend(output.get("cart_sync_latencies", []))
+
+
+def pytest_terminal_summary(terminalreporter):
+    """输出资源拦截与加购同步（cart/calculate）的耗时汇总"""
+    totals = ResourceBlocker.session_totals
+    if totals:
+        terminalreporter.section("资源拦截")
+        terminalreporter.write_line(
+            f"{totals['tests']} 个用例, 拦截 {totals['blocked_requests']} 个请求, "
+            f"估算约 {totals['blocked_bytes_estimated'] / 1024:.0f} KB"
+            f"（{totals['blocked_unknown_size']} 个请求大小未知，未计入）"
+        )
 
-
+    summary = CartSync.latencies.summary()
+    if not summary:
+        return
+    terminalreporter.section("cart/calculate 同步耗时")
+    for label, stats in summary.items():
+        terminalreporter.write_line(
+            f"{label}: {stats['count']} 次, avg {stats['avg_ms']}ms, "
+            f"p50 {stats['p50_ms']}ms, p95 {stats['p95_ms']}ms, max {stats['max_ms']}ms"
+        )
@@ -139,7 +139,7 @@ class TestLoginAndCartEvent:
 
             with check:
 
-                after_num = main_page.get_cart_bubble_count()
+                after_num = main_page.get_cart_bubble_count(baseline=0)
 
                 assert after_num >0 ,f"当前购物车数量不是3"
 
@@ -100,7 +100,7 @@ class TestLoginAndCartEvent:
 
             with check:
 
-                after_num = logined_main_page.get_cart_bubble_count()
+                after_num = logined_main_page.get_cart_bubble_count(baseline=befor_num)
 
                 assert after_num == (befor_num+4) ,f"当前购物车数量未累加"
 
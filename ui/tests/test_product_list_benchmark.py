@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : test_product_list_benchmark.py
+Time    : 2026/3/3
+Author  : xixi
+File    : tests
+#-------------------------------------------------------------
+"""
+import json
+
+import allure
+import pytest
+from pytest_check import check
+
+from utils.perf import measure
+
+
+@pytest.mark.slow
+@pytest.mark.ui
+@allure.feature("性能基准")  # Allure 特性标记
+@allure.story("商品列表页信息提取：逐个卡片 vs 批量提取")  # Allure 用户故事标记
+class TestProductListBenchmark:
+
+    @allure.title("对比 get_all_products_info 两种模式的协议调用次数和耗时")  # 自定义报告标题
+    def test_get_all_products_info_bulk_vs_loop(self, base_page, product_list_page):
+        with allure.step("1.跳转商品列表url：猫咪商品-猫咪主食"):
+            base_page.navigate(url="https://www.dogcatstar.com/product-category/cat/cat_food/")
+            product_list_page.wait_for_product_list_load()
+            max_count = product_list_page.get_product_count()
+
+        results = {}
+        with allure.step("2.逐个卡片提取（原循环）"):
+            with measure("loop", results):
+                loop_products = product_list_page.get_all_products_info(max_count=max_count, bulk=False)
+
+        with allure.step("3.批量提取（单次 eval_on_selector_all）"):
+            with measure("bulk", results):
+                bulk_products = product_list_page.get_all_products_info(max_count=max_count, bulk=True)
+
+        results["products"] = len(bulk_products)
+        allure.attach(json.dumps(results, ensure_ascii=False, indent=2),
+                      name="benchmark", attachment_type=allure.attachment_type.JSON)
+
+        with allure.step("4.验证两种模式结果一致且批量模式调用次数更少"):
+            with check:
+                assert len(bulk_products) == len(loop_products), \
+                    f"商品数量不一致：批量 {len(bulk_products)}，循环 {len(loop_products)}"
+            with check:
+                for bulk_item, loop_item in zip(bulk_products, loop_products):
+                    assert bulk_item["title"] == loop_item["title"], \
+                        f"第 {bulk_item['index']} 个商品标题不一致"
+                    assert bulk_item["link"] == loop_item["link"], \
+                        f"第 {bulk_item['index']} 个商品链接不一致"
+            with check:
+                assert results["bulk"]["calls"] < results["loop"]["calls"], \
+                    f"批量模式调用次数未减少: {results}"
@@ -13,6 +13,8 @@ import allure
 import pytest
 from pytest_check import check
 
+from utils.region_resolver import region_matrix
+
 
 
 @pytest.mark.region
@@ -22,7 +24,9 @@ from pytest_check import check
 class TestMainRegion:
 
     @allure.title("检查弹窗内默认地区&语言，检查写入session和cookie")  # 自定义报告标题
-    def test_default_region_language_check_session_and_cookie(self,setup_test,main_page,common_actions):
+    # REGION_MATRIX=all 时每个地区一个用例（可 -n auto 并行），默认只按真实 IP 跑一次
+    @pytest.mark.parametrize('region_override', region_matrix(), indirect=True, ids=lambda r: r or "real-ip")
+    def test_default_region_language_check_session_and_cookie(self,region_override,setup_test,main_page,common_actions):
         # main_page = setup_test
         # 1、进入主页面，检查session storage是否已选择语言和地区,预期结果:session中没有key值：has_user_confirmed_country_code
         with allure.step("1.检查session storage是否已选择语言和地区,预期结果:session中没有key值：has_user_confirmed_country_code"):
@@ -32,8 +36,8 @@ class TestMainRegion:
         # 2、获取当前地区，检查语言和地区弹窗中的默认地区和语言
         with allure.step("2.检查弹窗中的语言和地区默认值"):
             with check:
-                # 获取当前ip地区
-                ip_countryCode = common_actions.get_region_by_ip()
+                # 获取当前ip地区（指定了地区时直接使用，不查询 IP 服务）
+                ip_countryCode = region_override or common_actions.get_region_by_ip()
                 # 获取弹窗中的国家默认code
 
                 default_countryCode = main_page.get_default_region()
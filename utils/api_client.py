@@ -3,8 +3,207 @@
 """
 #-------------------------------------------------------------
 Name    : api_client.py
-Time    : 2026/2/11 
+Time    : 2026/2/11
 Author  : xixi
 File    : api/utils
 #-------------------------------------------------------------
 """
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.log import logger
+from utils.perf import LatencyRecorder
+
+CART_CALCULATE_PATH = "/api/ec/v2/TW/cart/calculate"
+DEFAULT_TIMEOUT = 10
+# 网关类的瞬时错误才重试，业务错误（4xx、500 以外的校验失败）直接返回
+RETRY_STATUSES = (502, 503, 504)
+# cart/calculate 只做计算不落单，POST 重试是安全的
+RETRY_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "POST", "DELETE"})
+
+
+def default_headers() -> Dict[str, str]:
+    """所有请求共用的请求头（模拟浏览器从 dogcatstar.com 发起）"""
+    return {
+        "Origin": "https://www.dogcatstar.com",
+        "Content-Type": "application/json",
+        "Accept-Language": "zh-TW"
+    }
+
+
+def auth_headers() -> Optional[Dict[str, str]]:
+    """从环境变量读取认证头，API_TOKEN / X_PLATFORM_TOKEN 任一缺失返回 None"""
+    token = os.getenv("API_TOKEN")
+    x_token = os.getenv("X_PLATFORM_TOKEN")
+    if not token or not x_token:
+        return None
+    return {"api-token": token, "x-platform-token": x_token}
+
+
+class ApiClient:
+    """
+    基于 requests.Session 的 API 客户端
+    - 连接池 + keep-alive，同一 host 的请求复用 TCP/TLS 连接
+    - 预置公共请求头，单次请求传入的 headers 与之合并
+    - 默认超时；502/503/504 和连接错误按指数退避重试
+    """
+
+    def __init__(self, base_url: str = "", headers: Optional[Dict[str, str]] = None,
+                 timeout: float = DEFAULT_TIMEOUT, retries: int = 3, backoff: float = 0.2,
+                 retry_statuses: Iterable[int] = RETRY_STATUSES, pool_size: int = 10):
+        """
+        :param base_url: 相对路径请求的前缀，传完整 URL 时忽略
+        :param headers: 预置请求头，默认 default_headers()
+        :param timeout: 默认超时（秒）
+        :param retries: 最大重试次数
+        :param backoff: 退避系数，第 n 次重试前等待 backoff * 2^(n-1) 秒
+        :param retry_statuses: 需要重试的状态码
+        :param pool_size: 每个 host 保持的连接数
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(default_headers() if headers is None else headers)
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=tuple(retry_statuses),
+            allowed_methods=RETRY_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, path: str) -> str:
+        if path.startswith(("http://", "https://")):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, self.url(path), **kwargs)
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def options(self, path: str, **kwargs) -> requests.Response:
+        return self.request("OPTIONS", path, **kwargs)
+
+    def delete(self, path: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class AsyncApiClient:
+    """
+    asyncio 客户端：请求在线程池中经由 ApiClient 的连接池发出，
+    协程侧用 Semaphore 限制并发数，并记录每个请求的耗时
+    用法：
+        async with AsyncApiClient(concurrency=50) as client:
+            results = await client.fan_out([
+                {"method": "POST", "path": url, "json": payload, "headers": headers} for payload in payloads
+            ])
+    """
+
+    def __init__(self, client: Optional[ApiClient] = None, concurrency: int = 20, **client_kwargs):
+        """
+        :param client: 复用已有的 ApiClient，不传则新建（连接池大小与并发数一致）
+        :param concurrency: 最大并发请求数
+        :param client_kwargs: 新建 ApiClient 时的参数
+        """
+        client_kwargs.setdefault("pool_size", concurrency)
+        self._owns_client = client is None
+        self.client = client or ApiClient(**client_kwargs)
+        self.concurrency = concurrency
+        self.latencies = LatencyRecorder("async_api")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # 默认线程池只有 min(32, CPU+4) 个线程，单独建一个与并发数一致的
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="async-api")
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # 在事件循环中首次使用时创建
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def request(self, method: str, path: str, label: Optional[str] = None, **kwargs) -> requests.Response:
+        async with self.semaphore:
+            start = time.perf_counter()
+            try:
+                response = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, functools.partial(self.client.request, method, path, **kwargs))
+            except requests.RequestException:
+                self.latencies.record(label or method, (time.perf_counter() - start) * 1000, status=None)
+                raise
+        self.latencies.record(label or method, (time.perf_counter() - start) * 1000, status=response.status_code)
+        return response
+
+    async def post(self, path: str, **kwargs) -> requests.Response:
+        return await self.request("POST", path, **kwargs)
+
+    async def fan_out(self, calls: Iterable[Dict], label: Optional[str] = None) -> List[Dict]:
+        """
+        并发发出一批请求，结果按输入顺序返回
+        :param calls: 每项为 {"method", "path", 其余参数透传给 requests}
+        :return: [{"index", "status", "elapsed_ms"（含排队等待）, "response", "error"}]
+        """
+        async def run(index, call):
+            call = dict(call)
+            method, path = call.pop("method", "POST"), call.pop("path")
+            start = time.perf_counter()
+            try:
+                response = await self.request(method, path, label=label, **call)
+                error = None
+            except requests.RequestException as e:
+                response, error = None, e
+            return {
+                "index": index,
+                "status": response.status_code if response is not None else None,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+                "response": response,
+                "error": error,
+            }
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(run(i, call) for i, call in enumerate(calls)))
+        logger.info(f"并发请求完成: {len(results)} 个，并发上限 {self.concurrency}，"
+                    f"总耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+        return list(results)
+
+    async def close(self):
+        self._executor.shutdown(wait=False)
+        if self._owns_client:
+            self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        return False
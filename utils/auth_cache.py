@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : auth_cache.py
+Time    : 2026/3/5
+Author  : xixi
+File    : utils
+#-------------------------------------------------------------
+"""
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from utils.log import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# 登录态 cookie 名称特征（WordPress 登录 cookie、站点 token/session），可用环境变量覆盖
+AUTH_COOKIE_PATTERN = os.getenv("AUTH_COOKIE_PATTERN", r"wordpress_logged_in|token|session")
+AUTH_COOKIE_DOMAIN = "dogcatstar.com"
+
+# login(path) 完成登录并把 storage_state 写入 path；probe(path) 返回登录态是否仍有效
+LoginFunc = Callable[[str], None]
+ProbeFunc = Callable[[str], bool]
+
+
+@contextmanager
+def file_lock(lock_path: str, timeout: float = 300, poll: float = 0.5):
+    """
+    跨进程排他锁（xdist 各 worker 共用同一把锁）
+    :param lock_path: 锁文件路径
+    :param timeout: 获取锁的超时时间（秒）
+    :param poll: 重试间隔（秒）
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"等待锁 {lock_path} 超时（{timeout}s）")
+                time.sleep(poll)
+        yield
+    finally:
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+        os.close(fd)
+
+
+def write_json_atomic(path: str, data: Dict):
+    """先写临时文件再替换，其他进程读不到写了一半的文件"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class AuthStateCache:
+    """
+    跨 worker 共享的登录态（storage_state）缓存
+    - 文件新鲜时直接复用，不加锁
+    - 需要登录时加文件锁，拿到锁后再检查一次：别的 worker 可能刚登录完，保证只有一个 worker 登录
+    - 新鲜度按登录 cookie 的过期时间判断；没有识别到登录 cookie 时按文件年龄 max_age 判断
+    - probe 可选，对缓存做一次真实有效性检查（每个进程只做一次）
+    """
+
+    def __init__(self, path: str, login: LoginFunc, probe: Optional[ProbeFunc] = None,
+                 min_ttl: int = 600, max_age: int = 12 * 3600, lock_timeout: float = 300):
+        """
+        :param path: storage_state 文件路径
+        :param login: 登录并写入 storage_state 的函数
+        :param probe: 可选的有效性检查函数
+        :param min_ttl: 登录 cookie 剩余有效期低于该值（秒）视为过期
+        :param max_age: 识别不到登录 cookie 时文件的最长复用时间（秒）
+        :param lock_timeout: 等待其他 worker 登录的最长时间（秒）
+        """
+        self.path = path
+        self.login = login
+        self.probe = probe
+        self.min_ttl = min_ttl
+        self.max_age = max_age
+        self.lock_timeout = lock_timeout
+        self._probed = False
+
+    @property
+    def lock_path(self) -> str:
+        return f"{self.path}.lock"
+
+    def _load(self) -> Optional[Dict]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self) -> bool:
+        """storage_state 文件存在且登录 cookie 未临近过期"""
+        state = self._load()
+        if not state:
+            return False
+
+        pattern = re.compile(AUTH_COOKIE_PATTERN, re.I)
+        auth_cookies = [
+            cookie for cookie in state.get("cookies", [])
+            if AUTH_COOKIE_DOMAIN in cookie.get("domain", "") and pattern.search(cookie.get("name", ""))
+        ]
+        now = time.time()
+        if not auth_cookies:
+            age = now - os.path.getmtime(self.path)
+            return age < self.max_age
+
+        # expires 为 -1 的是会话 cookie，随 storage_state 一起保存，视为不过期
+        return all(cookie.get("expires", -1) < 0 or cookie["expires"] - now > self.min_ttl
+                   for cookie in auth_cookies)
+
+    def _is_valid(self) -> bool:
+        if not self.is_fresh():
+            return False
+        if self.probe is None or self._probed:
+            return True
+        try:
+            valid = self.probe(self.path)
+        except Exception as e:
+            logger.warning(f"登录态有效性检查失败，视为无效: {e}")
+            valid = False
+        self._probed = valid
+        return valid
+
+    def ensure(self) -> str:
+        """
+        返回可用的 storage_state 路径，必要时（且只由一个 worker）执行登录
+        """
+        if self._is_valid():
+            logger.info(f"复用登录态缓存: {self.path}")
+            return self.path
+
+        with file_lock(self.lock_path, timeout=self.lock_timeout):
+            # 等锁期间其他 worker 可能已经刷新了登录态
+            if self._is_valid():
+                logger.info(f"其他 worker 已完成登录，复用: {self.path}")
+                return self.path
+
+            start = time.perf_counter()
+            self.login(self.path)
+            self._probed = True
+            logger.info(f"登录完成并写入 {self.path}，耗时 {time.perf_counter() - start:.1f}s")
+        return self.path
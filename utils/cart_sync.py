@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : cart_sync.py
+Time    : 2026/3/4
+Author  : xixi
+File    : utils
+#-------------------------------------------------------------
+"""
+import time
+from typing import Callable, Optional
+
+from playwright.sync_api import Page, Response
+
+from utils.log import logger
+from utils.perf import LatencyRecorder
+
+CART_CALCULATE_PATH = "/api/ec/v2/TW/cart/calculate"
+
+ResponsePredicate = Callable[[Response], bool]
+
+
+def is_cart_calculate(response: Response) -> bool:
+    """是否为购物车计算接口的 POST 响应（预检 OPTIONS 不算）"""
+    return CART_CALCULATE_PATH in response.url and response.request.method == "POST"
+
+
+def is_cart_calculate_ok(response: Response) -> bool:
+    """购物车计算接口返回成功"""
+    return is_cart_calculate(response) and response.ok
+
+
+class CartSync:
+    """
+    购物车变更同步：点击等操作在 page.expect_response 内执行，
+    以服务端 cart/calculate 响应作为操作完成的信号，替代固定 sleep
+    每次调用的耗时记录在 CartSync.latencies 中
+    """
+
+    # 进程内共享，会话结束时汇总
+    latencies = LatencyRecorder("cart_sync")
+
+    def __init__(self, page: Page, predicate: ResponsePredicate = is_cart_calculate_ok,
+                 timeout: int = 15000):
+        """
+        :param page: Playwright 的 Page 对象
+        :param predicate: 默认的响应判定条件
+        :param timeout: 默认等待响应的超时时间（毫秒）
+        """
+        self.page = page
+        self.predicate = predicate
+        self.timeout = timeout
+
+    def run(self, action: Callable[[], None], label: str,
+            predicate: Optional[ResponsePredicate] = None,
+            timeout: Optional[int] = None) -> Response:
+        """
+        执行购物车变更操作并等待服务端确认
+        :param action: 触发变更的操作，例如 lambda: add_btn.click()
+        :param label: 耗时记录的标签
+        :param predicate: 本次使用的响应判定条件，不传则用默认值
+        :param timeout: 本次等待的超时时间（毫秒）
+        :return: 匹配到的响应；超时抛出 Playwright TimeoutError
+        """
+        start = time.perf_counter()
+        with self.page.expect_response(predicate or self.predicate,
+                                       timeout=timeout or self.timeout) as response_info:
+            action()
+        response = response_info.value
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        entry = self.latencies.record(label, elapsed_ms, status=response.status,
+                                      server_ms=self._server_ms(response))
+        logger.info(f"[{label}] 服务端已确认购物车变更: status={response.status}, "
+                    f"耗时 {entry['elapsed_ms']}ms（服务端 {entry['server_ms']}ms）")
+        return response
+
+    @staticmethod
+    def _server_ms(response: Response) -> Optional[float]:
+        """从请求 timing 中取请求发出到首字节返回的时间，取不到时为 None"""
+        try:
+            timing = response.request.timing
+            if timing["requestStart"] >= 0 and timing["responseStart"] >= 0:
+                return round(timing["responseStart"] - timing["requestStart"], 2)
+        except Exception:
+            pass
+        return None
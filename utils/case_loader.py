@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : case_loader.py
+Time    : 2026/3/12
+Author  : xixi
+File    : utils
+#-------------------------------------------------------------
+"""
+import json
+import os
+import re
+from typing import Any, Dict, Iterator, NamedTuple
+from urllib.parse import urlsplit
+
+from utils.config_registry import ROOT_DIR
+
+# 用例语料：每行一个 JSON 用例；可用 API_CASES 指定其他文件（例如录制得到的流量）
+CASES_PATH = os.getenv("API_CASES", os.path.join(ROOT_DIR, "api", "data", "cases.jsonl"))
+
+
+class CaseRef(NamedTuple):
+    """用例在文件中的位置；收集阶段只保存它，执行时再读取该行"""
+    path: str
+    line_no: int
+    offset: int
+    case_id: str
+
+    def load(self) -> Dict:
+        return load_case(self.path, self.offset)
+
+
+def case_id(case: Dict, line_no: int) -> str:
+    """用例 ID：优先用 "id" 字段，否则由方法 + 路径末段 + 行号组成"""
+    if case.get("id"):
+        name = str(case["id"])
+    else:
+        path = urlsplit(case.get("path") or case.get("url") or "").path.rstrip("/")
+        name = f"{case.get('method', 'POST')}-{path.rsplit('/', 1)[-1] or 'root'}-L{line_no}"
+    return re.sub(r"\s+", "_", name)
+
+
+def scan_cases(path: str = CASES_PATH) -> Iterator[CaseRef]:
+    """
+    逐行扫描 JSONL，产出每个用例的位置和 ID，不在内存中保留用例内容
+    空行和 # 开头的行跳过；无法解析的行照常产出，执行时 load 报错，避免坏数据被静默忽略
+    """
+    with open(path, "rb") as f:
+        line_no = 0
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                return
+            line_no += 1
+            text = line.strip()
+            if not text or text.startswith(b"#"):
+                continue
+            try:
+                name = case_id(json.loads(text), line_no)
+            except ValueError:
+                name = f"L{line_no}-invalid"
+            yield CaseRef(path, line_no, offset, name)
+
+
+def load_case(path: str, offset: int) -> Dict:
+    """读取 offset 处的一行用例"""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return json.loads(f.readline())
+
+
+_MISSING = object()
+
+
+def dig(data: Any, path: str, default: Any = _MISSING) -> Any:
+    """
+    按点号路径取值，列表用下标，例如 "data.data.data.order_items.0.sale_price"
+    路径不存在时返回 default，未传 default 则抛 KeyError
+    """
+    for key in path.split("."):
+        if isinstance(data, list) and key.lstrip("-").isdigit() and -len(data) <= int(key) < len(data):
+            data = data[int(key)]
+        elif isinstance(data, dict) and key in data:
+            data = data[key]
+        elif default is _MISSING:
+            raise KeyError(path)
+        else:
+            return default
+    return data
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : config_registry.py
+Time    : 2026/3/2
+Author  : xixi
+File    : utils
+#-------------------------------------------------------------
+"""
+import configparser
+import os
+import re
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Iterator, Mapping, Optional, Tuple
+
+from utils.log import logger
+
+ROOT_DIR = Path(__file__).parent.parent
+CONFIG_DIR = ROOT_DIR / 'config'
+
+LOCATORS_FILE = 'locators.ini'
+PARAMETERS_FILE = 'config.ini'
+
+# 模板占位符，例如 {category_name}、{series_name}
+_PLACEHOLDER = re.compile(r'\{(\w+)\}')
+# Playwright 选择器引擎前缀（逗号分隔的每一段可能各自带 css=）
+_ENGINE_PREFIX = re.compile(r'(^|,\s*)css=')
+
+_UNSET = object()
+
+
+class SelectorTemplate:
+    """预编译的定位器模板，渲染时只做列表拼接，不再逐次 replace"""
+
+    __slots__ = ('raw', 'fields', '_parts')
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        # 按占位符切分：偶数位是字面量，奇数位是字段名
+        self._parts = tuple(_PLACEHOLDER.split(raw))
+        self.fields = frozenset(self._parts[1::2])
+
+    def render(self, **kwargs) -> str:
+        """
+        渲染模板
+        :param kwargs: 占位符的值，例如 category_name="貓咪主食"
+        :return: 替换后的选择器字符串
+        """
+        missing = self.fields - kwargs.keys()
+        if missing:
+            raise KeyError(f"定位器模板缺少参数 {sorted(missing)}: {self.raw}")
+        return ''.join(
+            part if i % 2 == 0 else str(kwargs[part])
+            for i, part in enumerate(self._parts)
+        )
+
+    def __repr__(self):
+        return f"SelectorTemplate({self.raw!r})"
+
+
+class SelectorMap(Mapping):
+    """
+    单个 ini 分组的只读视图
+    - 兼容 SectionProxy 的 selectors['key'] 用法（找不到时忽略大小写再查一次）
+    - 含占位符的值预编译为 SelectorTemplate，通过 render() 使用
+    """
+
+    def __init__(self, name: str, items: Dict[str, str]):
+        self.name = name
+        self._items = MappingProxyType(dict(items))
+        self._folded = MappingProxyType({k.lower(): k for k in reversed(list(items))})
+        self._templates = MappingProxyType({
+            k: SelectorTemplate(v) for k, v in items.items() if _PLACEHOLDER.search(v)
+        })
+        self._css: Dict[str, str] = {}
+
+    def _resolve_key(self, key: str) -> str:
+        if key in self._items:
+            return key
+        folded = self._folded.get(key.lower())
+        if folded is None:
+            raise KeyError(f"[{self.name}] 中不存在定位器: {key}")
+        return folded
+
+    def __getitem__(self, key: str) -> str:
+        return self._items[self._resolve_key(key)]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and (key in self._items or key.lower() in self._folded)
+
+    def template(self, key: str) -> SelectorTemplate:
+        """获取预编译模板"""
+        key = self._resolve_key(key)
+        if key not in self._templates:
+            raise KeyError(f"[{self.name}] {key} 不是模板定位器")
+        return self._templates[key]
+
+    def render(self, key: str, **kwargs) -> str:
+        """渲染模板定位器，例如 render('series_button_template', series_name='營養罐')"""
+        return self.template(key).render(**kwargs)
+
+    def css(self, key: str) -> str:
+        """
+        去掉 css= 引擎前缀后的纯 CSS 选择器，供页面内 querySelectorAll 使用
+        例如 "css=.product-card, css=li.product" -> ".product-card, li.product"
+        """
+        key = self._resolve_key(key)
+        value = self._css.get(key)
+        if value is None:
+            value = _ENGINE_PREFIX.sub(r'\1', self._items[key])
+            self._css[key] = value
+        return value
+
+    def __repr__(self):
+        return f"SelectorMap({self.name!r}, {len(self)} items)"
+
+
+class FrozenConfig(Mapping):
+    """解析后的 ini 文件只读视图，同时兼容 ConfigParser 的 get(section, option) 用法"""
+
+    def __init__(self, path: Path, sections: Dict[str, SelectorMap]):
+        self.path = path
+        self._sections = MappingProxyType(sections)
+
+    def __getitem__(self, section: str) -> SelectorMap:
+        try:
+            return self._sections[section]
+        except KeyError:
+            raise KeyError(f"{self.path.name} 中不存在分组: [{section}]") from None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._sections)
+
+    def __len__(self) -> int:
+        return len(self._sections)
+
+    def sections(self) -> list:
+        return list(self._sections)
+
+    def has_option(self, section: str, option: str) -> bool:
+        return section in self._sections and option in self._sections[section]
+
+    def get(self, section: str, option: Optional[str] = None, *, fallback=_UNSET):
+        """
+        ConfigParser 风格取值：get('USER', 'GoogleAccount')
+        只传 section 时退化为 Mapping.get
+        """
+        if option is None:
+            return self._sections.get(section, None if fallback is _UNSET else fallback)
+        try:
+            return self[section][option]
+        except KeyError:
+            if fallback is _UNSET:
+                raise
+            return fallback
+
+
+def _parse(path: Path) -> FrozenConfig:
+    parser = configparser.ConfigParser(interpolation=None)
+    # 保留键的大小写：locators.ini 中同时存在 product_title 和 PRODUCT_TITLE
+    parser.optionxform = str
+    with open(path, encoding='utf-8') as f:
+        parser.read_file(f, source=str(path))
+    sections = {name: SelectorMap(name, dict(parser.items(name, raw=True)))
+                for name in parser.sections()}
+    return FrozenConfig(path, sections)
+
+
+class ConfigRegistry:
+    """
+    进程级配置注册表
+    每个 worker 进程只解析一次 ini；之后每次取用只做一次 stat，文件 mtime 变化时才重新解析
+    """
+
+    _lock = threading.Lock()
+    _cache: Dict[Path, Tuple[int, FrozenConfig]] = {}
+
+    @classmethod
+    def _find(cls, filename: str) -> Path:
+        path = CONFIG_DIR / filename
+        if not path.exists():
+            # 备选：从当前工作目录查找
+            path = Path.cwd() / 'config' / filename
+        if not path.exists():
+            raise FileNotFoundError(f"Config file not found at {path}")
+        return path
+
+    @classmethod
+    def load(cls, filename: str) -> FrozenConfig:
+        """获取指定 ini 文件的解析结果（带 mtime 校验的缓存）"""
+        path = cls._find(filename)
+        mtime = os.stat(path).st_mtime_ns
+        cached = cls._cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        with cls._lock:
+            cached = cls._cache.get(path)
+            if cached and cached[0] == mtime:
+                return cached[1]
+            config = _parse(path)
+            cls._cache[path] = (mtime, config)
+            logger.debug(f"已解析配置文件 {path.name}: {config.sections()}")
+            return config
+
+    @classmethod
+    def locators(cls) -> FrozenConfig:
+        """页面元素定位器 config/locators.ini"""
+        return cls.load(LOCATORS_FILE)
+
+    @classmethod
+    def parameters(cls) -> FrozenConfig:
+        """环境与账号参数 config/config.ini"""
+        return cls.load(PARAMETERS_FILE)
+
+    @classmethod
+    def clear(cls):
+        """清空缓存（一般只在调试时使用）"""
+        with cls._lock:
+            cls._cache.clear()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : context_pool.py
+Time    : 2026/3/6
+Author  : xixi
+File    : utils
+#-------------------------------------------------------------
+"""
+import json
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from playwright.sync_api import Browser, BrowserContext
+
+from utils.log import logger
+
+# 归还时逐个 origin 清空存储：localStorage / sessionStorage / IndexedDB / Service Worker / CacheStorage
+# 带登录态的上下文按 storage_state 中该 origin 的 localStorage 重新写回
+_RESET_STORAGE_SCRIPT = """async items => {
+    localStorage.clear();
+    sessionStorage.clear();
+    for (const {name, value} of items) localStorage.setItem(name, value);
+    if (indexedDB.databases) {
+        for (const {name} of await indexedDB.databases()) {
+            await new Promise((resolve, reject) => {
+                const request = indexedDB.deleteDatabase(name);
+                request.onsuccess = resolve;
+                request.onerror = () => reject(request.error);
+                request.onblocked = () => reject(new Error(`IndexedDB ${name} 仍被占用`));
+            });
+        }
+    }
+    if (navigator.serviceWorker) {
+        for (const registration of await navigator.serviceWorker.getRegistrations()) {
+            if (!await registration.unregister()) throw new Error(`Service Worker ${registration.scope} 注销失败`);
+        }
+    }
+    if (window.caches) {
+        for (const key of await caches.keys()) await caches.delete(key);
+    }
+}"""
+
+# 清理页面不访问真实站点：所有请求都返回空白 HTML，只为进入目标 origin
+_BLANK_PAGE = {'status': 200, 'content_type': 'text/html', 'body': '<!doctype html><title>reset</title>'}
+
+PoolKey = Tuple[Optional[str], str]
+
+
+def _freeze(preset: Optional[Dict]) -> str:
+    """预设转为稳定的字符串，作为池的键和脚本缓存的键"""
+    return json.dumps(preset or {}, sort_keys=True, ensure_ascii=False)
+
+
+def _origin(url: str) -> Optional[str]:
+    """http(s) 页面的 origin；about:blank、data: 等没有可清理的存储，返回 None"""
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.netloc:
+        return None
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _local_storage(items: Iterable[Dict]) -> Dict[str, str]:
+    return {item['name']: item['value'] for item in items}
+
+
+@lru_cache(maxsize=64)
+def build_storage_script(frozen_preset: str) -> str:
+    """
+    根据 {'localStorage': {...}, 'sessionStorage': {...}} 预设生成初始化脚本
+    相同预设只生成一次
+    """
+    preset = json.loads(frozen_preset)
+    lines = []
+    for storage in ('localStorage', 'sessionStorage'):
+        for key, value in preset.get(storage, {}).items():
+            if isinstance(value, (dict, list)):
+                value = json.dumps(value, ensure_ascii=False)
+            lines.append(f"{storage}.setItem('{key}', '{value}');")
+    return "\n".join(lines)
+
+
+class ContextPool:
+    """
+    每个 worker 一个的浏览器上下文池，避免每个用例都 new_context / close
+    - 按 (storage_state, 存储预设) 分池：预设通过 init script 注入且无法移除，只在同预设的用例间复用
+    - 归还时关闭页面、清空 cookie，并对用过的每个 origin 清空 localStorage/sessionStorage/IndexedDB/
+      Service Worker/CacheStorage，带登录态的上下文恢复到 storage_state
+    - 重置后再用 storage_state 核对，仍有残留或重置出错的上下文直接关闭丢弃
+    """
+
+    def __init__(self, browser: Browser, max_idle: int = 2,
+                 on_create: Optional[Callable[[BrowserContext, Dict], None]] = None,
+                 **context_kwargs):
+        """
+        :param browser: 会话级浏览器
+        :param max_idle: 每个池最多保留的空闲上下文数
+        :param on_create: 新建上下文后的回调 (context, preset)，例如注册弹窗处理器
+        :param context_kwargs: 透传给 browser.new_context 的参数（viewport 等）
+        """
+        self.browser = browser
+        self.max_idle = max_idle
+        self.on_create = on_create
+        self.context_kwargs = context_kwargs
+        self._lock = threading.Lock()
+        self._idle: Dict[PoolKey, List[BrowserContext]] = {}
+        self._leased: Dict[BrowserContext, PoolKey] = {}
+        self._states: Dict[str, Dict] = {}
+        self.stats = {'created': 0, 'reused': 0, 'discarded': 0}
+
+    def _storage_state(self, path: Optional[str]) -> Dict:
+        if not path:
+            return {}
+        if path not in self._states:
+            with open(path, encoding='utf-8') as f:
+                self._states[path] = json.load(f)
+        return self._states[path]
+
+    def acquire(self, preset: Optional[Dict] = None, storage_state: Optional[str] = None) -> BrowserContext:
+        """
+        取一个上下文
+        :param preset: {'localStorage': {...}, 'sessionStorage': {...}}，即 request.param
+        :param storage_state: 登录态文件路径，None 为匿名上下文
+        """
+        key = (storage_state, _freeze(preset))
+        with self._lock:
+            idle = self._idle.get(key)
+            context = idle.pop() if idle else None
+            if context is not None:
+                self._leased[context] = key
+                self.stats['reused'] += 1
+                return context
+
+        start = time.perf_counter()
+        kwargs = dict(self.context_kwargs)
+        if storage_state:
+            kwargs['storage_state'] = storage_state
+        context = self.browser.new_context(**kwargs)
+        init_script = build_storage_script(key[1])
+        if init_script:
+            context.add_init_script(init_script)
+        if self.on_create:
+            self.on_create(context, preset or {})
+        logger.debug(f"新建浏览器上下文，耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+
+        with self._lock:
+            self._leased[context] = key
+            self.stats['created'] += 1
+        return context
+
+    def release(self, context: BrowserContext, reuse: bool = True):
+        """
+        归还上下文：重置成功放回池中，否则关闭
+        :param reuse: False 时直接关闭（例如挂过 HAR 录制/回放路由的上下文）
+        """
+        with self._lock:
+            key = self._leased.pop(context, None)
+        if key is None:
+            return
+        if not reuse:
+            self._discard(context)
+            return
+
+        try:
+            self._reset(context, key[0])
+        except Exception as e:
+            logger.warning(f"上下文重置失败，丢弃: {e}")
+            self._discard(context)
+            return
+
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(context)
+                return
+        self._discard(context)
+
+    def _reset(self, context: BrowserContext, storage_state: Optional[str]):
+        state = self._storage_state(storage_state)
+        seeds = {origin['origin']: origin.get('localStorage', []) for origin in state.get('origins', [])}
+
+        # 需要清理的 origin：打开过的页面、运行中的 Service Worker、存储里留有数据的，以及登录态需要写回的
+        origins = set(seeds)
+        for page in context.pages:
+            origins.add(_origin(page.url))
+            page.close()
+        origins.update(_origin(worker.url) for worker in context.service_workers)
+        origins.update(origin['origin'] for origin in context.storage_state(indexed_db=True)['origins'])
+        origins.discard(None)
+
+        if origins:
+            page = context.new_page()
+            try:
+                # 页面级路由优先于上下文上的 HAR / 拦截路由
+                page.route("**/*", lambda route: route.fulfill(**_BLANK_PAGE))
+                for origin in sorted(origins):
+                    page.goto(f"{origin}/", wait_until="domcontentloaded")
+                    page.evaluate(_RESET_STORAGE_SCRIPT, seeds.get(origin, []))
+            finally:
+                page.close()
+
+        context.clear_cookies()
+        context.clear_permissions()
+        if state.get('cookies'):
+            context.add_cookies(state['cookies'])
+        self._verify(context, seeds)
+
+    @staticmethod
+    def _verify(context: BrowserContext, seeds: Dict[str, List[Dict]]):
+        """重置后的存储必须与登录态一致，否则抛错，由 release 丢弃该上下文"""
+        leftovers = []
+        for origin in context.storage_state(indexed_db=True)['origins']:
+            if origin.get('indexedDB'):
+                leftovers.append(f"{origin['origin']} IndexedDB")
+            if _local_storage(origin.get('localStorage', [])) != _local_storage(seeds.get(origin['origin'], [])):
+                leftovers.append(f"{origin['origin']} localStorage")
+        if leftovers:
+            raise RuntimeError(f"存储未清空: {', '.join(leftovers)}")
+
+    def _discard(self, context: BrowserContext):
+        with self._lock:
+            self.stats['discarded'] += 1
+        try:
+            context.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """关闭池中所有上下文（会话结束时调用）"""
+        with self._lock:
+            contexts = [c for idle in self._idle.values() for c in idle] + list(self._leased)
+            self._idle.clear()
+            self._leased.clear()
+        for context in contexts:
+            try:
+                context.close()
+            except Exception:
+                pass
+        logger.info(f"上下文池已关闭: {self.stats}")
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : har_replay.py
+Time    : 2026/3/8
+Author  : xixi
+File    : utils
+#-------------------------------------------------------------
+"""
+import json
+import os
+import re
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from playwright.sync_api import BrowserContext, Route
+
+from utils.config_registry import ROOT_DIR
+from utils.log import logger
+
+HAR_DIR = os.getenv("HAR_DIR", os.path.join(ROOT_DIR, "har"))
+HAR_MODES = ("off", "record", "replay")
+
+# 只录制/回放站点自身的请求，Google/Facebook 登录等第三方走真实网络
+HAR_URL_FILTER = re.compile(r"^https?://([\w-]+\.)*dogcatstar\.com/")
+
+# 防缓存、统计类查询参数，录制和回放时都去掉后再匹配；可用 HAR_IGNORE_PARAMS 追加（逗号分隔）
+CACHE_BUSTING_PARAMS = frozenset(
+    {"_", "t", "ts", "timestamp", "cb", "cache", "nocache", "rand", "r", "_ga", "_gl", "fbclid", "gclid"}
+    | {p.strip() for p in os.getenv("HAR_IGNORE_PARAMS", "").split(",") if p.strip()}
+)
+
+
+def normalize_url(url: str) -> str:
+    """去掉防缓存参数和 utm_* 参数，其余参数排序，保证同一资源得到同一个 URL"""
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in CACHE_BUSTING_PARAMS and not key.startswith("utm_")
+    )
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
+
+
+def normalize_har_file(path: str) -> int:
+    """
+    把录制好的 HAR 中的请求 URL 规范化，与回放时的匹配规则一致
+    :return: 改写的条目数
+    """
+    with open(path, encoding="utf-8") as f:
+        har = json.load(f)
+
+    changed = 0
+    for entry in har.get("log", {}).get("entries", []):
+        request = entry["request"]
+        normalized = normalize_url(request["url"])
+        if normalized != request["url"]:
+            request["url"] = normalized
+            request["queryString"] = [{"name": k, "value": v}
+                                      for k, v in parse_qsl(urlsplit(normalized).query, keep_blank_values=True)]
+            changed += 1
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(har, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return changed
+
+
+def har_name(node) -> str:
+    """
+    HAR 文件名：用例带 @pytest.mark.har("cat_food") 时按页面共享，否则每个用例一个
+    """
+    marker = node.get_closest_marker("har")
+    if marker is not None and marker.args:
+        name = marker.args[0]
+    else:
+        name = node.nodeid
+    return re.sub(r"[^\w.-]+", "_", name).strip("_")
+
+
+class HarSession:
+    """
+    单个用例的 HAR 录制 / 回放
+    - record：route_from_har(update=True) 录制，上下文关闭时写盘，之后规范化 URL
+    - replay：route_from_har 回放；请求先经过规范化路由（route.fallback(url=...)）再交给 HAR 匹配
+    - 挂过 HAR 的上下文都不能放回池中：route_from_har 注册的路由拿不到处理器引用，无法单独移除，
+      而 unroute_all 会连同上下文上其他路由一起移除
+    """
+
+    def __init__(self, path: str, mode: str, not_found: str = "fallback"):
+        """
+        :param path: HAR 文件路径
+        :param mode: record / replay
+        :param not_found: 回放时 HAR 中没有的请求：fallback 走真实网络，abort 直接失败（离线运行）
+        """
+        self.path = path
+        self.mode = mode
+        self.not_found = not_found
+        self._active = False
+
+    @classmethod
+    def from_request(cls, request) -> Optional["HarSession"]:
+        mode = request.config.getoption("--har") or os.getenv("HAR_MODE", "off")
+        if mode not in HAR_MODES:
+            raise ValueError(f"未知的 HAR 模式: {mode}，可选: {', '.join(HAR_MODES)}")
+        if mode == "off":
+            return None
+        path = os.path.join(HAR_DIR, f"{har_name(request.node)}.har")
+        return cls(path, mode, not_found=request.config.getoption("--har-not-found"))
+
+    @property
+    def reusable(self) -> bool:
+        """录制需要关闭上下文才会写盘；回放的 HAR 路由无法单独移除，两者都不能放回上下文池"""
+        return not self._active
+
+    @staticmethod
+    def _normalize(route: Route):
+        url = route.request.url
+        normalized = normalize_url(url)
+        if normalized != url:
+            route.fallback(url=normalized)
+        else:
+            route.fallback()
+
+    def start(self, context: BrowserContext):
+        if self.mode == "record":
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            context.route_from_har(self.path, url=HAR_URL_FILTER, update=True,
+                                   update_content="attach", update_mode="minimal")
+            self._active = True
+            logger.info(f"HAR 录制: {self.path}")
+            return
+
+        if not os.path.exists(self.path):
+            logger.warning(f"HAR 文件不存在，本用例走真实网络: {self.path}")
+            return
+        context.route_from_har(self.path, url=HAR_URL_FILTER, not_found=self.not_found)
+        # 后注册的路由先执行：先规范化 URL，再由 HAR 匹配
+        context.route(HAR_URL_FILTER, self._normalize)
+        self._active = True
+        logger.info(f"HAR 回放: {self.path}")
+
+    def stop(self, context: BrowserContext):
+        """回放：移除本会话注册的规范化路由，HAR 路由随上下文关闭释放；录制：等上下文关闭后调用 finish"""
+        if self._active and self.mode == "replay":
+            context.unroute(HAR_URL_FILTER, self._normalize)
+
+    def finish(self):
+        """录制结束（上下文已关闭、HAR 已写盘）后规范化 URL"""
+        if not (self._active and self.mode == "record"):
+            return
+        try:
+            changed = normalize_har_file(self.path)
+            logger.info(f"HAR 已保存: {self.path}（规范化 {changed} 条 URL）")
+        except (OSError, ValueError) as e:
+            logger.warning(f"HAR 规范化失败: {self.path}: {e}")
@@ -8,15 +8,71 @@ Author  : xixi
 File    : 根据IP获取地区
 #-------------------------------------------------------------
 """
+import hashlib
 import json
-from typing import Optional, Dict, Any
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from functools import lru_cache
+from typing import Optional, Dict, Any, List, Tuple
 
 # ip_utils.py
 import requests
 
+from utils.auth_cache import file_lock, write_json_atomic
+from utils.config_registry import ROOT_DIR
+from utils.log import logger
+from utils.region_resolver import SUPPORTED_REGIONS, forced_region, get_resolver
+
+# IP 信息缓存有效期（秒）与磁盘缓存文件，xdist 多个 worker 共享
+IP_INFO_TTL = int(os.getenv("IP_INFO_TTL", "3600"))
+IP_INFO_CACHE = os.getenv("IP_INFO_CACHE", os.path.join(ROOT_DIR, ".cache", "ip_info.json"))
+
+
+def stub_provider(info: Dict[str, Any], name: str = 'stub') -> Dict[str, Any]:
+    """
+    本地桩服务，不发网络请求，直接返回给定的 IP 信息
+    例：IPInfoFetcher.set_providers([stub_provider({'ip': '1.2.3.4', 'country_code': 'HK'})])
+    """
+    return {'name': name, 'timeout': 0, 'fetch': lambda proxies: dict(info)}
+
+
+def _stub_from_env() -> Optional[Dict[str, Any]]:
+    """
+    环境变量 IP_INFO_STUB 指定桩数据：国家代码（如 HK）或完整的 JSON
+    JSON 无法解析时记录错误并忽略该变量（按未设置处理）
+    """
+    value = os.getenv("IP_INFO_STUB", "").strip()
+    if not value:
+        return None
+    info = _parse_stub(value)
+    return stub_provider(info, name='IP_INFO_STUB') if info is not None else None
+
+
+@lru_cache(maxsize=8)
+def _parse_stub(value: str) -> Optional[Dict[str, Any]]:
+    # 按值缓存：每次查询都会读取 IP_INFO_STUB，错误只记录一次
+    if not value.startswith('{'):
+        return {'ip': '127.0.0.1', 'country_code': value.upper()}
+    try:
+        info = json.loads(value)
+    except ValueError as e:
+        logger.error(f"IP_INFO_STUB 不是合法的 JSON，已忽略: {value!r}（{e}）")
+        return None
+    if not isinstance(info, dict):
+        logger.error(f"IP_INFO_STUB 应为 JSON 对象，已忽略: {value!r}")
+        return None
+    return info
+
 
 class IPInfoFetcher:
-    """IP 信息获取工具类"""
+    """
+    IP 信息获取工具类
+    - 多个服务商并发请求，取第一个有效结果，其余直接放弃
+    - 结果按代理配置缓存：进程内 + 磁盘（IP_INFO_CACHE），有效期 IP_INFO_TTL
+    - 服务商可替换（set_providers / IP_INFO_STUB），替换后不读写磁盘缓存
+    """
 
     # IP 服务商列表，按优先级排序
     IP_SERVICES = [
@@ -64,85 +120,212 @@ class IPInfoFetcher:
         }
     ]
 
-    # IP 到地区代码的映射
-    IP_TO_REGION = {
-        # 台湾
-        'TW': ['TW'],
-        # 香港
-        'HK': ['HK'],
-        # 新加坡
-        'SG': ['SG'],
-        # 马来西亚
-        'MY': ['MY'],
-    }
+    # 地区代码 -> 国家代码
+    IP_TO_REGION = {region: [region] for region in SUPPORTED_REGIONS}
 
-    @classmethod
-    def get_ip_info(cls, use_proxy: bool = False, proxies: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
-        """
-        获取当前 IP 的详细信息
+    # 替换后的服务商列表，None 表示使用 IP_SERVICES
+    providers: Optional[List[Dict[str, Any]]] = None
 
-        Args:
-            use_proxy: 是否使用代理
-            proxies: 代理配置，格式如 {'http': 'http://proxy:port', 'https': 'https://proxy:port'}
+    # 进程内缓存：缓存键 -> (写入时间, IP 信息)
+    _memory_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+    _cache_lock = threading.Lock()
 
-        Returns:
-            包含 IP 信息的字典，如果失败返回 None
+    @classmethod
+    def set_providers(cls, providers: Optional[List[Dict[str, Any]]]):
+        """
+        替换服务商（None 恢复默认），同时清空进程内缓存
+        每项为 {'name', 'url', 'timeout', 'parser'} 或 {'name', 'fetch': callable(proxies) -> dict}
         """
-        for service in cls.IP_SERVICES:
+        cls.providers = providers
+        cls.clear_cache(disk=False)
+
+    @classmethod
+    def clear_cache(cls, disk: bool = True):
+        with cls._cache_lock:
+            cls._memory_cache.clear()
+        if disk:
             try:
-                print(f"尝试从 {service['name']} 获取 IP 信息...")
+                os.remove(IP_INFO_CACHE)
+            except FileNotFoundError:
+                pass
 
-                response = requests.get(
-                    service['url'],
-                    timeout=service['timeout'],
-                    proxies=proxies if use_proxy else None
-                )
+    @classmethod
+    def _active_providers(cls) -> Tuple[List[Dict[str, Any]], bool]:
+        """返回 (服务商列表, 是否为默认的真实服务商)"""
+        stub = _stub_from_env()
+        if stub:
+            return [stub], False
+        if cls.providers is not None:
+            return cls.providers, False
+        return cls.IP_SERVICES, True
+
+    @staticmethod
+    def _cache_key(proxies: Optional[Dict]) -> str:
+        # 代理地址可能带账号密码，只保存摘要
+        if not proxies:
+            return 'direct'
+        raw = json.dumps(proxies, sort_keys=True)
+        return 'proxy:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def _is_valid(ip_info: Optional[Dict[str, Any]]) -> bool:
+        code = (ip_info or {}).get('country_code') or ''
+        return len(code) == 2 and code.isalpha()
 
-                if response.status_code == 200:
-                    data = response.json()
-                    ip_info = service['parser'](data)
+    @classmethod
+    def _memory_get(cls, key: str) -> Optional[Dict[str, Any]]:
+        with cls._cache_lock:
+            entry = cls._memory_cache.get(key)
+        if entry and time.time() - entry[0] < IP_INFO_TTL:
+            return entry[1]
+        return None
 
-                    print(f"成功从 {service['name']} 获取 IP 信息:")
-                    print(f"  IP: {ip_info.get('ip')}")
-                    print(f"  国家/地区: {ip_info.get('country_name', '未知')} ({ip_info.get('country_code', '未知')})")
-                    print(f"  城市: {ip_info.get('city', '未知')}")
-                    print(f"  地区: {ip_info.get('region', '未知')}")
+    @classmethod
+    def _memory_put(cls, key: str, ip_info: Dict[str, Any], fetched_at: Optional[float] = None):
+        with cls._cache_lock:
+            cls._memory_cache[key] = (fetched_at or time.time(), ip_info)
+
+    @staticmethod
+    def _read_disk() -> Dict[str, Any]:
+        try:
+            with open(IP_INFO_CACHE, encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
 
-                    return ip_info
+    @classmethod
+    def _disk_get(cls, key: str) -> Optional[Dict[str, Any]]:
+        entry = cls._read_disk().get(key)
+        if not entry or time.time() - entry.get('ts', 0) >= IP_INFO_TTL:
+            return None
+        cls._memory_put(key, entry['info'], entry['ts'])
+        return entry['info']
 
-            except Exception as e:
-                print(f"从 {service['name']} 获取 IP 信息失败: {e}")
-                continue
+    @classmethod
+    def _disk_put(cls, key: str, ip_info: Dict[str, Any]):
+        data = cls._read_disk()
+        data[key] = {'ts': time.time(), 'info': ip_info}
+        try:
+            write_json_atomic(IP_INFO_CACHE, data)
+        except OSError as e:
+            logger.warning(f"IP 信息缓存写入失败: {e}")
+
+    @staticmethod
+    def _fetch(service: Dict[str, Any], proxies: Optional[Dict]) -> Optional[Dict[str, Any]]:
+        if 'fetch' in service:
+            return service['fetch'](proxies)
+        response = requests.get(service['url'], timeout=service['timeout'], proxies=proxies)
+        if response.status_code != 200:
+            raise requests.HTTPError(f"HTTP {response.status_code}")
+        return service['parser'](response.json())
 
-        print("所有 IP 服务都失败了")
+    @classmethod
+    def _race(cls, providers: List[Dict[str, Any]], proxies: Optional[Dict]) -> Optional[Dict[str, Any]]:
+        """并发请求所有服务商，返回第一个有效结果"""
+        start = time.perf_counter()
+        deadline = max((service.get('timeout') or 0 for service in providers), default=0) + 1
+        pool = ThreadPoolExecutor(max_workers=len(providers), thread_name_prefix="ip-info")
+        futures = {pool.submit(cls._fetch, service, proxies): service['name'] for service in providers}
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                name = futures[future]
+                try:
+                    ip_info = future.result()
+                except Exception as e:
+                    logger.warning(f"从 {name} 获取 IP 信息失败: {e}")
+                    continue
+                if cls._is_valid(ip_info):
+                    logger.info(f"从 {name} 获取 IP 信息: {ip_info.get('ip')} "
+                                f"{ip_info.get('country_name') or ''}({ip_info.get('country_code')})，"
+                                f"耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+                    return ip_info
+                logger.warning(f"{name} 返回的 IP 信息无效: {ip_info}")
+        except FutureTimeoutError:
+            logger.warning(f"IP 服务 {deadline}s 内均未返回")
+        finally:
+            # 不等待较慢的服务商
+            pool.shutdown(wait=False, cancel_futures=True)
+        logger.error("所有 IP 服务都失败了")
         return None
 
     @classmethod
-    def detect_region_from_ip(cls, use_proxy: bool = False, proxies: Optional[Dict] = None) -> Optional[str]:
+    def get_ip_info(cls, use_proxy: bool = False, proxies: Optional[Dict] = None,
+                    refresh: bool = False) -> Optional[Dict[str, Any]]:
         """
-        根据 IP 检测地区代码
+        获取当前 IP 的详细信息
 
         Args:
             use_proxy: 是否使用代理
-            proxies: 代理配置
+            proxies: 代理配置，格式如 {'http': 'http://proxy:port', 'https': 'https://proxy:port'}
+            refresh: 忽略缓存重新查询
 
         Returns:
-            地区代码 (TW, HK, SG, MY) 或 None
+            包含 IP 信息的字典，如果失败返回 None
         """
-        ip_info = cls.get_ip_info(use_proxy, proxies)
+        providers, is_default = cls._active_providers()
+        proxies = proxies if use_proxy else None
+        if not is_default:
+            return cls._race(providers, proxies)
+
+        key = cls._cache_key(proxies)
+        if not refresh:
+            ip_info = cls._memory_get(key) or cls._disk_get(key)
+            if ip_info:
+                return ip_info
+
+        try:
+            # 多个 worker 同时未命中时只有一个去查询，其余等它写完缓存
+            with file_lock(f"{IP_INFO_CACHE}.lock", timeout=30, poll=0.1):
+                ip_info = None if refresh else cls._disk_get(key)
+                if ip_info is None:
+                    ip_info = cls._race(providers, proxies)
+                    if ip_info:
+                        cls._disk_put(key, ip_info)
+        except TimeoutError:
+            ip_info = cls._race(providers, proxies)
+
+        if ip_info:
+            cls._memory_put(key, ip_info)
+        return ip_info
 
-        if not ip_info:
-            return None
+    @classmethod
+    def detect_region_from_ip(cls, use_proxy: bool = False, proxies: Optional[Dict] = None,
+                              ip: Optional[str] = None) -> Optional[str]:
+        """
+        根据 IP 检测地区代码
 
-        country_code = ip_info.get('country_code', '').upper()
+        Args:
+            use_proxy: 是否使用代理
+            proxies: 代理配置
+            ip: 指定 IP 时查离线 IP 段表，不访问网络
+
+        Returns:
+            地区代码 (TW, HK, SG, MY)，FORCE_REGION 优先；不在支持范围内返回国家代码；失败返回 None
+        """
+        region = forced_region()
+        if region:
+            logger.info(f"使用 FORCE_REGION 指定的地区: {region}")
+            return region
+
+        if ip:
+            country_code = get_resolver().lookup(ip)
+            if not country_code:
+                logger.info(f"离线 IP 段表中没有 {ip}")
+                return None
+        else:
+            ip_info = cls.get_ip_info(use_proxy, proxies)
+            if not ip_info:
+                return None
+            country_code = ip_info.get('country_code', '').upper()
 
         # 映射到我们的地区代码
         for region_code, country_codes in cls.IP_TO_REGION.items():
             if country_code in country_codes:
-                print(f"检测到地区: {region_code} (根据国家代码: {country_code})")
+                logger.info(f"检测到地区: {region_code} (根据国家代码: {country_code})")
                 return region_code
 
-        print(f"无法识别的国家代码: {country_code}")
+        logger.info(f"无法识别的国家代码: {country_code}")
         return country_code
 
     @classmethod
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : launch_profiles.py
+Time    : 2026/3/6
+Author  : xixi
+File    : utils
+#-------------------------------------------------------------
+"""
+import os
+from typing import Dict, Optional
+
+# 所有档位共用的 Chromium 参数
+COMMON_ARGS = [
+    '--disable-blink-features=AutomationControlled',  # 隐藏自动化特征
+    '--disable-dev-shm-usage',                       # 解决 Docker 内存问题
+    '--no-sandbox',                                  # 避免沙盒限制
+    '--disable-setuid-sandbox',
+    '--disable-web-security',
+    '--disable-features=IsolateOrigins,site-per-process',
+    '--disable-client-side-phishing-detection',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-popup-blocking',
+    '--disable-prompt-on-repost',
+    '--disable-sync',
+    '--no-first-run',
+    '--no-default-browser-check',
+    '--disable-infobars',
+    '--disable-breakpad',
+    '--disable-crash-reporter',
+]
+
+# 去掉 GPU/渲染相关开销
+_NO_RENDER_ARGS = [
+    '--disable-gpu',
+    '--disable-software-rasterizer',
+    '--disable-accelerated-2d-canvas',
+    '--disable-webgl',
+]
+
+LAUNCH_PROFILES: Dict[str, Dict] = {
+    # CI 默认：无头 + 关闭渲染加速和后台任务
+    'fast-headless': {
+        'headless': True,
+        'args': COMMON_ARGS + _NO_RENDER_ARGS + [
+            '--window-size=1366,768',
+            '--mute-audio',
+            '--disable-background-networking',
+            '--disable-background-timer-throttling',
+            '--disable-renderer-backgrounding',
+            '--disable-backgrounding-occluded-windows',
+        ],
+    },
+    # 本地调试：有界面，与原来的启动参数一致
+    'debug-headed': {
+        'headless': False,
+        'args': COMMON_ARGS + _NO_RENDER_ARGS + ['--window-size=1920,1080'],
+    },
+    # 小内存机器 / 多 worker：限制 V8 堆与进程数
+    'low-memory': {
+        'headless': True,
+        'args': COMMON_ARGS + _NO_RENDER_ARGS + [
+            '--window-size=1366,768',
+            '--mute-audio',
+            '--renderer-process-limit=2',
+            '--disable-extensions',
+            '--disable-background-networking',
+            '--js-flags=--max-old-space-size=512',
+        ],
+    },
+}
+
+DEFAULT_PROFILE = 'debug-headed'
+
+
+def get_launch_profile(name: Optional[str] = None) -> Dict:
+    """
+    获取启动档位，优先级：参数 > 环境变量 LAUNCH_PROFILE > DEFAULT_PROFILE
+    :return: {'name', 'headless', 'args'}，args 为新列表，可自行追加
+    :raises ValueError: 档位不存在
+    """
+    name = name or os.getenv('LAUNCH_PROFILE') or DEFAULT_PROFILE
+    if name not in LAUNCH_PROFILES:
+        raise ValueError(f"未知的启动档位: {name}，可选: {', '.join(LAUNCH_PROFILES)}")
+    profile = LAUNCH_PROFILES[name]
+    return {'name': name, 'headless': profile['headless'], 'args': list(profile['args'])}
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : load_bench.py
+Time    : 2026/3/10
+Author  : xixi
+File    : utils
+#-------------------------------------------------------------
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from utils.api_client import ApiClient
+from utils.log import logger
+from utils.perf import percentile
+
+
+def _summary(values) -> Dict:
+    values = sorted(values)
+    count = len(values)
+    return {
+        "avg": round(sum(values) / count, 2) if count else 0.0,
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "max": round(values[-1], 2) if count else 0.0,
+    }
+
+
+def run_load(url: str, payload_factory: Callable[[], Dict], headers: Optional[Dict] = None,
+             concurrency: int = 10, rps: Optional[float] = None, duration: float = 10.0,
+             total: Optional[int] = None, expected_status: int = 200,
+             client: Optional[ApiClient] = None) -> Dict:
+    """
+    对接口施压并统计延迟、错误率、吞吐
+    :param url: 完整接口地址
+    :param payload_factory: 每次请求调用一次，返回请求体
+    :param headers: 请求头（与客户端预置头合并）
+    :param concurrency: 并发线程数
+    :param rps: 目标每秒请求数；None 表示不限速（闭环压测，并发数决定压力）
+    :param duration: 持续时间（秒），total 先达到则提前结束
+    :param total: 最多发出的请求数
+    :param expected_status: 非该状态码计为错误
+    :param client: 复用的 ApiClient，不传则新建（压测时不重试，避免掩盖错误）
+    :return: 统计结果字典
+    """
+    own_client = client is None
+    client = client or ApiClient(retries=0, pool_size=concurrency)
+
+    lock = threading.Lock()
+    latencies = []
+    service_times = []
+    lags = []
+    statuses = Counter()
+    errors = Counter()
+    next_index = [0]
+
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def take_slot() -> Optional[float]:
+        """取下一个请求序号，返回其计划发出时间；已达上限返回 None"""
+        with lock:
+            index = next_index[0]
+            if total is not None and index >= total:
+                return None
+            next_index[0] += 1
+        now = time.perf_counter()
+        scheduled = start + index / rps if rps else now
+        # 到时间即停止，落后于计划尚未发出的请求不再补发
+        return None if scheduled >= deadline or now >= deadline else scheduled
+
+    def worker():
+        while True:
+            scheduled = take_slot()
+            if scheduled is None:
+                return
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            # 请求体构造出错属于压测脚本本身的问题，不计入接口错误，直接抛出
+            payload = payload_factory()
+            sent = time.perf_counter()
+            try:
+                response = client.post(url, json=payload, headers=headers)
+                status, error = response.status_code, None
+                if status != expected_status:
+                    error = f"HTTP {status}"
+            except Exception as e:
+                status, error = None, type(e).__name__
+            done = time.perf_counter()
+            # 限速模式下从计划发出时间算起：客户端跟不上节奏时的排队等待也计入延迟（避免 coordinated omission）
+            elapsed_ms = (done - scheduled) * 1000
+            with lock:
+                latencies.append(elapsed_ms)
+                service_times.append((done - sent) * 1000)
+                lags.append(max(0.0, sent - scheduled) * 1000)
+                statuses[str(status)] += 1
+                if error:
+                    errors[error] += 1
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load") as pool:
+            futures = [pool.submit(worker) for _ in range(concurrency)]
+        # worker 在请求之外出错（payload_factory 等）时直接抛出，不让报告悄悄少掉请求
+        for future in futures:
+            future.result()
+    finally:
+        if own_client:
+            client.close()
+
+    wall = time.perf_counter() - start
+    count = len(latencies)
+    error_count = sum(errors.values())
+    report = {
+        "url": url,
+        "concurrency": concurrency,
+        "target_rps": rps,
+        "duration_s": round(wall, 3),
+        "requests": count,
+        "errors": error_count,
+        "error_rate": round(error_count / count, 4) if count else 0.0,
+        "throughput_rps": round(count / wall, 2) if wall else 0.0,
+        # 限速模式：从计划发出时间到收到响应；不限速时与 service_time_ms 相同
+        "latency_ms": _summary(latencies),
+        # 从实际发出到收到响应
+        "service_time_ms": _summary(service_times),
+        # 实际发出时间落后计划的程度，持续偏大说明并发数不足以维持目标 RPS
+        "dispatch_lag_ms": _summary(lags),
+        "status_counts": dict(statuses),
+        "error_counts": dict(errors),
+    }
+    logger.info(f"压测完成: {report['requests']} 个请求，吞吐 {report['throughput_rps']} rps，"
+                f"p95 {report['latency_ms']['p95']}ms（发出滞后 p95 {report['dispatch_lag_ms']['p95']}ms），"
+                f"错误率 {report['error_rate']}")
+    return report
+
+
+if __name__ == '__main__':
+    # 默认压本地 mock：python -m utils.load_bench --base-url http://127.0.0.1:5000 --concurrency 20 --duration 10
+    from api.payloads import build_payload
+    from utils.api_client import CART_CALCULATE_PATH, auth_headers
+
+    parser = argparse.ArgumentParser(description="cart/calculate 压测")
+    parser.add_argument('--base-url', default=os.getenv("DEV_BASE_URL", "http://localhost:5000"))
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--rps', type=float, default=None)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--total', type=int, default=None)
+    parser.add_argument('--output', default=None, help="结果 JSON 写入的文件")
+    args = parser.parse_args()
+
+    result = run_load(args.base_url.rstrip('/') + CART_CALCULATE_PATH, build_payload,
+                      headers=auth_headers() or {"api-token": "bench", "x-platform-token": "bench"},
+                      concurrency=args.concurrency, rps=args.rps, duration=args.duration, total=args.total)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
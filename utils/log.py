@@ -8,10 +8,17 @@ Author  : xixi
 File    : dogcatstar/common
 #-------------------------------------------------------------
 """
+import atexit
+import copy
+import gzip
+import json
 import logging
 # 设置日志颜色的包
 import os
-import time
+import queue
+import shutil
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 import colorlog
 from pathlib import Path
@@ -54,23 +61,58 @@ log_colors_config = {
 '''创建logger记录器'''
 logger = logging.getLogger('pick')
 
-# 输出到控制台
-console_handler = logging.StreamHandler()
-
 '''日志级别设置'''
 
-# logger控制最低输出什么级别日志(优先级最高)
-logger.setLevel(logging.DEBUG)
+# logger控制最低输出什么级别日志(优先级最高)，configure_logging 可覆盖
+logger.setLevel(os.getenv("LOG_LEVEL", "DEBUG").upper())
 
-# console_handler设置控制台最低输出级别日志
-console_handler.setLevel(logging.DEBUG)
+# xdist worker 编号（gw0、gw1…），非 xdist 运行为 main
+WORKER_ID = os.getenv("PYTEST_XDIST_WORKER", "main")
 
-# # 日志输出格式
-# #保存文件的日志格式
-file_formatter = logging.Formatter(
-    fmt='[%(asctime)s] %(filename)s -> %(funcName)s line:%(lineno)d [%(levelname)s] : %(message)s',
-    datefmt='%Y-%m-%d  %H:%M:%S'
-)
+# 当前用例 nodeid，由根目录 conftest 在每个用例开始/结束时设置
+_current_test = {'nodeid': None}
+
+
+def set_current_test(nodeid):
+    _current_test['nodeid'] = nodeid
+
+
+class ContextFilter(logging.Filter):
+    """在用例线程入队时打上 worker 和用例标签（后台线程格式化时当前用例可能已经变了）"""
+
+    def filter(self, record):
+        record.worker = WORKER_ID
+        record.nodeid = _current_test['nodeid']
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    文件日志每行一个 JSON 对象，便于 grep / jq 聚合
+    字段：ts, level, worker, test, file, func, line, msg，有异常时带 exc
+    """
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'worker': getattr(record, 'worker', WORKER_ID),
+            'test': getattr(record, 'nodeid', None),
+            'file': record.filename,
+            'func': record.funcName,
+            'line': record.lineno,
+            'msg': record.getMessage(),
+        }
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        elif record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+file_formatter = JsonFormatter()
+# 入队前把异常堆栈转成文本（LazyQueueHandler.prepare）
+_exc_formatter = logging.Formatter()
 #
 # 控制台的日志格式
 console_formatter = colorlog.ColoredFormatter(
@@ -81,37 +123,197 @@ console_formatter = colorlog.ColoredFormatter(
     log_colors=log_colors_config
 )
 # log_path = os.path.dirname(os.path.realpath(__file__)) + '/Logs/'  # 日志目录
-log_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + '/Logs/'
+log_path = os.getenv("LOG_DIR") or os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + '/Logs/'
 
 # log_path = Path(__file__).parent.parent / 'Logs' / ''
 
 
 formatter = logging.Formatter("%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s")
 
-if os.path.exists(log_path) == False:  # 目录不存在就创建
-    os.makedirs(log_path)
+# 输出目的地：console 控制台，file 每个 worker 一个 JSON 行文件
+SINKS = ("console", "file")
+LOG_SINKS = os.getenv("LOG_SINKS", "console,file")
+
+# 单个文件上限与保留个数；LOG_GZIP=1 时轮转出的旧文件压缩为 .gz（在后台线程中进行）
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "10"))
+LOG_GZIP = os.getenv("LOG_GZIP", "0") == "1"
+
+# 队列容量与队列满时的策略：drop 丢弃 WARNING 以下的日志（WARNING 及以上仍阻塞等待），block 全部阻塞等待
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_QUEUE_POLICY = os.getenv("LOG_QUEUE_POLICY", "drop")
+
+
+def _gzip_namer(name):
+    return name + ".gz"
+
+
+def _gzip_rotator(source, dest):
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+class WorkerFileHandler(RotatingFileHandler):
+    """按大小轮转的文件 handler，第一次写入时才创建目录和文件"""
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
 
-logTime = time.strftime('%Y%m%d%H', time.localtime(time.time()))  # 当前时间到小时
-log_file = log_path + logTime + '.log'  # 文件名
 
-if os.path.exists(log_file) == False:  # 日志文件不存在就创建
-    fd = open(log_file, mode="w", encoding="utf-8")
-    fd.close()
+class LazyQueueHandler(QueueHandler):
+    """
+    用例线程只做 msg % args 拼接（参数在调用时定格，之后被修改也不影响日志）和异常堆栈转文本，
+    时间戳 / JSON 序列化、控制台着色和写盘都在后台线程完成
+    体积大的对象（商品列表、响应体等）请用 DEBUG 级别并先判断 logger.isEnabledFor(logging.DEBUG)
+    """
 
-file_handler = logging.FileHandler(filename=log_file, mode='a', encoding='utf8')
-file_handler.setLevel(logging.DEBUG)
-file_handler.setFormatter(file_formatter)
-console_handler.setFormatter(console_formatter)
+    def __init__(self, log_queue, policy=LOG_QUEUE_POLICY):
+        super().__init__(log_queue)
+        self.policy = policy
+        self.dropped = 0
 
-# console_handler设置保存到文件最低输出级别日志
-file_handler.setLevel(logging.INFO)
+    def prepare(self, record):
+        # 与标准库 QueueHandler 一样在入队前拼好消息：args 中的可变对象在后台线程 repr 时可能已被修改，
+        # 甚至在迭代中改变大小而报错；exc_info 中的 traceback 也会引用整条调用栈
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.policy == "block" or record.levelno >= logging.WARNING:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _BlockingQueueListener(QueueListener):
+    """队列满时停止信号也要排队等待，不能像默认实现那样 put_nowait 抛错"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class _LazyInitHandler(logging.Handler):
+    """占位 handler：没有显式初始化时（例如直接运行脚本），第一条日志按默认参数初始化后再分发"""
+
+    def handle(self, record):
+        configure_logging()
+        logger.handle(record)
+        return True
+
+    def emit(self, record):
+        pass
+
+
+# 当前配置：handlers 为控制台 / 文件 handler，listener 为后台写线程（关闭后为 None）
+_state = {'configured': False, 'handlers': (), 'queue_handler': None, 'listener': None}
+_lock = threading.RLock()
+_lazy_handler = _LazyInitHandler()
 
 if not logger.handlers:
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    logger.addHandler(_lazy_handler)
+
+
+def _build_handlers(sinks, log_dir, console_level, file_level):
+    handlers = []
+    if "console" in sinks:
+        # 输出到控制台
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(console_level)
+        console_handler.setFormatter(console_formatter)
+        handlers.append(console_handler)
+    if "file" in sinks:
+        # 每个 worker 写自己的文件，按大小轮转：Logs/pick_gw0.jsonl、pick_gw0.jsonl.1(.gz)…
+        log_file = os.path.join(os.path.abspath(log_dir), f"pick_{WORKER_ID}.jsonl")
+        file_handler = WorkerFileHandler(filename=log_file, mode='a', maxBytes=LOG_MAX_BYTES,
+                                         backupCount=LOG_BACKUP_COUNT, encoding='utf8', delay=True)
+        if LOG_GZIP:
+            file_handler.namer = _gzip_namer
+            file_handler.rotator = _gzip_rotator
+        file_handler.setLevel(file_level)
+        file_handler.setFormatter(file_formatter)
+        handlers.append(file_handler)
+    return handlers
+
+
+def configure_logging(level=None, sinks=None, log_dir=None, console_level=logging.DEBUG,
+                      file_level=logging.INFO, force=False) -> bool:
+    """
+    初始化日志（幂等，由根目录 conftest 的 pytest_configure 调用，未调用时第一条日志自动按默认值初始化）
+    只创建 handler 和后台线程，不做磁盘操作；Logs/ 目录和文件在第一条写入文件的日志时才创建
+    :param level: logger 级别，默认环境变量 LOG_LEVEL 或 DEBUG
+    :param sinks: 输出目的地，"console,file" 的子集（字符串或列表），默认环境变量 LOG_SINKS
+    :param log_dir: 文件日志目录，默认环境变量 LOG_DIR 或项目根目录下的 Logs/
+    :param console_level: 控制台最低级别
+    :param file_level: 文件最低级别
+    :param force: 已初始化时先关闭再按新参数重建
+    :return: 本次是否进行了初始化
+    """
+    with _lock:
+        if _state['configured']:
+            if not force:
+                return False
+            shutdown_logging()
+            for handler in _state['handlers']:
+                logger.removeHandler(handler)
+                handler.close()
+
+        sinks = sinks if sinks is not None else LOG_SINKS
+        if isinstance(sinks, str):
+            sinks = [sink.strip() for sink in sinks.split(",") if sink.strip()]
+        unknown = set(sinks) - set(SINKS)
+        if unknown:
+            raise ValueError(f"未知的日志输出: {', '.join(sorted(unknown))}，可选: {', '.join(SINKS)}")
+        if level is not None:
+            logger.setLevel(level.upper() if isinstance(level, str) else level)
+
+        handlers = _build_handlers(sinks, log_dir or log_path, console_level, file_level)
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        queue_handler = LazyQueueHandler(log_queue)
+        queue_handler.addFilter(ContextFilter())
+        listener = _BlockingQueueListener(log_queue, *handlers, respect_handler_level=True)
+
+        logger.removeHandler(_lazy_handler)
+        logger.addHandler(queue_handler)
+        listener.start()
+        _state.update(configured=True, handlers=tuple(handlers), queue_handler=queue_handler, listener=listener)
+        return True
+
+
+def shutdown_logging():
+    """
+    停止后台线程并写完队列中的日志（pytest 会话结束和进程退出时调用，可重复调用）
+    之后的日志改为直接同步写入控制台和文件，不会丢失
+    """
+    with _lock:
+        listener = _state['listener']
+        if listener is None:
+            return
+        listener.stop()
+        _state['listener'] = None
+        queue_handler = _state['queue_handler']
+        logger.removeHandler(queue_handler)
+        context_filter = ContextFilter()
+        for handler in _state['handlers']:
+            handler.addFilter(context_filter)
+            logger.addHandler(handler)
+        if queue_handler.dropped:
+            logger.warning(f"日志队列已满，共丢弃 {queue_handler.dropped} 条 WARNING 以下的日志")
+        for handler in _state['handlers']:
+            handler.flush()
+
 
-console_handler.close()
-file_handler.close()
+atexit.register(shutdown_logging)
 
 if __name__ == '__main__':
     # logger.debug('颜色')
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : perf.py
+Time    : 2026/3/3
+Author  : xixi
+File    : utils
+#-------------------------------------------------------------
+"""
+import functools
+import math
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# Playwright 客户端与 driver 之间每一次协议往返都经过 Channel 的这几个方法
+_CHANNEL_METHODS = ('send', 'send_return_as_dict', 'send_no_reply')
+
+
+class ProtocolCallCounter:
+    """
+    统计 Playwright 协议调用（IPC 往返）次数
+    用法：
+        with ProtocolCallCounter() as counter:
+            product_list_page.get_all_products_info()
+        print(counter.total, counter.by_method)
+    """
+
+    _lock = threading.Lock()
+    _active: list = []
+    _originals: Dict[str, Callable] = {}
+
+    def __init__(self):
+        self.total = 0
+        self.by_method = Counter()
+        self.elapsed = 0.0
+        self._start = 0.0
+
+    @classmethod
+    def _install(cls):
+        from playwright._impl._connection import Channel
+
+        for name in _CHANNEL_METHODS:
+            original = getattr(Channel, name, None)
+            if original is None or name in cls._originals:
+                continue
+            cls._originals[name] = original
+
+            def make_wrapper(func):
+                @functools.wraps(func)
+                def wrapper(channel, method, *args, **kwargs):
+                    for counter in cls._active:
+                        counter.total += 1
+                        counter.by_method[method] += 1
+                    return func(channel, method, *args, **kwargs)
+                return wrapper
+
+            setattr(Channel, name, make_wrapper(original))
+
+    @classmethod
+    def _uninstall(cls):
+        from playwright._impl._connection import Channel
+
+        for name, original in cls._originals.items():
+            setattr(Channel, name, original)
+        cls._originals.clear()
+
+    def __enter__(self):
+        with self._lock:
+            if not self._active:
+                self._install()
+            self._active.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self._start
+        with self._lock:
+            self._active.remove(self)
+            if not self._active:
+                self._uninstall()
+        return False
+
+    def to_dict(self) -> Dict:
+        return {
+            'calls': self.total,
+            'elapsed_ms': round(self.elapsed * 1000, 2),
+            'by_method': dict(self.by_method),
+        }
+
+
+@contextmanager
+def measure(label: str, sink: Optional[Dict] = None):
+    """
+    同时统计耗时和协议调用次数
+    :param label: 结果在 sink 中的键名
+    :param sink: 可选的结果字典，退出时写入 sink[label]
+    """
+    with ProtocolCallCounter() as counter:
+        yield counter
+    if sink is not None:
+        sink[label] = counter.to_dict()
+
+
+class LatencyRecorder:
+    """
+    按标签记录每次调用的耗时（毫秒），用于定位时间花在哪一步
+    用法：
+        recorder.record("add_to_cart", 812.5, status=200)
+        recorder.summary()  # {'add_to_cart': {'count': 1, 'avg_ms': 812.5, 'p50_ms': ..., ...}}
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._records: List[Dict] = []
+
+    def record(self, label: str, elapsed_ms: float, **extra):
+        entry = {'label': label, 'elapsed_ms': round(elapsed_ms, 2), **extra}
+        with self._lock:
+            self._records.append(entry)
+        return entry
+
+    def extend(self, entries: List[Dict]):
+        """合并其他进程记录的原始条目（例如 xdist worker 经 workeroutput 传回的 records）"""
+        with self._lock:
+            self._records.extend(dict(entry) for entry in entries)
+
+    @property
+    def records(self) -> List[Dict]:
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def summary(self) -> Dict[str, Dict]:
+        grouped: Dict[str, List[float]] = {}
+        for entry in self.records:
+            grouped.setdefault(entry['label'], []).append(entry['elapsed_ms'])
+
+        result = {}
+        for label, values in grouped.items():
+            values.sort()
+            result[label] = {
+                'count': len(values),
+                'avg_ms': round(sum(values) / len(values), 2),
+                'p50_ms': percentile(values, 50),
+                'p95_ms': percentile(values, 95),
+                'max_ms': values[-1],
+            }
+        return result
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """最近秩法计算百分位，sorted_values 需已升序排列"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(math.ceil(pct / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
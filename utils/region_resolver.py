@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : region_resolver.py
+Time    : 2026/3/16
+Author  : xixi
+File    : utils
+#-------------------------------------------------------------
+"""
+import ipaddress
+import os
+import socket
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from utils.config_registry import CONFIG_DIR
+from utils.log import logger
+
+# IP 段数据文件（cidr,country），可替换为完整的 GeoIP 导出
+IP_RANGES_FILE = os.getenv("IP_RANGES_FILE", os.path.join(CONFIG_DIR, "ip_ranges.csv"))
+
+# 站点支持的地区；其他国家在站点上默认回退到 TW
+SUPPORTED_REGIONS = ("TW", "HK", "SG", "MY")
+
+
+def forced_region() -> Optional[str]:
+    """环境变量 FORCE_REGION 指定的地区（如 HK），未设置返回 None"""
+    value = os.getenv("FORCE_REGION", "").strip().upper()
+    return value or None
+
+
+class RegionResolver:
+    """
+    离线 IP -> 国家代码：IPv4 段按起始地址排序后存为紧凑数组，查找用二分
+    - 相邻且同国家的段加载时合并
+    - 不支持 IPv6，返回 None
+    """
+
+    def __init__(self, ranges: List[tuple]):
+        """
+        :param ranges: [(起始地址 int, 结束地址 int, 国家代码)]，无需排序
+        """
+        self._starts = array('L')
+        self._ends = array('L')
+        self._countries: List[str] = []
+        for start, end, country in sorted(ranges):
+            if self._countries and self._countries[-1] == country and start <= self._ends[-1] + 1:
+                self._ends[-1] = max(self._ends[-1], end)
+                continue
+            if self._countries and start <= self._ends[-1]:
+                logger.warning(f"IP 段重叠，已忽略: {ipaddress.IPv4Address(start)} ({country})")
+                continue
+            self._starts.append(start)
+            self._ends.append(end)
+            self._countries.append(country)
+
+    @classmethod
+    def from_file(cls, path: str = IP_RANGES_FILE) -> "RegionResolver":
+        ranges = []
+        with open(path, encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                try:
+                    cidr, country = (part.strip() for part in line.split(',', 1))
+                    network = ipaddress.ip_network(cidr, strict=False)
+                except ValueError as e:
+                    logger.warning(f"{path} 第 {line_no} 行格式错误，已跳过: {e}")
+                    continue
+                if network.version != 4:
+                    continue
+                ranges.append((int(network.network_address), int(network.broadcast_address), country.upper()))
+        return cls(ranges)
+
+    def __len__(self):
+        return len(self._countries)
+
+    def lookup(self, ip: str) -> Optional[str]:
+        """IP 所属的国家代码，不在表中返回 None"""
+        try:
+            value = int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+        except (OSError, TypeError):
+            # IPv6 或非法地址
+            return None
+        index = bisect_right(self._starts, value) - 1
+        if index >= 0 and value <= self._ends[index]:
+            return self._countries[index]
+        return None
+
+    def region_for(self, ip: Optional[str] = None) -> Optional[str]:
+        """
+        地区代码：FORCE_REGION 优先，否则按 IP 查表
+        """
+        return forced_region() or (self.lookup(ip) if ip else None)
+
+    def sample_ip(self, country: str) -> Optional[str]:
+        """该国家第一个段中的一个地址（跳过网络地址），用于构造来自该地区的请求"""
+        country = country.upper()
+        for start, end, code in zip(self._starts, self._ends, self._countries):
+            if code == country:
+                return str(ipaddress.IPv4Address(min(start + 1, end)))
+        return None
+
+    def countries(self) -> Dict[str, int]:
+        """每个国家的段数"""
+        counts: Dict[str, int] = {}
+        for code in self._countries:
+            counts[code] = counts.get(code, 0) + 1
+        return counts
+
+
+@lru_cache(maxsize=4)
+def get_resolver(path: str = IP_RANGES_FILE) -> RegionResolver:
+    """每个进程按文件加载一次"""
+    return RegionResolver.from_file(path)
+
+
+def region_matrix() -> List[Optional[str]]:
+    """
+    地区弹窗用例要跑的地区列表，由环境变量 REGION_MATRIX 指定
+    - 未设置：[None]，即按真实 IP（或 FORCE_REGION）
+    - all：所有支持的地区加一个不支持的地区（JP）
+    - 逗号分隔：如 TW,HK
+    """
+    value = os.getenv("REGION_MATRIX", "").strip()
+    if not value:
+        return [None]
+    if value.lower() == "all":
+        return list(SUPPORTED_REGIONS) + ["JP"]
+    return [code.strip().upper() for code in value.split(",") if code.strip()]
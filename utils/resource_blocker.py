@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : resource_blocker.py
+Time    : 2026/3/7
+Author  : xixi
+File    : utils
+#-------------------------------------------------------------
+"""
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+
+from playwright.sync_api import BrowserContext, Response, Route
+
+from utils.log import logger
+
+# 类别 -> Playwright resource_type；trackers 按域名判断，不限资源类型
+CATEGORIES: Dict[str, Optional[frozenset]] = {
+    'images': frozenset({'image'}),
+    'fonts': frozenset({'font'}),
+    'media': frozenset({'media'}),
+    'trackers': None,
+}
+DEFAULT_CATEGORIES = ('images', 'fonts', 'media', 'trackers')
+
+# 第三方统计/广告域名（含子域名）
+TRACKER_HOSTS = (
+    'google-analytics.com',
+    'googletagmanager.com',
+    'doubleclick.net',
+    'googleadservices.com',
+    'connect.facebook.net',
+    'analytics.tiktok.com',
+    'hotjar.com',
+    'clarity.ms',
+    'criteo.com',
+    'criteo.net',
+    'scdn.line-apps.com',
+    'appier.net',
+)
+
+# 站点接口永远放行，断言依赖这些请求
+ALLOWLIST = re.compile(
+    r'^https?://([\w-]+\.)*dogcatstar\.com/(api/|wp-json/|wp-admin/admin-ajax\.php)', re.I
+)
+
+
+class ResourceBlocker:
+    """
+    基于 context.route 的资源拦截，按类别 abort 断言用不到的请求
+    用法：
+        @pytest.mark.block_resources("images", "fonts")   # 指定类别
+        @pytest.mark.block_resources                       # 全部默认类别
+        @pytest.mark.block_resources(False)                # 关闭（覆盖 --block-resources）
+    被拦截请求的字节数是估算值（见 watch_sizes）：同一 URL 在未拦截时见过则用其 Content-Length，
+    否则用该资源类型的平均大小；都没有时计入 blocked_unknown_size
+    """
+
+    # 进程内 URL -> 字节数（LRU，最多 SIZE_HINTS_MAX 个），来自未拦截时的响应头
+    SIZE_HINTS_MAX = 2048
+    size_hints: 'OrderedDict[str, int]' = OrderedDict()
+    # resource_type -> (总字节数, 响应数)，用于估算没见过的 URL
+    type_sizes: Dict[str, Tuple[int, int]] = {}
+    # 进程内所有用例的拦截汇总；xdist 下由 conftest 经 workeroutput 合并到主进程
+    session_totals = Counter()
+    _lock = threading.Lock()
+
+    def __init__(self, categories: Iterable[str] = DEFAULT_CATEGORIES):
+        categories = tuple(categories)
+        unknown = [c for c in categories if c not in CATEGORIES]
+        if unknown:
+            raise ValueError(f"未知的拦截类别: {unknown}，可选: {', '.join(CATEGORIES)}")
+        self.categories = categories
+        self._types = frozenset().union(*(CATEGORIES[c] or () for c in categories))
+        self._trackers = 'trackers' in categories
+        self.blocked = Counter()
+        self.blocked_bytes = 0
+        self.unknown_size = 0
+        self.allowed = 0
+
+    @classmethod
+    def from_node(cls, node, default: Optional[str] = None) -> Optional['ResourceBlocker']:
+        """
+        根据用例的 block_resources 标记或命令行默认值创建拦截器，不需要拦截时返回 None
+        :param node: request.node
+        :param default: --block-resources 的值，逗号分隔的类别
+        """
+        marker = node.get_closest_marker('block_resources')
+        if marker is not None:
+            if marker.args and marker.args[0] is False:
+                return None
+            return cls(marker.args or DEFAULT_CATEGORIES)
+        if default:
+            return cls(c.strip() for c in default.split(',') if c.strip())
+        return None
+
+    def _category(self, url: str, resource_type: str) -> Optional[str]:
+        if ALLOWLIST.match(url):
+            return None
+        if self._trackers:
+            host = urlsplit(url).hostname or ''
+            if any(host == h or host.endswith('.' + h) for h in TRACKER_HOSTS):
+                return 'trackers'
+        if resource_type in self._types:
+            return next(c for c in self.categories if CATEGORIES[c] and resource_type in CATEGORIES[c])
+        return None
+
+    def _handle(self, route: Route):
+        request = route.request
+        category = self._category(request.url, request.resource_type)
+        if category is None:
+            self.allowed += 1
+            route.fallback()
+            return
+
+        self.blocked[category] += 1
+        size = self.estimate_size(request.url, request.resource_type)
+        if size is None:
+            self.unknown_size += 1
+        else:
+            self.blocked_bytes += size
+        route.abort('blockedbyclient')
+
+    @classmethod
+    def estimate_size(cls, url: str, resource_type: str) -> Optional[int]:
+        """被拦截请求的字节数估算：同 URL 的 Content-Length，其次同类型平均值，都没有时返回 None"""
+        with cls._lock:
+            size = cls.size_hints.get(url)
+            if size is not None:
+                return size
+            total, count = cls.type_sizes.get(resource_type, (0, 0))
+        return total // count if count else None
+
+    @classmethod
+    def _record_size(cls, response: Response):
+        length = response.headers.get('content-length')
+        if not (length and length.isdigit()):
+            return
+        size = int(length)
+        resource_type = response.request.resource_type
+        with cls._lock:
+            cls.size_hints[response.url] = size
+            cls.size_hints.move_to_end(response.url)
+            while len(cls.size_hints) > cls.SIZE_HINTS_MAX:
+                cls.size_hints.popitem(last=False)
+            total, count = cls.type_sizes.get(resource_type, (0, 0))
+            cls.type_sizes[resource_type] = (total + size, count + 1)
+
+    @classmethod
+    def watch_sizes(cls, context: BrowserContext):
+        """记录上下文中未拦截响应的 Content-Length（按 URL 和资源类型），作为之后拦截时的字节数估算"""
+        context.on('response', cls._record_size)
+
+    def attach(self, context: BrowserContext):
+        context.route('**/*', self._handle)
+
+    def detach(self, context: BrowserContext):
+        """移除拦截（上下文会被池复用），并计入进程汇总"""
+        try:
+            context.unroute('**/*', self._handle)
+        except Exception as e:
+            logger.debug(f"移除资源拦截失败: {e}")
+        with self._lock:
+            self.session_totals['tests'] += 1
+            self.session_totals['blocked_requests'] += sum(self.blocked.values())
+            self.session_totals['blocked_bytes_estimated'] += self.blocked_bytes
+            self.session_totals['blocked_unknown_size'] += self.unknown_size
+
+    def to_dict(self) -> Dict:
+        return {
+            'categories': list(self.categories),
+            'blocked_requests': sum(self.blocked.values()),
+            'blocked_by_category': dict(self.blocked),
+            'blocked_bytes_estimated': self.blocked_bytes,
+            'blocked_unknown_size': self.unknown_size,
+            'allowed_requests': self.allowed,
+        }
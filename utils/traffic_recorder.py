@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+#-------------------------------------------------------------
+Name    : traffic_recorder.py
+Time    : 2026/3/13
+Author  : xixi
+File    : utils
+#-------------------------------------------------------------
+"""
+import json
+import os
+import queue
+import re
+import threading
+from itertools import count
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from playwright.sync_api import BrowserContext, Response
+
+from utils.auth_cache import file_lock
+from utils.config_registry import ROOT_DIR
+from utils.log import logger
+
+# 录制结果与 api/data/cases.jsonl 格式一致，可直接用 API_CASES 指向它回放
+CAPTURE_PATH = os.getenv("API_CAPTURE", os.path.join(ROOT_DIR, "api", "data", "captured.jsonl"))
+
+# 只录制站点的 /api/ec/ 接口
+API_URL_FILTER = re.compile(r"^https?://([\w-]+\.)*dogcatstar\.com/api/ec/")
+
+# 认证相关请求头：不写入文件，回放时由 get_headers fixture 按环境变量重新生成
+AUTH_HEADERS = frozenset({"api-token", "x-platform-token", "authorization", "cookie"})
+# 浏览器自动带上、回放时会出错或无意义的请求头
+DROP_HEADERS = frozenset({"content-length", "host", "connection", "accept-encoding"})
+
+# 请求体 / 响应体中需要打码的字段名和值
+SENSITIVE_KEYS = re.compile(r"token|password|secret|authorization|cookie|session|email|phone|mobile", re.I)
+SENSITIVE_VALUE = re.compile(r"^(eyJ[\w-]+\.[\w-]+\.[\w-]*|Bearer\s+\S+)$")
+MASK = "***"
+
+
+def sanitize(value: Any) -> Any:
+    """递归打码：敏感字段名的值、JWT / Bearer 形式的字符串替换为 ***"""
+    if isinstance(value, dict):
+        return {k: MASK if SENSITIVE_KEYS.search(str(k)) else sanitize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [sanitize(v) for v in value]
+    if isinstance(value, str) and SENSITIVE_VALUE.match(value):
+        return MASK
+    return value
+
+
+def _json_or_none(text: Optional[str]) -> Any:
+    if not text:
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+class JsonlWriter:
+    """
+    后台线程批量追加写 JSONL：调用方只把记录放进队列，序列化和写盘在后台线程完成
+    - 每批写入时持有文件锁，xdist 多个 worker 追加同一文件不会交错
+    - 队列满时丢弃并计数，不阻塞用例
+    """
+
+    _STOP = object()
+
+    def __init__(self, path: str, batch_size: int = 200, flush_interval: float = 1.0, maxsize: int = 10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize)
+        self._thread = threading.Thread(target=self._run, name="jsonl-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record: Dict):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                while True:
+                    if item is self._STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch):
+        lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch)
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with file_lock(f"{self.path}.lock", timeout=30, poll=0.05):
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+            self.written += len(batch)
+        except (OSError, TimeoutError) as e:
+            self.dropped += len(batch)
+            logger.warning(f"接口流量写入失败，丢弃 {len(batch)} 条: {e}")
+
+    def close(self, timeout: float = 10):
+        """写完队列中剩余的记录后退出"""
+        self._queue.put(self._STOP)
+        self._thread.join(timeout=timeout)
+
+
+class TrafficRecorder:
+    """
+    UI 用例运行时把浏览器发出的 /api/ec/ 请求与响应写入 JSONL（--record-api 开启）
+    - 请求头去掉认证信息，只标记 "auth": true；请求体 / 响应体中的敏感字段打码
+    - 只记录 JSON 请求体的接口，expect 只断言状态码（响应中含 cart_uuid 等随机值）
+    - 同一进程共用一个后台写线程，会话结束时 close_all 刷盘
+    """
+
+    _writers: Dict[str, JsonlWriter] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, source: str, path: str = CAPTURE_PATH, url_filter=API_URL_FILTER):
+        """
+        :param source: 记录来源，一般为用例 nodeid
+        :param path: 输出文件
+        :param url_filter: 需要录制的 URL
+        """
+        self.source = source
+        self.path = path
+        self.url_filter = url_filter
+        self._seq = count(1)
+
+    @classmethod
+    def from_request(cls, request) -> Optional["TrafficRecorder"]:
+        if not request.config.getoption("--record-api"):
+            return None
+        return cls(request.node.nodeid)
+
+    @classmethod
+    def writer(cls, path: str) -> JsonlWriter:
+        with cls._lock:
+            if path not in cls._writers:
+                cls._writers[path] = JsonlWriter(path)
+            return cls._writers[path]
+
+    @classmethod
+    def close_all(cls):
+        with cls._lock:
+            writers, cls._writers = dict(cls._writers), {}
+        for path, writer in writers.items():
+            writer.close()
+            logger.info(f"接口流量已写入 {path}: {writer.written} 条，丢弃 {writer.dropped} 条")
+
+    def attach(self, context: BrowserContext):
+        context.on("response", self._on_response)
+
+    def detach(self, context: BrowserContext):
+        # 上下文会放回池中复用，必须移除监听
+        context.remove_listener("response", self._on_response)
+
+    def _on_response(self, response: Response):
+        request = response.request
+        if not self.url_filter.match(request.url):
+            return
+        try:
+            record = self._record(response)
+        except Exception as e:
+            # 重定向、页面关闭等情况下拿不到响应体，跳过即可
+            logger.debug(f"接口流量录制跳过 {request.url}: {e}")
+            return
+        if record is not None:
+            self.writer(self.path).write(record)
+
+    def _record(self, response: Response) -> Optional[Dict]:
+        request = response.request
+        body = _json_or_none(request.post_data)
+        if request.method not in ("GET", "DELETE") and body is None:
+            return None
+
+        headers = {}
+        auth = False
+        for name, value in request.headers.items():
+            name = name.lower()
+            if name in AUTH_HEADERS:
+                auth = True
+            elif name not in DROP_HEADERS and not name.startswith(":"):
+                headers[name] = value
+
+        url = urlsplit(request.url)
+        path = f"{url.path}?{url.query}" if url.query else url.path
+        record = {
+            "id": f"{self.source}#{next(self._seq)}-{request.method}-{url.path.rsplit('/', 1)[-1]}",
+            "method": request.method,
+            "path": path,
+            "origin": f"{url.scheme}://{url.netloc}",
+            "auth": auth,
+            "headers": sanitize(headers),
+            "expect": {"status": response.status},
+            "response": sanitize(_json_or_none(response.text())),
+            "source": self.source,
+        }
+        if body is not None:
+            record["json"] = sanitize(body)
+        return record